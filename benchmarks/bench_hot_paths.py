@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点路径基准测试(无界面)
+
+通过核心引擎 ssh_file_core.SSHSession(即GUI所用的同一套代码),在本地回环
+替身服务器上运行列目录、目录切换、大文件传输、小文件批量传输、归档浏览和远程命令执行,
+输出可对比的数字.可注入往返延迟和带宽限制,
+并可与上一次保存的结果比较,发现热点路径的性能回退.
+
+用法:
+    python benchmarks/bench_hot_paths.py                       # 10万条目 / 1 GB / 1万个小文件
+    python benchmarks/bench_hot_paths.py --quick               # 缩小规模,快速检查
+    python benchmarks/bench_hot_paths.py --latency 0.03 --bandwidth 20M
+    python benchmarks/bench_hot_paths.py --json out.json --baseline last.json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import posixpath
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from loopback_server import LoopbackSSHServer, PASSWORD, SYNTHETIC_ROOT  # noqa: E402
+from ssh_file_core import HashSink, ListingView, PerfRecorder, SSHSession, format_size  # noqa: E402
+from ssh_gui_file_manager import SSHFileManagerGUI  # noqa: E402
+
+
+def parse_size(text):
+    """解析 1G / 64M / 512K 形式的大小"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class Bench:
+    def __init__(self, session, workdir):
+        self.session = session
+        self.workdir = workdir
+        self.results = []
+
+    def measure(self, name, func, units=None, unit_name=None):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        result = {'name': name, 'seconds': elapsed}
+        if units:
+            result['rate'] = units / elapsed
+            result['unit'] = unit_name
+        self.results.append(result)
+        rate = f"{result['rate']:>14,.1f} {unit_name}/秒" if units else ""
+        print(f"  {name:<28} {elapsed * 1000:>10.1f} ms  {rate}")
+        return result
+
+    def listing(self, entries):
+        path = f"{SYNTHETIC_ROOT}/listing/{entries}"
+        files = []
+        self.measure(f"列目录 {entries} 项", lambda: files.extend(self.session.list_dir(path)),
+                     entries, "项")
+        self.measure(f"格式化 {entries} 行",
+                     lambda: [SSHFileManagerGUI._format_row(f) for f in files], entries, "行")
+        
+        # 本地排序与过滤:索引建好后,点击列标题和输入过滤条件都不应访问远程
+        view = ListingView(files)
+        self.measure(f"建立排序索引 {entries} 项", lambda: view.prepare(ListingView.COLUMNS), entries, "项")
+        
+        def resort():
+            for column in ListingView.COLUMNS:
+                view.sort(column)
+                view.rows()
+        self.measure(f"按 {len(ListingView.COLUMNS)} 列重新排序", resort, entries * len(ListingView.COLUMNS), "项")
+        view.pattern = "*7*"
+        self.measure(f"过滤 {entries} 项", view.rows, entries, "项")
+
+    def navigation(self, depth):
+        root = os.path.join(self.workdir, "nav")
+        path = root
+        for i in range(depth):
+            path = os.path.join(path, f"level{i}")
+        os.makedirs(path)
+        for level in range(depth + 1):
+            open(os.path.join(root, f"file{level}.txt"), "w").close()
+
+        session = self.session
+
+        def visit(current, target):
+            # 与界面中双击目录的流程一致:解析路径后直接列出内容(列目录失败即说明目录不可用)
+            new_path = SSHSession.resolve_path(current, target)
+            session.list_dir(new_path)
+            return new_path
+
+        def walk():
+            current = root
+            for i in range(depth):
+                current = visit(current, f"level{i}")
+            for i in range(depth):
+                current = visit(current, "..")
+        self.measure(f"目录切换 {depth * 2} 次", walk, depth * 2, "次")
+
+    def transfer(self, size):
+        session = self.session
+        local_path = os.path.join(self.workdir, "blob.bin")
+        self.measure(f"下载 {format_size(size)}",
+                     lambda: session.download(f"{SYNTHETIC_ROOT}/blob/{size}", local_path),
+                     size / 1024 ** 2, "MB")
+        # 固定缓冲区的流式下载(只计算校验和),与上面的整文件下载对比吞吐
+        self.measure(f"流式校验 {format_size(size)}",
+                     lambda: session.stream_download(f"{SYNTHETIC_ROOT}/blob/{size}", HashSink()),
+                     size / 1024 ** 2, "MB")
+        self.measure(f"上传 {format_size(size)}",
+                     lambda: session.upload(local_path, f"{SYNTHETIC_ROOT}/sink/blob.bin"),
+                     size / 1024 ** 2, "MB")
+        os.remove(local_path)
+
+    def small_files(self, count, size):
+        source = os.path.join(self.workdir, "small", "files")
+        os.makedirs(source)
+        payload = b"x" * size
+        for i in range(count):
+            with open(os.path.join(source, f"f{i:06d}.dat"), "wb") as f:
+                f.write(payload)
+
+        session = self.session
+        for bundle in (True, False):
+            mode = "打包" if bundle else "SFTP逐个"
+            remote = os.path.join(self.workdir, f"remote_{int(bundle)}")
+            local = os.path.join(self.workdir, f"local_{int(bundle)}")
+            os.makedirs(remote)
+            os.makedirs(local)
+            self.measure(f"{mode}上传 {count} 个小文件",
+                         lambda: session.upload_dir(source, remote, bundle), count, "文件")
+            self.measure(f"{mode}下载 {count} 个小文件",
+                         lambda: session.download_dir(os.path.join(remote, "files"), local, bundle),
+                         count, "文件")
+
+    def archive(self, count, size):
+        # 成员名混合ASCII和非ASCII:tar在LC_ALL=C下把非ASCII字节列为\ooo转义
+        names = [f"数据/名字 {i:04d}.txt" if i % 2 else f"data/plain {i:04d}.txt" for i in range(count)]
+        payload = b"y" * size
+        tar_path = os.path.join(self.workdir, "mixed.tar")
+        with tarfile.open(tar_path, "w", format=tarfile.GNU_FORMAT) as tar:
+            for name in names:
+                info = tarfile.TarInfo(name)
+                info.size = size
+                tar.addfile(info, io.BytesIO(payload))
+
+        session = self.session
+        archive = []
+        self.measure(f"列出tar归档 {count} 个成员",
+                     lambda: archive.append(session.open_archive(tar_path)), count, "项")
+        archive = archive[0]
+        missing = [name for name in names if name not in archive.members]
+        if missing:
+            raise AssertionError(f"tar成员名解码错误: {missing[0]!r} 不在 {sorted(archive.members)[:3]!r}")
+        shown = {info['name'] for info in archive.list_dir("数据")}
+        if posixpath.basename(names[1]) not in shown:
+            raise AssertionError(f"归档浏览显示的名字错误: {sorted(shown)[:3]!r}")
+        sinks = []
+
+        def extract():
+            for name in names[:10]:
+                sinks.append(HashSink())
+                archive.extract(name, sinks[-1])
+        self.measure("从tar提取 10 个成员", extract, 10, "文件")
+        archive.close()
+        if any(sink.hexdigest() != hashlib.sha256(payload).hexdigest() for sink in sinks):
+            raise AssertionError("从tar提取的成员内容不符")
+
+    def exec_commands(self, count):
+        session = self.session
+
+        def run():
+            for _ in range(count):
+                session.exec_command("true")
+        self.measure(f"执行命令 {count} 次", run, count, "次")
+
+
+def compare(results, baseline_path, threshold):
+    """与基线结果比较,返回回退项列表"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {item['name']: item for item in json.load(f)['results']}
+    regressions = []
+    print(f"\n与基线比较 ({baseline_path}):")
+    for item in results:
+        old = baseline.get(item['name'])
+        if not old:
+            continue
+        change = (item['seconds'] - old['seconds']) / old['seconds'] * 100
+        flag = "  <-- 回退" if change > threshold else ""
+        print(f"  {item['name']:<28} {change:+7.1f}%{flag}")
+        if flag:
+            regressions.append(item['name'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSH文件管理器热点路径基准测试")
+    parser.add_argument("--entries", type=int, default=100000, help="列目录测试的条目数")
+    parser.add_argument("--bytes", default="1G", help="大文件传输的大小(如 1G、256M)")
+    parser.add_argument("--files", type=int, default=10000, help="小文件数量")
+    parser.add_argument("--file-size", type=int, default=1024, help="每个小文件的字节数")
+    parser.add_argument("--depth", type=int, default=20, help="目录切换测试的层数")
+    parser.add_argument("--commands", type=int, default=50, help="命令执行次数")
+    parser.add_argument("--quick", action="store_true", help="缩小规模(1万条目/64M/1000个文件)")
+    parser.add_argument("--latency", type=float, default=0.0, help="注入的往返延迟(秒)")
+    parser.add_argument("--bandwidth", default=None, help="带宽上限,如 20M 表示每秒20MB")
+    parser.add_argument("--only", nargs="*", default=None,
+                        choices=["listing", "navigation", "transfer", "small", "archive", "exec"],
+                        help="只运行指定场景")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    parser.add_argument("--baseline", help="与之前保存的JSON结果比较")
+    parser.add_argument("--threshold", type=float, default=10.0, help="判定为回退的耗时增幅(%%)")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.entries, args.bytes, args.files = 10000, "64M", 1000
+    bandwidth = parse_size(args.bandwidth) if args.bandwidth else None
+    scenarios = args.only or ["listing", "navigation", "transfer", "small", "archive", "exec"]
+
+    print(f"延迟 {args.latency * 1000:.0f} ms, 带宽 {args.bandwidth or '不限'}")
+    workdir = tempfile.mkdtemp(prefix="sshfm-bench-")
+    server = LoopbackSSHServer(latency=args.latency, bandwidth=bandwidth).start()
+    perf = PerfRecorder()
+    session = SSHSession("127.0.0.1", "bench", server.port, perf=perf)
+    try:
+        session.connect(password=PASSWORD)
+        bench = Bench(session, workdir)
+        if "listing" in scenarios:
+            bench.listing(args.entries)
+        if "navigation" in scenarios:
+            bench.navigation(args.depth)
+        if "transfer" in scenarios:
+            bench.transfer(parse_size(args.bytes))
+        if "small" in scenarios:
+            bench.small_files(args.files, args.file_size)
+        if "archive" in scenarios:
+            bench.archive(min(args.files, 1000), args.file_size)
+        if "exec" in scenarios:
+            bench.exec_commands(args.commands)
+    finally:
+        session.close()
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n远程操作延迟:")
+    for row in perf.summary():
+        print(f"  {row['name']:<22} 次数 {row['count']:>7}  p50 {row['p50'] * 1000:8.2f} ms"
+              f"  p99 {row['p99'] * 1000:8.2f} ms")
+
+    config = {'latency': args.latency, 'bandwidth': bandwidth, 'entries': args.entries,
+              'bytes': parse_size(args.bytes), 'files': args.files}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'config': config, 'results': bench.results}, f, ensure_ascii=False, indent=2)
+    if args.baseline and compare(bench.results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息分发压力测试
+
+多个生产者线程向 MessageDispatcher 投递混合消息(状态/刷新/传输进度/操作结果),
+消费者线程模拟Tk主循环:被唤醒后一次取出并处理全部消息.
+输出唤醒次数、合并前后的消息数、实际触发的刷新次数,并与旧实现
+(queue.Queue + 每100ms轮询、逐条处理、每条结果一个弹窗)的理论开销对比.
+
+用法:
+    python benchmarks/bench_message_queue.py [--messages 10000] [--producers 8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ssh_gui_file_manager import MessageDispatcher  # noqa: E402
+
+
+def make_messages(count, seed=0):
+    """生成与批量操作相近的消息组合"""
+    rng = random.Random(seed)
+    paths = [f"/data/dir{i}" for i in range(4)] + [None]
+    messages = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.55:
+            messages.append(("status", f"正在处理 {i}"))
+        elif roll < 0.75:
+            messages.append(("refresh", rng.choice(paths)))
+        elif roll < 0.9:
+            messages.append(("transfer", {'label': f"任务{i % 3}", 'files': i, 'bytes': i * 100,
+                                          'files_per_sec': 0.0, 'done': False}))
+        elif roll < 0.98:
+            messages.append(("success", f"操作完成 {i}"))
+        else:
+            messages.append(("error", f"操作失败 {i}"))
+    return messages
+
+
+def run(message_count, producers, handle_cost):
+    messages = make_messages(message_count)
+    wake_event = threading.Event()
+    dispatcher = MessageDispatcher(wake_event.set)
+    stats = {'wakeups': 0, 'handled': 0, 'refresh': 0, 'notifications': 0}
+    done = threading.Event()
+
+    def consumer():
+        # 模拟主循环:等待唤醒事件,批量处理
+        while not (done.is_set() and not len(dispatcher)):
+            if not wake_event.wait(0.05):
+                continue
+            wake_event.clear()
+            stats['wakeups'] += 1
+            for message_type, data in dispatcher.drain():
+                stats['handled'] += 1
+                if message_type == "refresh":
+                    stats['refresh'] += 1
+                elif message_type in ("success", "error"):
+                    stats['notifications'] += 1
+                if handle_cost:
+                    time.sleep(handle_cost)
+
+    def producer(chunk):
+        for message in chunk:
+            dispatcher.put(message)
+
+    consumer_thread = threading.Thread(target=consumer)
+    consumer_thread.start()
+
+    started = time.perf_counter()
+    chunks = [messages[i::producers] for i in range(producers)]
+    threads = [threading.Thread(target=producer, args=(chunk,)) for chunk in chunks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    wake_event.set()
+    consumer_thread.join()
+    elapsed = time.perf_counter() - started
+
+    posted_refresh = sum(1 for t, _ in messages if t == "refresh")
+    posted_results = sum(1 for t, _ in messages if t in ("success", "error"))
+
+    print(f"投递消息数:        {message_count} (生产者线程 {producers})")
+    print(f"总耗时:            {elapsed * 1000:.1f} ms ({message_count / elapsed:,.0f} 条/秒)")
+    print(f"主线程唤醒次数:    {stats['wakeups']}")
+    print(f"合并后处理消息数:  {stats['handled']}")
+    print(f"实际触发刷新:      {stats['refresh']} (投递 {posted_refresh})")
+    print(f"通知日志条目:      {stats['notifications']} (旧实现: {posted_results} 个模态弹窗)")
+    print(f"旧实现轮询:        每100ms唤醒一次,空闲时也唤醒; 刷新线程 {posted_refresh} 个")
+    return elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MessageDispatcher 压力测试")
+    parser.add_argument("--messages", type=int, default=10000, help="投递消息总数")
+    parser.add_argument("--producers", type=int, default=8, help="生产者线程数")
+    parser.add_argument("--handle-cost", type=float, default=0.0,
+                        help="模拟每条消息的处理耗时(秒),用于观察主线程繁忙时的合并效果")
+    args = parser.parse_args()
+    run(args.messages, args.producers, args.handle_cost)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动时间基准测试
+
+在全新的子进程中测量GUI启动的各个阶段:解释器启动、导入模块、创建窗口并完成首次绘制,
+以及推迟到窗口显示之后的paramiko导入.第一次运行使用空的字节码缓存目录(冷启动),
+之后的运行复用该缓存(热启动).--eager 在导入界面之前先导入paramiko,模拟改动前的启动路径.
+
+没有图形显示(如无DISPLAY的服务器)时跳过窗口阶段,只报告导入耗时.
+
+用法:
+    python benchmarks/bench_startup.py                 # 1次冷启动 + 4次热启动
+    python benchmarks/bench_startup.py --runs 10 --eager
+    python benchmarks/bench_startup.py --json startup.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行的测量代码,结果以一行JSON输出
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+result = {{}}
+if {eager!r}:
+    import paramiko
+result['eager_paramiko'] = time.perf_counter() - started
+
+import ssh_gui_file_manager
+result['import'] = time.perf_counter() - started
+result['paramiko_at_import'] = 'paramiko' in sys.modules
+
+try:
+    app = ssh_gui_file_manager.SSHFileManagerGUI()
+    app.setup_menu()
+    app.root.update()
+    result['window'] = time.perf_counter() - started
+    result['paramiko_at_window'] = 'paramiko' in sys.modules
+except Exception as e:
+    app = None
+    result['window'] = None
+    result['window_error'] = str(e).splitlines()[0]
+
+# 首次连接前需要的paramiko导入(GUI中在窗口显示后由后台线程完成)
+import ssh_file_core
+before = time.perf_counter()
+ssh_file_core.warm_imports().join()
+result['paramiko'] = time.perf_counter() - before
+if app is not None:
+    app.root.destroy()
+print(json.dumps(result))
+"""
+
+
+def run_child(eager, pycache):
+    """运行一次子进程,返回 (进程总耗时, 子进程内测得的各阶段)"""
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache)
+    # 冷/热启动的区别在于字节码缓存,必须允许写入
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    code = CHILD.format(root=ROOT_DIR, eager=eager)
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip())
+    return wall, json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def ms(value):
+    return "      -" if value is None else f"{value * 1000:7.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSH文件管理器启动时间基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="运行次数(第一次为冷启动)")
+    parser.add_argument("--eager", action="store_true", help="启动时先导入paramiko(改动前的行为)")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    pycache = tempfile.mkdtemp(prefix="sshfm-startup-")
+    runs = []
+    try:
+        print(f"{'':6} {'进程总计':>8} {'导入':>8} {'窗口':>8} {'paramiko':>9}  (ms)")
+        for index in range(max(args.runs, 2)):
+            wall, phases = run_child(args.eager, pycache)
+            kind = "冷启动" if index == 0 else "热启动"
+            runs.append({'kind': kind, 'wall': wall, **phases})
+            print(f"{kind:<6} {ms(wall)}  {ms(phases['import'])}  {ms(phases['window'])}  {ms(phases['paramiko'])}")
+    finally:
+        shutil.rmtree(pycache, ignore_errors=True)
+
+    warm = runs[1:]
+    print(f"\n热启动中位数: 进程 {ms(statistics.median(r['wall'] for r in warm)).strip()} ms, "
+          f"导入 {ms(statistics.median(r['import'] for r in warm)).strip()} ms")
+    if runs[0].get('window_error'):
+        print(f"未测量窗口阶段: {runs[0]['window_error']}")
+    else:
+        print(f"窗口显示时paramiko已加载: {'是' if runs[0]['paramiko_at_window'] else '否'}")
+    print(f"导入界面模块时paramiko已加载: {'是' if runs[0]['paramiko_at_import'] else '否'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'eager': args.eager, 'runs': runs}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地回环SSH/SFTP替身服务器(仅用于基准测试)
+
+基于 paramiko 的 ServerInterface / SFTPServerInterface 实现,在127.0.0.1上监听:
+- SFTP子系统直接映射本机文件系统(远程路径即本地绝对路径)
+- exec_command 通过本地shell执行,可用 allow_exec=False 模拟只允许SFTP的服务器
+- 支持direct-tcpip通道(ProxyJump、ssh -L)和tcpip-forward远程转发(ssh -R);allow_forwarding=False 时拒绝
+- 可注入往返延迟(latency,秒)和带宽上限(bandwidth,字节/秒)
+- 虚拟路径,避免为大规模测试真正占用磁盘:
+    /__synthetic__/listing/<N>   含N个条目的目录
+    /__synthetic__/blob/<SIZE>   大小为SIZE字节的只读全零文件
+    /__synthetic__/sink/<NAME>   写入即丢弃的文件
+
+任意用户名 + 密码 PASSWORD(或任意公钥)均可登录.
+"""
+
+import collections
+import os
+import socket
+import stat
+import subprocess
+import threading
+import time
+
+import paramiko
+from paramiko import (SFTPAttributes, SFTPHandle, SFTPServer, SFTPServerInterface,
+                      SFTP_OK, SFTP_OP_UNSUPPORTED)
+from paramiko.message import Message
+from paramiko.sftp import CMD_NAME, SFTP_EOF
+
+PASSWORD = "bench"
+SYNTHETIC_ROOT = "/__synthetic__"
+
+_host_key = None
+_host_key_lock = threading.Lock()
+
+
+def get_host_key():
+    """生成并缓存主机密钥(RSA生成较慢,同一进程只生成一次)"""
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+class ShapedSocket:
+    """为服务端套接字注入延迟和带宽限制
+
+    发往客户端的数据进入延迟线,到期后由发送线程按令牌桶速率写出,
+    因此每个请求/响应往返都会多出latency,但流水线请求之间的延迟可以重叠.
+    接收方向同样受带宽限制.
+    """
+
+    def __init__(self, sock, latency=0.0, bandwidth=None):
+        self._sock = sock
+        self._latency = latency
+        self._bandwidth = bandwidth
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._send_budget = _TokenBucket(bandwidth)
+        self._recv_budget = _TokenBucket(bandwidth)
+        self._sender = threading.Thread(target=self._send_loop, daemon=True)
+        self._sender.start()
+
+    def send(self, data):
+        with self._cond:
+            if self._closed:
+                raise socket.error("socket closed")
+            self._queue.append((time.monotonic() + self._latency, bytes(data)))
+            self._cond.notify()
+        return len(data)
+
+    def sendall(self, data):
+        self.send(data)
+
+    def recv(self, size):
+        data = self._sock.recv(size)
+        self._recv_budget.consume(len(data))
+        return data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._sock.close()
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+    def _send_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                due, data = self._queue.popleft()
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._send_budget.consume(len(data))
+            try:
+                self._sock.sendall(data)
+            except OSError:
+                return
+
+
+class _TokenBucket:
+    """简单令牌桶:bandwidth为None时不限速"""
+
+    def __init__(self, bandwidth):
+        self.bandwidth = bandwidth
+        self._next_free = time.monotonic()
+
+    def consume(self, size):
+        if not self.bandwidth or not size:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_free)
+        self._next_free = start + size / self.bandwidth
+        wait = self._next_free - now
+        if wait > 0.001:
+            time.sleep(wait)
+
+
+class _BenchServer(paramiko.ServerInterface):
+    """认证与通道策略"""
+
+    def __init__(self, owner, transport):
+        self.owner = owner
+        self.transport = transport
+        self._tunnels = {}        # 通道号 -> 已连接的目标socket,等通道被接受后开始转发
+        self._tunnel_thread = None
+        self._listeners = {}      # (地址, 端口) -> 远程转发的监听socket
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        if password == PASSWORD:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        if not self.owner.allow_exec:
+            return False
+        thread = threading.Thread(target=_run_exec, args=(channel, command), daemon=True)
+        thread.start()
+        return True
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        if not self.owner.allow_forwarding:
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+        try:
+            sock = socket.create_connection(destination, timeout=10)
+        except OSError:
+            return paramiko.OPEN_FAILED_CONNECT_FAILED
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._tunnels[chanid] = sock
+        if self._tunnel_thread is None:
+            self._tunnel_thread = threading.Thread(target=self._accept_tunnels, daemon=True)
+            self._tunnel_thread.start()
+        return paramiko.OPEN_SUCCEEDED
+
+    def _accept_tunnels(self):
+        # 所有通道都会进入accept队列,只认领direct-tcpip通道
+        while self.transport.is_active():
+            channel = self.transport.accept(1)
+            if channel is None:
+                continue
+            sock = self._tunnels.pop(channel.get_id(), None)
+            if sock is not None:
+                threading.Thread(target=_relay, args=(channel, sock), daemon=True).start()
+
+    def check_port_forward_request(self, address, port):
+        if not self.owner.allow_forwarding:
+            return False
+        try:
+            listener = socket.create_server((address, port))
+        except OSError:
+            return False
+        port = listener.getsockname()[1]
+        self._listeners[(address, port)] = listener
+        threading.Thread(target=self._accept_forwarded, args=(listener, address, port), daemon=True).start()
+        return port
+
+    def cancel_port_forward_request(self, address, port):
+        listener = self._listeners.pop((address, port), None)
+        if listener is not None:
+            # 先shutdown唤醒阻塞在accept中的线程,只close不会停止监听
+            try:
+                listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            listener.close()
+
+    def _accept_forwarded(self, listener, address, port):
+        while self.transport.is_active():
+            try:
+                sock, origin = listener.accept()
+            except OSError:
+                return
+            try:
+                channel = self.transport.open_forwarded_tcpip_channel(origin, (address, port))
+            except (paramiko.SSHException, OSError):
+                sock.close()
+                continue
+            threading.Thread(target=_relay, args=(channel, sock), daemon=True).start()
+        listener.close()
+
+    def check_global_request(self, kind, msg):
+        # keepalive@openssh.com 等全局请求按OpenSSH的习惯回复失败即可
+        return False
+
+
+def _run_exec(channel, command):
+    """在本地shell中执行命令,并在通道与进程之间转发数据"""
+    process = subprocess.Popen(
+        command if isinstance(command, str) else command.decode("utf-8"),
+        shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+    def pump_stdin():
+        try:
+            while True:
+                data = channel.recv(65536)
+                if not data:
+                    break
+                process.stdin.write(data)
+                process.stdin.flush()   # 交互式协议(如远程辅助程序)要求数据立即送达
+        except (OSError, EOFError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    def pump_stderr():
+        for chunk in iter(lambda: process.stderr.read1(65536), b""):
+            channel.sendall_stderr(chunk)
+
+    threads = [threading.Thread(target=pump_stdin, daemon=True),
+               threading.Thread(target=pump_stderr, daemon=True)]
+    for thread in threads:
+        thread.start()
+    try:
+        for chunk in iter(lambda: process.stdout.read1(65536), b""):
+            channel.sendall(chunk)
+    except OSError:
+        process.kill()
+    threads[1].join()
+    channel.send_exit_status(process.wait())
+    channel.close()
+
+
+def _relay(channel, sock):
+    """在转发通道与socket之间双向转发;一个方向结束时只关闭对端的写方向,两个方向都结束后关闭"""
+    def pump(source, target, shutdown_write):
+        try:
+            for chunk in iter(lambda: source.recv(65536), b""):
+                target.sendall(chunk)
+            shutdown_write()
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+
+    thread = threading.Thread(target=pump, args=(sock, channel, channel.shutdown_write), daemon=True)
+    thread.start()
+    pump(channel, sock, lambda: sock.shutdown(socket.SHUT_WR))
+    thread.join()
+    for end in (channel, sock):
+        try:
+            end.close()
+        except OSError:
+            pass
+
+
+def _attributes_from_stat(st, filename=None):
+    attr = SFTPAttributes.from_stat(st)
+    if filename is not None:
+        attr.filename = filename
+    return attr
+
+
+def _errno_result(error):
+    return SFTPServer.convert_errno(error.errno)
+
+
+class _LocalHandle(SFTPHandle):
+    """本地文件句柄"""
+
+    def __init__(self, path, flags):
+        super().__init__(flags)
+        self.path = path
+
+    def stat(self):
+        try:
+            return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return _errno_result(e)
+
+    def chattr(self, attr):
+        try:
+            SFTPServer.set_file_attr(self.path, attr)
+            return SFTP_OK
+        except OSError as e:
+            return _errno_result(e)
+
+
+class _ZeroHandle(SFTPHandle):
+    """虚拟全零文件"""
+
+    _zeros = b"\0" * 65536
+
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+
+    def read(self, offset, length):
+        length = max(0, min(length, self.size - offset))
+        if length <= len(self._zeros):
+            return self._zeros[:length]
+        return b"\0" * length
+
+    def stat(self):
+        attr = SFTPAttributes()
+        attr.st_size = self.size
+        attr.st_mode = stat.S_IFREG | 0o444
+        return attr
+
+
+class _SinkHandle(SFTPHandle):
+    """写入即丢弃的虚拟文件(只记录大小,供stat校验)"""
+
+    sizes = {}
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.size = 0
+        self.sizes[path] = 0
+
+    def write(self, offset, data):
+        self.size = max(self.size, offset + len(data))
+        self.sizes[self.path] = self.size
+        return SFTP_OK
+
+    def stat(self):
+        attr = SFTPAttributes()
+        attr.st_size = self.size
+        attr.st_mode = stat.S_IFREG | 0o644
+        return attr
+
+    def chattr(self, attr):
+        return SFTP_OK
+
+
+class _BatchingSFTPServer(SFTPServer):
+    """与OpenSSH一致,每个READDIR响应返回约100个条目(paramiko默认只有16个)"""
+
+    READDIR_BATCH = 100
+
+    def _read_folder(self, request_number, folder):
+        flist = []
+        while len(flist) < self.READDIR_BATCH:
+            batch = folder._get_next_files()
+            if not batch:
+                break
+            flist.extend(batch)
+        if not flist:
+            self._send_status(request_number, SFTP_EOF)
+            return
+        msg = Message()
+        msg.add_int(request_number)
+        msg.add_int(len(flist))
+        for attr in flist:
+            msg.add_string(attr.filename)
+            msg.add_string(attr)
+            attr._pack(msg)
+        self._send_packet(CMD_NAME, msg)
+
+
+class _LocalSFTPServer(SFTPServerInterface):
+    """把SFTP请求映射到本机文件系统,另外提供虚拟路径"""
+
+    _listing_cache = {}
+
+    def canonicalize(self, path):
+        path = path.decode("utf-8") if isinstance(path, bytes) else path
+        return os.path.normpath(path if path.startswith("/") else "/" + path).replace("\\", "/")
+
+    def _synthetic(self, path):
+        if not path.startswith(SYNTHETIC_ROOT + "/"):
+            return None
+        parts = path[len(SYNTHETIC_ROOT) + 1:].split("/")
+        return parts
+
+    def list_folder(self, path):
+        parts = self._synthetic(path)
+        if parts is not None:
+            if parts[0] == "listing" and len(parts) == 2:
+                return self._synthetic_listing(int(parts[1]))
+            return SFTP_OP_UNSUPPORTED
+        try:
+            return [_attributes_from_stat(os.lstat(os.path.join(path, name)), name)
+                    for name in os.listdir(path)]
+        except OSError as e:
+            return _errno_result(e)
+
+    @classmethod
+    def _synthetic_listing(cls, count):
+        if count not in cls._listing_cache:
+            now = int(time.time())
+            entries = []
+            for i in range(count):
+                attr = SFTPAttributes()
+                attr.filename = f"entry_{i:07d}" + ("" if i % 10 == 0 else ".log")
+                attr.st_mode = (stat.S_IFDIR | 0o755) if i % 10 == 0 else (stat.S_IFREG | 0o644)
+                attr.st_size = i * 37
+                attr.st_uid = attr.st_gid = 1000
+                attr.st_mtime = attr.st_atime = now - i
+                entries.append(attr)
+            cls._listing_cache[count] = entries
+        return cls._listing_cache[count]
+
+    def stat(self, path):
+        return self._stat(path, os.stat)
+
+    def lstat(self, path):
+        return self._stat(path, os.lstat)
+
+    def _stat(self, path, stat_func):
+        parts = self._synthetic(path)
+        if parts is not None:
+            attr = SFTPAttributes()
+            if parts[0] == "listing":
+                attr.st_mode = stat.S_IFDIR | 0o755
+            elif parts[0] == "blob" and len(parts) == 2:
+                attr.st_mode = stat.S_IFREG | 0o444
+                attr.st_size = int(parts[1])
+            else:
+                attr.st_mode = stat.S_IFREG | 0o644
+                attr.st_size = _SinkHandle.sizes.get(path, 0)
+            attr.st_mtime = attr.st_atime = int(time.time())
+            return attr
+        try:
+            return _attributes_from_stat(stat_func(path))
+        except OSError as e:
+            return _errno_result(e)
+
+    def open(self, path, flags, attr):
+        parts = self._synthetic(path)
+        if parts is not None:
+            if parts[0] == "blob" and len(parts) == 2:
+                return _ZeroHandle(int(parts[1]))
+            if parts[0] == "sink":
+                return _SinkHandle(path)
+            return SFTP_OP_UNSUPPORTED
+        try:
+            binary = getattr(os, "O_BINARY", 0)
+            mode = getattr(attr, "st_mode", None) or 0o666
+            fd = os.open(path, flags | binary, mode)
+        except OSError as e:
+            return _errno_result(e)
+        if flags & os.O_CREAT and attr is not None:
+            attr._flags &= ~attr.FLAG_PERMISSIONS
+            SFTPServer.set_file_attr(path, attr)
+        if flags & os.O_WRONLY:
+            fmode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            fmode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            fmode = "rb"
+        try:
+            fobj = os.fdopen(fd, fmode)
+        except OSError as e:
+            return _errno_result(e)
+        handle = _LocalHandle(path, flags)
+        handle.filename = path
+        handle.readfile = fobj
+        handle.writefile = fobj
+        return handle
+
+    def _call(self, func, *args):
+        try:
+            func(*args)
+        except OSError as e:
+            return _errno_result(e)
+        return SFTP_OK
+
+    def _sink_call(self, path, func, *args):
+        """sink下的文件只记录大小:删除、重命名(上传先写暂存文件再重命名)和改属性只更新记录"""
+        parts = self._synthetic(path)
+        if parts is None:
+            return None
+        if parts[0] != "sink":
+            return SFTP_OP_UNSUPPORTED
+        func(*args)
+        return SFTP_OK
+
+    def remove(self, path):
+        result = self._sink_call(path, _SinkHandle.sizes.pop, path, None)
+        if result is not None:
+            return result
+        return self._call(os.remove, path)
+
+    def rename(self, oldpath, newpath):
+        result = self._sink_call(oldpath, self._sink_rename, oldpath, newpath)
+        if result is not None:
+            return result
+        if os.path.exists(newpath):
+            return SFTPServer.convert_errno(17)
+        return self._call(os.rename, oldpath, newpath)
+
+    def posix_rename(self, oldpath, newpath):
+        result = self._sink_call(oldpath, self._sink_rename, oldpath, newpath)
+        if result is not None:
+            return result
+        return self._call(os.replace, oldpath, newpath)
+
+    @staticmethod
+    def _sink_rename(oldpath, newpath):
+        _SinkHandle.sizes[newpath] = _SinkHandle.sizes.pop(oldpath, 0)
+
+    def mkdir(self, path, attr):
+        result = self._call(os.mkdir, path)
+        if result == SFTP_OK and attr is not None:
+            SFTPServer.set_file_attr(path, attr)
+        return result
+
+    def rmdir(self, path):
+        return self._call(os.rmdir, path)
+
+    def chattr(self, path, attr):
+        result = self._sink_call(path, lambda: None)
+        if result is not None:
+            return result
+        try:
+            SFTPServer.set_file_attr(path, attr)
+        except OSError as e:
+            return _errno_result(e)
+        return SFTP_OK
+
+    def symlink(self, target_path, path):
+        return self._call(os.symlink, target_path, path)
+
+    def readlink(self, path):
+        try:
+            return os.readlink(path)
+        except OSError as e:
+            return _errno_result(e)
+
+
+class LoopbackSSHServer:
+    """在回环地址上运行的SSH/SFTP替身服务器"""
+
+    def __init__(self, latency=0.0, bandwidth=None, allow_exec=True, host="127.0.0.1", port=0,
+                 allow_forwarding=True):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.allow_exec = allow_exec
+        self.allow_forwarding = allow_forwarding
+        self.host = host
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self.port = self._listener.getsockname()[1]
+        self._transports = []
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        get_host_key()
+        self._listener.listen(64)
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        try:
+            self._listener.close()
+        except OSError:
+            pass
+        for transport in self._transports:
+            transport.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.latency or self.bandwidth:
+                client = ShapedSocket(client, self.latency, self.bandwidth)
+            transport = paramiko.Transport(client)
+            transport.add_server_key(get_host_key())
+            transport.set_subsystem_handler("sftp", _BatchingSFTPServer, _LocalSFTPServer)
+            self._transports.append(transport)
+            # start_server会等待密钥协商完成,放到独立线程避免阻塞后续连接
+            threading.Thread(target=self._serve, args=(transport,), daemon=True).start()
+
+    def _serve(self, transport):
+        try:
+            transport.start_server(server=_BenchServer(self, transport))
+        except (paramiko.SSHException, EOFError, OSError):
+            transport.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地回环SSH/SFTP替身服务器")
+    parser.add_argument("--port", type=int, default=2222)
+    parser.add_argument("--latency", type=float, default=0.0, help="注入的往返延迟(秒)")
+    parser.add_argument("--bandwidth", type=float, default=None, help="带宽上限(字节/秒)")
+    parser.add_argument("--no-exec", action="store_true", help="禁止exec_command(只允许SFTP)")
+    parser.add_argument("--no-forwarding", action="store_true", help="拒绝direct-tcpip通道(不能作为跳板机)")
+    args = parser.parse_args()
+
+    server = LoopbackSSHServer(args.latency, args.bandwidth, not args.no_exec, port=args.port,
+                               allow_forwarding=not args.no_forwarding).start()
+    print(f"监听 127.0.0.1:{server.port},密码: {PASSWORD}(Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,4289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH远程资源管理器 - 核心引擎
+
+与GUI无关的SSH/SFTP会话、目录列表、文件传输和远程命令执行.
+图形界面(ssh_gui_file_manager.py)只是它的一个客户端;脚本、批处理任务
+和命令行也可以直接使用,并可同时对多台主机并行操作.
+
+    from ssh_file_core import SSHSession
+    with SSHSession("example.com", "deploy").connect(password="...") as session:
+        for info in session.list_dir("/var/log"):
+            print(info['name'], info['size'])
+"""
+
+import argparse
+import codecs
+import collections
+import concurrent.futures
+import contextlib
+import datetime
+import errno
+import fnmatch
+import functools
+import getpass
+import gzip
+import hashlib
+import importlib
+import inspect
+import heapq
+import io
+import json
+import math
+import os
+import posixpath
+import queue
+import re
+import select
+import selectors
+import shlex
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+
+
+class _LazyModule:
+    """首次访问属性时才导入的模块
+    
+    paramiko连同其加密库的导入占启动时间的大部分,而启动界面和大部分命令行帮助并不需要它.
+    """
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+    
+    @property
+    def loaded(self):
+        return self._module is not None
+
+
+paramiko = _LazyModule('paramiko')
+_protocol = _LazyModule('paramiko.sftp')   # SFTP协议常量
+
+
+def warm_imports():
+    """在后台线程中预先导入paramiko,首次连接时不必再等待"""
+    thread = threading.Thread(target=lambda: (paramiko.Transport, _protocol.CMD_STAT), daemon=True)
+    thread.start()
+    return thread
+
+
+def _host_key_policy():
+    """兼容不同版本的 Paramiko 主机密钥策略"""
+    try:
+        # 尝试导入 AutoAddHostKeyPolicy(新版本)
+        return paramiko.AutoAddHostKeyPolicy()
+    except AttributeError:
+        pass
+    try:
+        # 尝试从 client 模块导入(某些版本)
+        from paramiko.client import AutoAddPolicy
+        return AutoAddPolicy()
+    except ImportError:
+        pass
+    
+    # 如果都不存在,创建自定义策略
+    class AutoAddHostKeyPolicy(paramiko.MissingHostKeyPolicy):
+        def missing_host_key(self, client, hostname, key):
+            # 自动接受所有主机密钥
+            pass
+    return AutoAddHostKeyPolicy()
+
+
+def format_size(size_bytes):
+    """格式化文件大小"""
+    if size_bytes == 0:
+        return "0 B"
+    
+    size_names = ["B", "KB", "MB", "GB", "TB"]
+    i = int(math.floor(math.log(size_bytes, 1024)))
+    p = math.pow(1024, i)
+    s = round(size_bytes / p, 2)
+    return f"{s} {size_names[i]}"
+
+
+def format_time(timestamp):
+    """格式化时间戳"""
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else 'Unknown'
+
+
+_DIGITS = re.compile(r'(\d+)')
+
+
+def natural_key(name):
+    """自然排序键:数字部分按数值比较,file2 排在 file10 之前"""
+    return tuple(int(part) if part.isdigit() else part for part in _DIGITS.split(name.lower()))
+
+
+class ListingView:
+    """目录列表的内存索引:排序和过滤都在本地完成,不会重新列目录
+    
+    每一列的排序键和排序结果在第一次按该列排序时计算并缓存(可在工作线程中
+    调用 prepare() 预先完成),之后切换列、升降序或修改过滤条件都只是线性遍历.
+    目录始终排在文件之前.
+    """
+    
+    COLUMNS = ('name', 'size', 'type', 'permissions', 'modified')
+    
+    def __init__(self, files, column='name', reverse=False, pattern=""):
+        self.files = {file_info['name']: file_info for file_info in files}
+        self.column = column
+        self.reverse = reverse
+        self.pattern = pattern
+        self._keys = {}
+        self._orders = {}
+        self.version = 0    # 每次 update()/remove() 加一
+    
+    def __len__(self):
+        return len(self.files)
+    
+    @staticmethod
+    def _sort_key(column, file_info):
+        if column == 'size':
+            return file_info['size']
+        if column == 'modified':
+            return file_info['attr'].st_mtime or 0 if 'attr' in file_info else file_info['modified']
+        if column == 'permissions':
+            return file_info['permissions']
+        if column == 'type':
+            return (posixpath.splitext(file_info['name'])[1].lower(), natural_key(file_info['name']))
+        return natural_key(file_info['name'])
+    
+    def _column_keys(self, column):
+        """一次算出整列的排序键;常用列直接取字段,避免逐条函数调用"""
+        items = self.files.items()
+        if column == 'size':
+            return {name: info['size'] for name, info in items}
+        if column == 'permissions':
+            return {name: info['permissions'] for name, info in items}
+        if column == 'name':
+            return {name: natural_key(name) for name in self.files}
+        return {name: self._sort_key(column, info) for name, info in items}
+    
+    def _order(self, column):
+        """按列排好序的 (目录名称, 其他名称) 两个列表"""
+        order = self._orders.get(column)
+        if order is None:
+            keys = self._keys.get(column)
+            if keys is None:
+                keys = self._column_keys(column)
+                self._keys[column] = keys
+            names = sorted(self.files, key=keys.__getitem__)
+            files = self.files
+            order = ([name for name in names if files[name]['type'] == 'directory'],
+                     [name for name in names if files[name]['type'] != 'directory'])
+            self._orders[column] = order
+        return order
+    
+    def prepare(self, columns=('name',)):
+        """预先计算指定列的排序结果(适合在工作线程中调用)"""
+        for column in columns:
+            self._order(column)
+        return self
+    
+    def adopt(self, other):
+        """采用另一个索引(在工作线程中由相同条目建立)已算好的排序结果,本索引中已有的列保持不变
+        
+        调用方需保证两者的条目相同,即本索引建立后没有 update()/remove() 过.
+        """
+        for column, keys in other._keys.items():
+            self._keys.setdefault(column, keys)
+        for column, order in other._orders.items():
+            self._orders.setdefault(column, order)
+    
+    def sort(self, column, reverse=None):
+        """按列排序;未指定reverse时,重复点击同一列切换升降序"""
+        if reverse is None:
+            reverse = not self.reverse if column == self.column else False
+        self.column = column
+        self.reverse = reverse
+    
+    def _matcher(self):
+        """过滤条件:含通配符时按glob匹配,否则为不区分大小写的子串匹配"""
+        pattern = self.pattern.lower()
+        if any(char in pattern for char in '*?['):
+            match = re.compile(fnmatch.translate(pattern)).match
+            return lambda name: match(name.lower()) is not None
+        return lambda name: pattern in name.lower()
+    
+    def matches(self, name):
+        return not self.pattern or self._matcher()(name)
+    
+    def rows(self):
+        """当前排序和过滤条件下的列表项"""
+        directories, others = self._order(self.column)
+        if self.reverse:
+            directories, others = directories[::-1], others[::-1]
+        names = directories + others
+        if self.pattern:
+            names = list(filter(self._matcher(), names))
+        files = self.files
+        return [files[name] for name in names]
+    
+    def update(self, file_info):
+        """加入或更新一个条目,只重算它自己的排序键"""
+        name = file_info['name']
+        self.files[name] = file_info
+        for column, keys in self._keys.items():
+            keys[name] = self._sort_key(column, file_info)
+        self._orders.clear()
+        self.version += 1
+    
+    def remove(self, name):
+        self.files.pop(name, None)
+        for keys in self._keys.values():
+            keys.pop(name, None)
+        self._orders.clear()
+        self.version += 1
+
+
+def list_local_dir(path):
+    """用os.scandir列出本地目录,返回与 SSHSession.list_dir 相同格式的文件信息
+    
+    scandir在Windows上随目录项一起返回属性,不必逐个stat;符号链接按目标的类型显示.
+    """
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                link_attr = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue  # 列目录期间被删除
+            attr = link_attr
+            file_info = {'name': entry.name}
+            if stat.S_ISLNK(link_attr.st_mode):
+                try:
+                    file_info['link_target'] = os.readlink(entry.path)
+                except OSError:
+                    file_info['link_target'] = ""
+                try:
+                    attr = entry.stat()
+                    file_info['broken'] = False
+                except OSError:
+                    file_info['broken'] = True
+            file_info.update({
+                'size': attr.st_size or 0,
+                'type': 'directory' if stat.S_ISDIR(attr.st_mode) else 'file',
+                'permissions': stat.filemode(link_attr.st_mode),
+                'modified': format_time(attr.st_mtime),
+                'attr': attr,
+            })
+            files.append(file_info)
+    files.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
+    return files
+
+
+def compare_listings(local_files, remote_files, tolerance=2):
+    """按大小和修改时间比较本地与远程目录(不计算哈希),返回 名称 -> 状态
+    
+    状态为 only_local / only_remote / newer_local / newer_remote / differs(时间相同大小不同) / same;
+    目录只比较是否两边都有. tolerance 为允许的时间误差(秒),FAT等文件系统只精确到2秒.
+    """
+    states = {}
+    for name, local in local_files.items():
+        remote = remote_files.get(name)
+        if remote is None:
+            states[name] = 'only_local'
+        elif local['type'] == 'directory' or remote['type'] == 'directory':
+            states[name] = 'same' if local['type'] == remote['type'] else 'differs'
+        else:
+            local_mtime = local['attr'].st_mtime if 'attr' in local else None
+            remote_mtime = remote['attr'].st_mtime if 'attr' in remote else None
+            if local_mtime is not None and remote_mtime is not None and abs(local_mtime - remote_mtime) > tolerance:
+                states[name] = 'newer_local' if local_mtime > remote_mtime else 'newer_remote'
+            elif local['size'] != remote['size']:
+                states[name] = 'differs'
+            else:
+                states[name] = 'same'
+    for name in remote_files:
+        if name not in local_files:
+            states[name] = 'only_remote'
+    return states
+
+
+class PerfRecorder:
+    """性能采集器
+    
+    按操作名统计耗时(对数分桶直方图,每2倍区间4个桶),保留最慢的若干次调用,
+    并记录Chrome trace格式的事件,可导出到JSON文件离线分析
+    (chrome://tracing 或 https://ui.perfetto.dev).
+    """
+    
+    BUCKETS_PER_OCTAVE = 4
+    
+    def __init__(self, slowest_limit=20, trace_limit=200000):
+        self.enabled = True
+        self.slowest_limit = slowest_limit
+        self._lock = threading.Lock()
+        self._histograms = {}   # 操作名 -> {桶序号: 次数}
+        self._totals = {}       # 操作名 -> [类别, 次数, 总耗时, 最大耗时]
+        self._slowest = []      # 最小堆: (耗时, 序号, 操作名, 详情)
+        self._sequence = 0
+        self._trace = collections.deque(maxlen=trace_limit)
+        self._epoch = time.perf_counter()
+    
+    @contextlib.contextmanager
+    def span(self, name, category="ui", detail=""):
+        """计时上下文"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, category, start, time.perf_counter() - start, detail)
+    
+    def record(self, name, category, start, duration, detail=""):
+        """记录一次调用(start为perf_counter时间,duration单位为秒)"""
+        if duration > 0:
+            bucket = int(math.floor(math.log2(duration * 1e6) * self.BUCKETS_PER_OCTAVE))
+        else:
+            bucket = 0
+        detail = str(detail)
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {})
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+            totals = self._totals.setdefault(name, [category, 0, 0.0, 0.0])
+            totals[1] += 1
+            totals[2] += duration
+            totals[3] = max(totals[3], duration)
+            
+            self._sequence += 1
+            entry = (duration, self._sequence, name, detail)
+            if len(self._slowest) < self.slowest_limit:
+                heapq.heappush(self._slowest, entry)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+            
+            self._trace.append((name, category, start, duration, threading.get_ident(), detail))
+    
+    def percentile(self, name, fraction):
+        """根据直方图估算分位数(返回秒,取所在桶的上界)"""
+        with self._lock:
+            histogram = dict(self._histograms.get(name, {}))
+            totals = self._totals.get(name)
+        if not histogram:
+            return 0.0
+        target = fraction * totals[1]
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            if seen >= target:
+                upper = 2 ** ((bucket + 1) / self.BUCKETS_PER_OCTAVE) / 1e6
+                return min(upper, totals[3])
+        return totals[3]
+    
+    def summary(self):
+        """各操作的统计摘要,按总耗时降序"""
+        with self._lock:
+            names = list(self._totals.items())
+        rows = []
+        for name, (category, count, total, maximum) in names:
+            rows.append({
+                'name': name,
+                'category': category,
+                'count': count,
+                'total': total,
+                'max': maximum,
+                'p50': self.percentile(name, 0.5),
+                'p99': self.percentile(name, 0.99)
+            })
+        rows.sort(key=lambda row: row['total'], reverse=True)
+        return rows
+    
+    def slowest(self):
+        """最慢的若干次调用,按耗时降序: [(耗时, 操作名, 详情)]"""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [(duration, name, detail) for duration, _, name, detail in entries]
+    
+    def reset(self):
+        """清空全部统计"""
+        with self._lock:
+            self._histograms.clear()
+            self._totals.clear()
+            self._slowest = []
+            self._trace.clear()
+    
+    def export_chrome_trace(self, path):
+        """导出Chrome trace格式(JSON)"""
+        pid = os.getpid()
+        with self._lock:
+            records = list(self._trace)
+        events = []
+        for name, category, start, duration, tid, detail in records:
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((start - self._epoch) * 1e6, 3),
+                'dur': round(duration * 1e6, 3),
+                'pid': pid,
+                'tid': tid
+            }
+            if detail:
+                event['args'] = {'detail': detail}
+            events.append(event)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        return len(events)
+
+
+class _InstrumentedProxy:
+    """透明代理:对目标对象的指定方法计时,其余属性原样转发"""
+    
+    def __init__(self, target, recorder, prefix, methods, wrap_results=None):
+        self._target = target
+        self._recorder = recorder
+        self._prefix = prefix
+        self._methods = methods
+        self._wrap_results = wrap_results or {}
+    
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name not in self._methods or not callable(attr):
+            return attr
+        
+        op_name = f"{self._prefix}.{name}"
+        wrap_result = self._wrap_results.get(name)
+        recorder = self._recorder
+        
+        def timed(*args, **kwargs):
+            detail = args[0] if args and isinstance(args[0], str) else ""
+            with recorder.span(op_name, "remote", detail):
+                result = attr(*args, **kwargs)
+            if wrap_result is not None:
+                result = wrap_result(result)
+            return result
+        return timed
+    
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+    
+    def __exit__(self, *exc_info):
+        return self._target.__exit__(*exc_info)
+    
+    def __iter__(self):
+        return iter(self._target)
+
+
+SSH_TIMED_METHODS = frozenset(['connect', 'exec_command', 'open_sftp'])
+SFTP_TIMED_METHODS = frozenset([
+    'listdir', 'listdir_attr', 'stat', 'lstat', 'open', 'get', 'put', 'getfo', 'putfo', 'mkdir', 'rmdir',
+    'remove', 'rename', 'posix_rename', 'readlink', 'symlink', 'chmod', 'chown', 'utime',
+    'normalize', 'getcwd'
+])
+SFTP_FILE_TIMED_METHODS = frozenset(['read', 'readv', 'write', 'stat', 'close', 'check'])
+
+
+def instrument_sftp_client(sftp_client, recorder):
+    """为SFTP会话及其打开的远程文件加上计时"""
+    def wrap_file(sftp_file):
+        return _InstrumentedProxy(sftp_file, recorder, "file", SFTP_FILE_TIMED_METHODS)
+    
+    return _InstrumentedProxy(sftp_client, recorder, "sftp", SFTP_TIMED_METHODS, {'open': wrap_file})
+
+
+def instrument_ssh_client(client, recorder):
+    """为SSHClient及其打开的SFTP会话、远程文件加上计时"""
+    return _InstrumentedProxy(client, recorder, "ssh", SSH_TIMED_METHODS,
+                              {'open_sftp': lambda sftp_client: instrument_sftp_client(sftp_client, recorder)})
+
+
+class TransferProgress:
+    """统计批量传输的文件数/字节数,并限频回调汇报文件/秒"""
+    
+    REPORT_INTERVAL = 0.5
+    
+    def __init__(self, label, on_progress=None):
+        self.label = label
+        self.on_progress = on_progress
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+    
+    def add(self, size):
+        self.files += 1
+        self.add_bytes(size)
+    
+    def add_bytes(self, size):
+        """只增加字节数(大文件传输中途的进度)"""
+        self.bytes += size
+        now = time.monotonic()
+        if now - self._last_report >= self.REPORT_INTERVAL:
+            self._last_report = now
+            self._report(now, done=False)
+    
+    def finish(self):
+        self._report(time.monotonic(), done=True)
+    
+    def _report(self, now, done):
+        if self.on_progress is None:
+            return
+        elapsed = max(now - self.started, 1e-6)
+        self.on_progress({
+            'label': self.label,
+            'files': self.files,
+            'bytes': self.bytes,
+            'files_per_sec': self.files / elapsed,
+            'done': done
+        })
+
+
+class BlockHasher:
+    """边传输边按固定大小分块计算哈希
+    
+    数据块交给后台线程计算:hashlib在处理大块数据时释放GIL,哈希与网络收发同时进行,
+    传输结束后不必重新读一遍文件.可同时计算多种算法(远程算法尚未确定时使用).
+    """
+    
+    QUEUE_CHUNKS = 256
+    
+    def __init__(self, algorithms=('sha256',), block_size=4 * 1024 * 1024):
+        self.algorithms = tuple(algorithms)
+        self.block_size = block_size
+        self.size = 0
+        self.blocks = {algorithm: [] for algorithm in self.algorithms}
+        self._queue = collections.deque()
+        self._ready = threading.Condition()
+        self._done = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def update(self, data):
+        """提交一段数据;后台线程积压过多时阻塞等待"""
+        with self._ready:
+            while len(self._queue) >= self.QUEUE_CHUNKS and self._error is None:
+                self._ready.wait()
+            self._queue.append(bytes(data))
+            self._ready.notify_all()
+    
+    def finish(self):
+        """等待全部数据计算完毕,返回 算法 -> [每块的十六进制摘要]"""
+        with self._ready:
+            self._done = True
+            self._ready.notify_all()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.blocks
+    
+    def _run(self):
+        hashes = None
+        filled = 0
+        try:
+            while True:
+                with self._ready:
+                    while not self._queue and not self._done:
+                        self._ready.wait()
+                    if not self._queue:
+                        break
+                    data = self._queue.popleft()
+                    self._ready.notify_all()
+                view = memoryview(data)
+                while view:
+                    if hashes is None:
+                        hashes = [hashlib.new(algorithm) for algorithm in self.algorithms]
+                        filled = 0
+                    piece = view[:self.block_size - filled]
+                    for hash_obj in hashes:
+                        hash_obj.update(piece)
+                    filled += len(piece)
+                    self.size += len(piece)
+                    view = view[len(piece):]
+                    if filled == self.block_size:
+                        self._close_block(hashes)
+                        hashes = None
+            if hashes is not None:
+                self._close_block(hashes)
+        except Exception as e:
+            with self._ready:
+                self._error = e
+                self._ready.notify_all()
+    
+    def _close_block(self, hashes):
+        for algorithm, hash_obj in zip(self.algorithms, hashes):
+            self.blocks[algorithm].append(hash_obj.hexdigest())
+
+
+class _HashingFile:
+    """包装本地文件:经过的数据同时交给BlockHasher(供getfo写入或putfo读取)"""
+    
+    def __init__(self, fileobj, hasher):
+        self._file = fileobj
+        self._hasher = hasher
+    
+    def write(self, data):
+        self._hasher.update(data)
+        return self._file.write(data)
+    
+    def read(self, size=-1):
+        data = self._file.read(size)
+        if data:
+            self._hasher.update(data)
+        return data
+
+
+class BufferPool:
+    """固定数量、固定大小的可复用缓冲区;全部借出时 acquire 阻塞,形成背压"""
+    
+    def __init__(self, count=16, size=32768):
+        self.size = size
+        self._free = [bytearray(size) for _ in range(count)]
+        self._available = threading.Condition()
+    
+    def acquire(self):
+        with self._available:
+            while not self._free:
+                self._available.wait()
+            return self._free.pop()
+    
+    def release(self, buffer):
+        with self._available:
+            self._free.append(buffer)
+            self._available.notify()
+
+
+class FileSink:
+    """写入本地文件;传入已打开的二进制文件对象(如标准输出)时只刷新不关闭"""
+    
+    def __init__(self, path):
+        self._owned = isinstance(path, (str, bytes, os.PathLike))
+        self._file = open(path, 'wb') if self._owned else path
+    
+    def write(self, data):
+        self._file.write(data)
+    
+    def close(self):
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+class CommandSink:
+    """写入本地命令的标准输入(如解压程序 `zstd -d -o out` 或 `tar xzf - -C dir`)"""
+    
+    def __init__(self, command):
+        self.command = command
+        self._process = subprocess.Popen(command, shell=isinstance(command, str), stdin=subprocess.PIPE)
+    
+    def write(self, data):
+        self._process.stdin.write(data)
+    
+    def close(self):
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        exit_code = self._process.wait()
+        if exit_code != 0:
+            raise IOError(f"本地命令退出码 {exit_code}: {self.command}")
+
+
+class HashSink:
+    """只计算校验和,不保存数据"""
+    
+    def __init__(self, algorithm='sha256'):
+        self.algorithm = algorithm
+        self._hash = hashlib.new(algorithm)
+    
+    def write(self, data):
+        self._hash.update(data)
+    
+    def close(self):
+        pass
+    
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class ArchiveWriter:
+    """把多个远程文件依次流式写入一个本地归档(.zip、.tar、.tar.gz/.tgz)
+    
+    每个成员通过 open_member 得到一个sink;tar成员头在数据之前写出,数据不经临时文件.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        lower = path.lower()
+        if lower.endswith('.zip'):
+            self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+            self._file = None
+        else:
+            self._zip = None
+            self._raw = self._file = open(path, 'wb')
+            if lower.endswith(('.tar.gz', '.tgz')):
+                self._file = gzip.GzipFile(fileobj=self._raw, mode='wb')
+    
+    @contextlib.contextmanager
+    def open_member(self, name, size, mtime=None, mode=0o644):
+        """写入一个成员;size 必须是实际写入的字节数(tar头中预先记录)"""
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, time.localtime(mtime or time.time())[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = (stat.S_IFREG | mode) << 16
+            with self._zip.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as member:
+                yield member
+            return
+        
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = mtime or time.time()
+        info.mode = mode
+        self._file.write(info.tobuf(tarfile.PAX_FORMAT))
+        counter = _CountingSink(self._file)
+        yield counter
+        if counter.count != size:
+            raise IOError(f"{name}: 预期 {size} 字节,实际 {counter.count} 字节(文件在下载期间被修改?)")
+        remainder = size % tarfile.BLOCKSIZE
+        if remainder:
+            self._file.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+    
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            return
+        # tar结尾:两个全零块
+        self._file.write(tarfile.NUL * (tarfile.BLOCKSIZE * 2))
+        self._file.close()
+        self._raw.close()
+
+
+class _RemoteRangeFile:
+    """远程文件的只读随机访问包装,供zipfile使用
+    
+    每次读取最少取 READ_AHEAD 字节并缓存(zipfile会连续读取很小的头部);
+    超过一个SFTP请求大小的读取用readv同时发出所有请求,只需一次往返.
+    """
+    
+    READ_AHEAD = 64 * 1024
+    
+    def __init__(self, remote_file, size):
+        self._file = remote_file
+        self.size = size
+        self.bytes_read = 0          # 实际从服务器读取的字节数
+        self._pos = 0
+        self._buffer_start = 0
+        self._buffer = b""
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return self._pos
+    
+    def seek(self, offset, whence=0):
+        base = {0: 0, 1: self._pos, 2: self.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+    
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = self.size - self._pos
+        n = min(n, self.size - self._pos)
+        if n <= 0:
+            return b""
+        start = self._pos - self._buffer_start
+        if not (0 <= start and start + n <= len(self._buffer)):
+            length = min(max(n, self.READ_AHEAD), self.size - self._pos)
+            if length <= paramiko.SFTPFile.MAX_REQUEST_SIZE:
+                self._file.seek(self._pos)
+                data = self._file.read(length)
+            else:
+                data = b"".join(self._file.readv([(self._pos, length)]))
+            self.bytes_read += len(data)
+            self._buffer_start, self._buffer, start = self._pos, data, 0
+        data = self._buffer[start:start + n]
+        self._pos += len(data)
+        return data
+    
+    def close(self):
+        self._file.close()
+
+
+class RemoteArchive:
+    """浏览远程归档而不下载整个文件
+    
+    zip: 用SFTP范围读取文件末尾的中央目录,提取成员时只读取该成员的压缩数据;
+    tar(含 .tar.gz 等): 在服务器上用tar列出成员,提取时由远程tar解出单个成员再流式传回;
+    单独的 .gz 文件视为只有一个成员的归档,流式读取并在本地解压.
+    """
+    
+    ZIP_SUFFIXES = ('.zip', '.jar', '.war', '.whl')
+    TAR_FLAGS = (('.tar.gz', 'z'), ('.tgz', 'z'), ('.tar.bz2', 'j'), ('.tbz2', 'j'), ('.tbz', 'j'),
+                 ('.tar.xz', 'J'), ('.txz', 'J'), ('.tar', ''))
+    EXTRACT_CHUNK = 4 * 1024 * 1024
+    # GNU tar / busybox tar -tv 的输出: 权限 属主/组 大小 日期 时间 名称
+    TAR_LINE = re.compile(r'^(?P<mode>[-dlhcbps][-rwxsStT]{9})\s+\S+\s+(?P<size>\d+)\s+'
+                          r'(?P<date>\d{4}-\d\d-\d\d)\s+(?P<time>\d\d:\d\d(?::\d\d)?)\s(?P<name>.*)$')
+    # LC_ALL=C 下tar把非ASCII字节和控制字符写成 \ooo 或C转义
+    TAR_ESCAPE = re.compile(r'\\(?:([0-7]{3})|(.))')
+    TAR_ESCAPES = {'a': 7, 'b': 8, 'f': 12, 'n': 10, 'r': 13, 't': 9, 'v': 11}
+    
+    def __init__(self, session, path):
+        self.session = session
+        self.path = path
+        self.kind, self._tar_flag = self.kind_of(path)
+        if self.kind is None:
+            raise ValueError(f"不支持的归档格式: {posixpath.basename(path)}")
+        self.members = {}            # 归档内路径 -> 成员信息
+        self.gnu_tar = False
+        self._zip = None
+        self._range_file = None
+        self._load()
+    
+    @classmethod
+    def kind_of(cls, path):
+        """按扩展名判断归档类型,返回 (类型, tar压缩参数);不支持时类型为None"""
+        name = path.lower()
+        if name.endswith(cls.ZIP_SUFFIXES):
+            return 'zip', None
+        for suffix, flag in cls.TAR_FLAGS:
+            if name.endswith(suffix):
+                return 'tar', flag
+        if name.endswith('.gz'):
+            return 'gzip', None
+        return None, None
+    
+    @property
+    def bytes_read(self):
+        """浏览zip时从服务器读取的字节数"""
+        return self._range_file.bytes_read if self._range_file is not None else 0
+    
+    def _add(self, name, size, is_dir, mode, mtime, link_target=None, raw_name=None):
+        name = name.strip('/')
+        while name.startswith('./'):
+            name = name[2:]
+        if not name or name == '.':
+            return
+        self.members[name] = {'name': name, 'raw_name': raw_name or name, 'size': size,
+                              'type': 'directory' if is_dir else 'file', 'mode': mode,
+                              'mtime': mtime, 'link_target': link_target}
+        # 补上没有单独记录的上级目录
+        parent = posixpath.dirname(name)
+        while parent and parent not in self.members:
+            self.members[parent] = {'name': parent, 'raw_name': parent, 'size': 0, 'type': 'directory',
+                                    'mode': stat.S_IFDIR | 0o755, 'mtime': mtime, 'link_target': None}
+            parent = posixpath.dirname(parent)
+    
+    def _load(self):
+        with self.session.perf.span("archive.list", "archive", self.path):
+            if self.kind == 'zip':
+                self._load_zip()
+            elif self.kind == 'tar':
+                self._load_tar()
+            else:
+                attr = self.session.sftp_client.stat(self.path)
+                name = posixpath.basename(self.path)[:-3]
+                self._add(name, None, False, attr.st_mode, attr.st_mtime)
+    
+    def _load_zip(self):
+        size = self.session.sftp_client.stat(self.path).st_size
+        self._range_file = _RemoteRangeFile(self.session.sftp_client.open(self.path, 'rb'), size)
+        try:
+            self._zip = zipfile.ZipFile(self._range_file)
+        except Exception:
+            self._range_file.close()
+            raise
+        for info in self._zip.infolist():
+            mode = info.external_attr >> 16
+            if not mode:
+                mode = (stat.S_IFDIR | 0o755) if info.is_dir() else (stat.S_IFREG | 0o644)
+            self._add(info.filename, info.file_size, info.is_dir(), mode,
+                      time.mktime(info.date_time + (0, 0, -1)), raw_name=info.filename)
+    
+    def _load_tar(self):
+        if not self.session.check_bundle_support():
+            raise IOError("服务器不允许执行命令,无法在服务器端读取tar归档")
+        path = shlex.quote(self.path)
+        result = self.session.exec_command(
+            f"tar --version 2>/dev/null | head -n 1; LC_ALL=C tar -tv{self._tar_flag}f {path}")
+        if result['exit_code'] != 0:
+            raise IOError(f"远程tar退出码 {result['exit_code']}: {result['stderr'].strip()}")
+        lines = result['stdout'].splitlines()
+        self.gnu_tar = bool(lines) and 'GNU tar' in lines[0]
+        for line in lines:
+            match = self.TAR_LINE.match(line)
+            if match is None:
+                continue
+            mode_text, raw_name = match.group('mode'), match.group('name')
+            link_target = None
+            if mode_text[0] == 'l' and ' -> ' in raw_name:
+                raw_name, link_target = raw_name.split(' -> ', 1)
+            elif mode_text[0] == 'h' and ' link to ' in raw_name:
+                raw_name, link_target = raw_name.split(' link to ', 1)
+            # 转义形式只用作 tar -xO 的成员参数(GNU tar会反转义),显示和保存用解码后的名字
+            name = self._unescape_tar_name(raw_name)
+            if link_target is not None:
+                link_target = self._unescape_tar_name(link_target)
+            clock = match.group('time') + ('' if match.group('time').count(':') == 2 else ':00')
+            try:
+                mtime = time.mktime(time.strptime(f"{match.group('date')} {clock}", "%Y-%m-%d %H:%M:%S"))
+            except (ValueError, OverflowError):
+                mtime = 0
+            is_dir = mode_text[0] == 'd'
+            kind = stat.S_IFDIR if is_dir else stat.S_IFLNK if mode_text[0] == 'l' else stat.S_IFREG
+            mode = kind | self._parse_mode(mode_text)
+            self._add(name, int(match.group('size')), is_dir, mode, mtime, link_target, raw_name=raw_name)
+    
+    @classmethod
+    def _unescape_tar_name(cls, text):
+        """还原tar列表中转义的名字,按UTF-8解码"""
+        if '\\' not in text:
+            return text
+        data = bytearray()
+        position = 0
+        for match in cls.TAR_ESCAPE.finditer(text):
+            data += text[position:match.start()].encode('utf-8')
+            octal, char = match.groups()
+            if octal is not None:
+                data.append(int(octal, 8) & 0xFF)
+            elif char in cls.TAR_ESCAPES:
+                data.append(cls.TAR_ESCAPES[char])
+            else:
+                data += char.encode('utf-8')
+            position = match.end()
+        data += text[position:].encode('utf-8')
+        return data.decode('utf-8', errors='replace')
+    
+    @staticmethod
+    def _parse_mode(text):
+        bits = 0
+        for index, char in enumerate(text[1:]):
+            if char not in '-ST':
+                bits |= 1 << (8 - index)
+        return bits
+    
+    def list_dir(self, directory=""):
+        """列出归档内目录,返回与 SSHSession.list_dir 相同格式的文件信息(另含归档内路径'path')"""
+        directory = directory.strip('/')
+        files = []
+        for name, member in self.members.items():
+            if posixpath.dirname(name) != directory:
+                continue
+            file_info = {
+                'name': posixpath.basename(name),
+                'path': name,
+                'size': member['size'] or 0,
+                'type': member['type'],
+                'permissions': stat.filemode(member['mode']),
+                'modified': format_time(member['mtime']),
+            }
+            if member['link_target'] is not None:
+                file_info['link_target'] = member['link_target']
+            files.append(file_info)
+        files.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
+        return files
+    
+    def extract(self, name, sink, on_progress=None):
+        """把一个成员写入sink(完成后关闭sink),返回字节数"""
+        member = self.members[name]
+        if member['type'] == 'directory':
+            raise IsADirectoryError(name)
+        progress = TransferProgress(f"从归档提取 {posixpath.basename(name)}", on_progress)
+        try:
+            with self.session.perf.span("archive.extract", "archive", name):
+                if self.kind == 'zip':
+                    self._extract_zip(member, sink, progress)
+                elif self.kind == 'tar':
+                    self._extract_tar(member, sink, progress)
+                else:
+                    self._extract_gzip(sink, progress)
+        except Exception:
+            try:
+                sink.close()
+            except Exception:
+                pass
+            raise
+        sink.close()
+        progress.add(0)
+        progress.finish()
+        return progress.bytes
+    
+    def _extract_zip(self, member, sink, progress):
+        # zipfile校验CRC;读取压缩数据时每次取一大块,由readv流水线发出
+        with self._zip.open(member['raw_name']) as source:
+            for chunk in iter(lambda: source.read(self.EXTRACT_CHUNK), b""):
+                sink.write(chunk)
+                progress.add_bytes(len(chunk))
+    
+    def _extract_tar(self, member, sink, progress):
+        # GNU tar找到第一个匹配的成员后即停止,不必读完整个归档
+        occurrence = "--occurrence=1 " if self.gnu_tar else ""
+        command = (f"tar -xO{self._tar_flag}f {shlex.quote(self.path)} {occurrence}"
+                   f"-- {shlex.quote(member['raw_name'])}")
+        stdin, stdout, stderr = self.session.ssh_client.exec_command(command)
+        stdin.close()
+        channel = stdout.channel
+        for chunk in iter(lambda: channel.recv(self.EXTRACT_CHUNK), b""):
+            sink.write(chunk)
+            progress.add_bytes(len(chunk))
+        exit_code = channel.recv_exit_status()
+        if exit_code != 0:
+            error_msg = stderr.read().decode('utf-8', errors='ignore').strip()
+            raise IOError(f"远程tar退出码 {exit_code}: {error_msg}")
+    
+    def _extract_gzip(self, sink, progress):
+        # 只传输压缩数据,在写入线程中解压
+        inflater = _InflateSink(sink)
+        with self.session._streaming(progress.label) as (sftp, writer, stream_progress):
+            self.session._stream_file(sftp, self.path, inflater, writer, stream_progress)
+            writer.drain()
+        inflater.finish()
+        progress.add_bytes(inflater.size)
+    
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if self._range_file is not None:
+            self._range_file.close()
+            self._range_file = None
+
+
+class _InflateSink:
+    """边接收gzip数据边解压后写入下一个sink(不关闭它)"""
+    
+    def __init__(self, sink):
+        self._sink = sink
+        self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.size = 0
+    
+    def write(self, data):
+        out = self._inflater.decompress(data)
+        self.size += len(out)
+        self._sink.write(out)
+    
+    def close(self):
+        pass
+    
+    def finish(self):
+        out = self._inflater.flush()
+        self.size += len(out)
+        self._sink.write(out)
+        if not self._inflater.eof:
+            raise IOError("gzip数据不完整")
+
+
+class _CountingSink:
+    """统计写入的字节数"""
+    
+    def __init__(self, target):
+        self._target = target
+        self.count = 0
+    
+    def write(self, data):
+        self.count += len(data)
+        self._target.write(data)
+
+
+class _SinkWriter:
+    """后台线程按顺序把缓冲区写入sink,写完立即把缓冲区还给池子
+    
+    读取方从池中借缓冲区;sink较慢时缓冲区全部在队列中,读取方阻塞在acquire上,
+    不再收取新的数据,内存占用始终不超过池的大小.
+    """
+    
+    def __init__(self, pool):
+        self.pool = pool
+        self.error = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def put(self, sink, buffer, length):
+        if self.error is not None:
+            self.pool.release(buffer)
+            raise self.error
+        self._queue.put((sink, buffer, length))
+    
+    def drain(self):
+        """等待已提交的数据全部写入"""
+        self._queue.join()
+        if self.error is not None:
+            raise self.error
+    
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            sink, buffer, length = item
+            try:
+                if self.error is None:
+                    with memoryview(buffer) as view:
+                        sink.write(view[:length])
+            except Exception as e:
+                self.error = e
+            finally:
+                self.pool.release(buffer)
+                self._queue.task_done()
+
+
+class _Responses:
+    """收集流水线请求的回复"""
+    
+    def __init__(self):
+        self.items = []
+    
+    def _async_response(self, t, msg, num):
+        self.items.append((num, t, msg))
+
+
+class PipelinedRequests:
+    """SFTP请求流水线:先连续发出一批请求、再统一收取回复
+    
+    SFTPClient的常规方法每个请求都要等待一次往返;一批N个lstat/readlink
+    通过流水线大约只需一次往返. window 限制同时在途的请求数.
+    """
+    
+    def __init__(self, sftp_client, window=64):
+        self.sftp = sftp_client
+        self.window = window
+        self._pending = {}
+        self._replies = {}
+    
+    def _async_response(self, t, msg, num):
+        """由SFTPClient在收到属于本批次的回复时回调"""
+        self._replies[self._pending.pop(num)] = (t, msg)
+    
+    def run(self, requests):
+        """执行 [(key, 命令, 参数...)] 形式的请求,返回 key -> (回复类型, 消息)"""
+        queue = collections.deque(requests)
+        self._replies = {}
+        while queue or self._pending:
+            while queue and len(self._pending) < self.window:
+                key, command, *args = queue.popleft()
+                num = self.sftp._async_request(self, command, *args)
+                self._pending[num] = key
+            self.sftp._read_response()
+        return self._replies
+    
+    def stat_many(self, paths, follow=True):
+        """批量stat(follow=False时为lstat),失败的路径对应None"""
+        command = _protocol.CMD_STAT if follow else _protocol.CMD_LSTAT
+        replies = self.run([(path, command, path) for path in paths])
+        return {path: paramiko.SFTPAttributes._from_msg(msg) if t == _protocol.CMD_ATTRS else None
+                for path, (t, msg) in replies.items()}
+    
+    def resolve_links(self, paths):
+        """同一批次中对每个链接发出stat和readlink,返回 路径 -> (链接目标, 目标属性或None)"""
+        requests = []
+        for path in paths:
+            requests.append(((path, 'stat'), _protocol.CMD_STAT, path))
+            requests.append(((path, 'link'), _protocol.CMD_READLINK, path))
+        replies = self.run(requests)
+        resolved = {}
+        for path in paths:
+            t, msg = replies[(path, 'stat')]
+            target_attr = paramiko.SFTPAttributes._from_msg(msg) if t == _protocol.CMD_ATTRS else None
+            t, msg = replies[(path, 'link')]
+            target = None
+            if t == _protocol.CMD_NAME and msg.get_int() == 1:
+                target = msg.get_string().decode('utf-8', errors='replace')
+            resolved[path] = (target, target_attr)
+        return resolved
+    
+    def readlink_many(self, paths):
+        """批量读取符号链接目标,失败的路径对应None"""
+        replies = self.run([(path, _protocol.CMD_READLINK, path) for path in paths])
+        targets = {}
+        for path, (t, msg) in replies.items():
+            target = None
+            if t == _protocol.CMD_NAME and msg.get_int() == 1:
+                target = msg.get_string().decode('utf-8', errors='replace')
+            targets[path] = target
+        return targets
+    
+    @staticmethod
+    def _status(t, msg):
+        """把STATUS回复转换为 (状态码, 异常或None)"""
+        if t != _protocol.CMD_STATUS:
+            return None, IOError(f"意外的SFTP回复类型 {t}")
+        code = msg.get_int()
+        text = msg.get_text()
+        if code == _protocol.SFTP_OK:
+            return code, None
+        if code == _protocol.SFTP_NO_SUCH_FILE:
+            return code, IOError(errno.ENOENT, text)
+        if code == _protocol.SFTP_PERMISSION_DENIED:
+            return code, IOError(errno.EACCES, text)
+        return code, IOError(text)
+    
+    def mutate(self, requests):
+        """执行只返回状态的请求(重命名、setstat、symlink等),返回 key -> (状态码, 异常或None)"""
+        return {key: self._status(t, msg) for key, (t, msg) in self.run(requests).items()}
+    
+    def rename_many(self, pairs, posix=True):
+        """批量重命名 [(旧路径, 新路径)],返回 旧路径 -> (状态码, 异常或None)
+        
+        posix=True 时使用 posix-rename@openssh.com 扩展(原子覆盖已存在的目标);
+        服务器不支持该扩展时整批改用标准RENAME重发,并把 self.posix_rename 置为False.
+        """
+        pairs = list(pairs)
+        self.posix_rename = posix
+        if posix:
+            results = self.mutate([(old, _protocol.CMD_EXTENDED, 'posix-rename@openssh.com', old, new)
+                                   for old, new in pairs])
+            if not any(code == _protocol.SFTP_OP_UNSUPPORTED for code, error in results.values()):
+                return results
+            self.posix_rename = False
+        return self.mutate([(old, _protocol.CMD_RENAME, old, new) for old, new in pairs])
+    
+    def setstat_many(self, attributes):
+        """批量设置属性 {路径: SFTPAttributes},返回 路径 -> 异常或None"""
+        results = self.mutate([(path, _protocol.CMD_SETSTAT, path, attr) for path, attr in attributes.items()])
+        return {path: error for path, (code, error) in results.items()}
+    
+    def symlink_many(self, links):
+        """批量创建符号链接 [(链接目标, 链接路径)],返回 链接路径 -> 异常或None"""
+        # 与SFTPClient.symlink相同的参数顺序:先链接目标,后链接路径
+        results = self.mutate([(path, _protocol.CMD_SYMLINK, target, path) for target, path in links])
+        return {path: error for path, (code, error) in results.items()}
+
+
+class LinkStats:
+    """连接的吞吐量与往返时间,并据此调整传输的并发度
+    
+    字节数在传输层收发时累计(包含所有通道);往返时间来自keepalive探测(SSHSession.probe).
+    带宽时延积越大,流式下载的在途请求窗口和并行上传数越大;平滑后的往返时间明显
+    高于最小往返时间(链路排队拥塞)时减半.
+    """
+    
+    CHUNK = 32 * 1024                  # 每个SFTP读请求的大小(服务器普遍限制为32KB)
+    MIN_CHANNEL_WINDOW = 2 * 1024 * 1024   # 新开SFTP通道的最小流控窗口(paramiko的默认值)
+    MIN_WINDOW, MAX_WINDOW = 16, 1024  # 流式下载在途读请求数的范围(512KB到32MB)
+    MIN_WORKERS, MAX_WORKERS = 1, 16   # 并行上传通道数的范围
+    WORKER_RTT = 0.02                  # 往返时间每增加这么多秒多开一个上传通道
+    CONGESTION_FACTOR = 2.0            # 平滑往返时间超过最小值的这个倍数即视为拥塞
+    PEAK_DECAY = 0.95                  # 峰值速率每次采样的衰减,链路变慢后窗口随之收缩
+    
+    def __init__(self, window=128, workers=4):
+        self.default_window = window
+        self.default_workers = workers
+        self.window = window
+        self.workers = workers
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rate_sent = 0.0
+        self.rate_received = 0.0
+        self.peak_rate = 0.0
+        self.rtt = None
+        self.rtt_min = None
+        self.srtt = None
+        self._last_sample = (time.monotonic(), 0, 0)
+        self._lock = threading.Lock()
+    
+    def attach(self, transport):
+        """包装传输层的读写以统计字节数;新连接的路径可能不同,往返时间重新统计"""
+        packetizer = transport.packetizer
+        write_all, read_all = packetizer.write_all, packetizer.read_all
+        
+        def counted_write(out):
+            # Packetizer在写锁内调用,无需另外加锁
+            self.bytes_sent += len(out)
+            return write_all(out)
+        
+        def counted_read(n, check_rekey=False):
+            data = read_all(n, check_rekey)
+            self.bytes_received += len(data)
+            return data
+        packetizer.write_all = counted_write
+        packetizer.read_all = counted_read
+        with self._lock:
+            self.rtt = self.rtt_min = self.srtt = None
+            self._retune()
+    
+    def add_rtt(self, rtt):
+        """记录一次探测的往返时间"""
+        with self._lock:
+            self.rtt = rtt
+            self.rtt_min = rtt if self.rtt_min is None else min(self.rtt_min, rtt)
+            self.srtt = rtt if self.srtt is None else 0.8 * self.srtt + 0.2 * rtt
+            self._retune()
+    
+    def sample(self):
+        """计算自上次采样以来的收发速率(由调用方定时调用,如界面每秒一次)"""
+        now = time.monotonic()
+        with self._lock:
+            last_time, last_sent, last_received = self._last_sample
+            elapsed = now - last_time
+            if elapsed < 0.1:
+                return
+            sent, received = self.bytes_sent, self.bytes_received
+            self.rate_sent = (sent - last_sent) / elapsed
+            self.rate_received = (received - last_received) / elapsed
+            self._last_sample = (now, sent, received)
+            self.peak_rate = max(self.rate_sent, self.rate_received, self.peak_rate * self.PEAK_DECAY)
+            self._retune()
+    
+    @property
+    def congested(self):
+        """平滑往返时间明显高于最小往返时间"""
+        if self.srtt is None:
+            return False
+        return self.srtt > max(self.rtt_min * self.CONGESTION_FACTOR, self.rtt_min + 0.005)
+    
+    def _retune(self):
+        if self.rtt_min is None:
+            self.window, self.workers = self.default_window, self.default_workers
+            return
+        # 窗口覆盖两倍的带宽时延积:速率受窗口限制时,每次采样后窗口最多翻倍,逐步探到链路上限
+        bdp = self.peak_rate * max(self.rtt_min, 0.001)
+        window = max(self.default_window, math.ceil(2 * bdp / self.CHUNK))
+        # 小文件上传受往返次数限制,延迟越高越需要并行
+        workers = self.default_workers + int(self.rtt_min / self.WORKER_RTT)
+        if self.congested:
+            window, workers = window // 2, workers // 2
+        self.window = min(max(window, self.MIN_WINDOW), self.MAX_WINDOW)
+        self.workers = min(max(workers, self.MIN_WORKERS), self.MAX_WORKERS)
+    
+    @property
+    def channel_window(self):
+        """新开通道的SSH流控窗口(字节):容纳全部在途读请求,否则窗口先于流水线成为瓶颈"""
+        return max(self.MIN_CHANNEL_WINDOW, (self.window + 8) * self.CHUNK)
+    
+    def snapshot(self):
+        """供界面显示的当前数值"""
+        with self._lock:
+            return {'rate_sent': self.rate_sent, 'rate_received': self.rate_received,
+                    'bytes_sent': self.bytes_sent, 'bytes_received': self.bytes_received,
+                    'rtt': self.rtt, 'rtt_min': self.rtt_min, 'congested': self.congested,
+                    'window': self.window, 'workers': self.workers}
+
+
+class RemoteAgent:
+    """远程辅助程序的客户端
+    
+    辅助程序(ssh_remote_agent.py)上传到远程主机后由python3运行,经exec通道的标准输入/输出
+    交换长度前缀的JSON帧.递归列目录、批量stat、批量删除、建目录、哈希和du不论涉及多少文件
+    都只需一次往返;远程没有shell或python3时启动失败,由调用方改用SFTP.
+    """
+    
+    SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ssh_remote_agent.py")
+    REMOTE_DIR = ".cache/ssh_file_manager"   # 相对远程主目录
+    COMPRESSED = 0x80000000                  # 帧长度的最高位:负载经过zlib压缩
+    COMPRESS_OVER = 4096                     # 超过这个大小的请求压缩后发送
+    
+    def __init__(self, channel):
+        self.channel = channel
+        self.hello = None
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def start(cls, session, timeout=10):
+        """按需上传脚本并启动,完成握手后返回;远程无法运行时抛出IOError
+        
+        远程文件名带脚本内容的摘要:版本不变时直接复用,多个会话同时上传也只会原子地覆盖为相同内容.
+        """
+        with open(cls.SOURCE, "rb") as f:
+            source = f.read()
+        sftp = session.sftp_client
+        home = sftp.normalize(".")
+        directory = posixpath.join(home, cls.REMOTE_DIR)
+        path = posixpath.join(directory, f"agent-{hashlib.sha1(source).hexdigest()[:12]}.py")
+        try:
+            sftp.stat(path)
+        except IOError:
+            try:
+                sftp.mkdir(directory, 0o700)
+            except IOError:
+                # 目录已存在,或上级目录(如 ~/.cache)还不存在:从主目录开始逐级创建
+                parent = home
+                for part in cls.REMOTE_DIR.split("/"):
+                    parent = posixpath.join(parent, part)
+                    try:
+                        sftp.mkdir(parent, 0o700)
+                    except IOError:
+                        pass  # 已存在
+            temp_path = SSHSession.staging_path(path)
+            sftp.putfo(io.BytesIO(source), temp_path)
+            error = session.rename_many([(temp_path, path)])[temp_path]
+            if error is not None:
+                session._discard([temp_path])
+                raise error
+        
+        channel = session.ssh_client.get_transport().open_session()
+        agent = cls(channel)
+        try:
+            channel.settimeout(timeout)
+            channel.exec_command(f"exec python3 {shlex.quote(path)}")
+            agent.hello = agent._receive()
+            channel.settimeout(None)
+        except Exception as e:
+            detail = ""
+            if channel.recv_stderr_ready():
+                detail = channel.recv_stderr(4096).decode('utf-8', errors='ignore').strip()
+            channel.close()
+            raise IOError(f"远程辅助程序无法启动: {detail or e}")
+        return agent
+    
+    @property
+    def alive(self):
+        return not self.channel.closed and not self.channel.exit_status_ready()
+    
+    def close(self):
+        try:
+            self.channel.close()
+        except Exception:
+            pass
+    
+    def _receive_exact(self, size):
+        chunks = []
+        while size:
+            data = self.channel.recv(min(size, 1024 * 1024))
+            if not data:
+                raise EOFError("远程辅助程序已退出")
+            chunks.append(data)
+            size -= len(data)
+        return b"".join(chunks)
+    
+    def _receive(self):
+        length, = struct.unpack(">I", self._receive_exact(4))
+        payload = self._receive_exact(length & ~self.COMPRESSED)
+        if length & self.COMPRESSED:
+            payload = zlib.decompress(payload)
+        return json.loads(payload.decode('utf-8'))
+    
+    def _send(self, message):
+        payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+        length = len(payload)
+        if length > self.COMPRESS_OVER:
+            payload = zlib.compress(payload, 1)
+            length = len(payload) | self.COMPRESSED
+        self.channel.sendall(struct.pack(">I", length) + payload)
+    
+    @staticmethod
+    def error(value):
+        """把回复中的 [errno, 说明] 转换为IOError"""
+        code, message = value
+        return IOError(code, message) if code is not None else IOError(message)
+    
+    def call(self, op, **params):
+        """执行一个操作并返回结果;操作本身失败时抛出IOError,通道断开时抛出EOFError"""
+        with self._lock:
+            self._send(dict(params, op=op))
+            reply = self._receive()
+        if 'error' in reply:
+            raise self.error(reply['error'])
+        return reply['result']
+
+
+def _idempotent(method):
+    """标记幂等操作:执行中连接断开时自动重连并重试一次"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        generation = self._generation
+        try:
+            return method(self, *args, **kwargs)
+        except Exception:
+            # 连接仍然存活说明是普通的远程错误(文件不存在、权限不足等)
+            if not self.auto_reconnect or self._closed or self.is_alive():
+                raise
+        self.reconnect(seen_generation=generation)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SSHSession:
+    """SSH/SFTP会话
+    
+    封装连接、目录列表、文件传输和远程命令执行.所有方法都是同步阻塞的,
+    由调用方决定在哪个线程中执行;状态和进度通过可选的回调函数汇报.
+    """
+    
+    KEEPALIVE_INTERVAL = 15      # 传输层keepalive间隔(秒)
+    RECONNECT_ATTEMPTS = 6       # 单次重连的最大尝试次数
+    RECONNECT_BASE_DELAY = 1.0   # 指数退避的初始等待(秒)
+    RECONNECT_MAX_DELAY = 30.0   # 指数退避的最长等待(秒)
+    LINK_CACHE_TTL = 30.0        # 符号链接解析结果的缓存时间(秒)
+    LINK_CACHE_LIMIT = 10000     # 符号链接缓存的最大条目数
+    MAX_LINK_DEPTH = 40          # 递归操作沿一条路径最多跟随的链接层数(同内核ELOOP上限)
+    VERIFY_BLOCK_SIZE = 4 * 1024 * 1024   # 传输校验的分块大小,不一致时按块重新传输
+    VERIFY_ATTEMPTS = 3                   # 校验不一致时最多修复的轮数
+    VERIFY_TOOLS = (('sha256sum', 'sha256'), ('sha1sum', 'sha1'), ('md5sum', 'md5'))
+    CHECK_FILE_ALGORITHMS = ('sha256', 'sha1', 'md5')
+    STREAM_WINDOW = 128          # 流式下载同时在途的读请求数的初始值(每个32KB,连接后由LinkStats调整)
+    STREAM_BUFFERS = 64          # 流式下载的缓冲区个数(每个32KB),即数据在本地的最大积压
+    UPLOAD_WORKERS = 4           # 批量上传并行写入暂存文件的SFTP通道数的初始值(由LinkStats调整)
+    
+    def __init__(self, hostname, username, port=22, key_file=None, perf=None, timeout=10, prewarmer=None,
+                 jump=None, use_sftp=True, use_agent=False):
+        self.hostname = hostname
+        self.username = username
+        self.port = port
+        self.key_file = key_file
+        self.timeout = timeout
+        self.prewarmer = prewarmer       # ConnectionPrewarmer:有预热好的握手时直接接着认证
+        self.jump = jump                 # 跳板机会话(见 BastionPool):经它的direct-tcpip通道连接
+        self.use_sftp = use_sftp         # 跳板机只需要SSH传输,不打开SFTP
+        self.use_agent = use_agent       # 批量操作优先交给远程辅助程序(见 RemoteAgent)
+        self.perf = perf if perf is not None else PerfRecorder()
+        self.link = LinkStats(self.STREAM_WINDOW, self.UPLOAD_WORKERS)   # 吞吐量、往返时间与自动调整的并发度
+        self.ssh_client = None
+        self.sftp_client = None
+        self.bundle_supported = None  # 远程是否可以执行tar(None表示尚未检测)
+        self.posix_rename = True      # 是否尝试posix-rename扩展(服务器拒绝后置为False)
+        self._stale_parts = []        # 断线时未能删除的暂存文件,重连后的下一次上传先删除
+        self._hash_tool = None        # 远程哈希命令 (命令, 算法);False表示只能用check-file扩展
+        self._check_file_algorithm = None
+        self._agent = None            # RemoteAgent;False表示本次连接上无法运行
+        self._agent_lock = threading.Lock()
+        
+        # 断线重连:缓存认证信息,避免重新解析密钥或再次询问密码
+        self.auto_reconnect = True
+        self.on_connection_lost = None   # 开始重连前回调
+        self.on_reconnected = None       # 重连成功后回调
+        self.on_status = None            # 重连过程的状态回调
+        self._password = None
+        self._pkey = None                # 已解析的密钥文件
+        self._auth_key = None            # 上次认证成功的公钥(含agent中的密钥)
+        self._generation = 0             # 每次(重新)连接成功加一
+        self._closed = False
+        self._reconnect_lock = threading.Lock()
+        self._global_lock = threading.Lock()   # Transport同一时间只能等待一个全局请求的回复
+        
+        # 符号链接解析缓存: 路径 -> (链接的mtime, 解析时间, 目标, 目标属性)
+        self._link_cache = {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    @property
+    def connected(self):
+        if not self.use_sftp:
+            return self.ssh_client is not None
+        return self.sftp_client is not None
+    
+    @property
+    def label(self):
+        return f"{self.username}@{self.hostname}:{self.port}"
+    
+    @property
+    def route(self):
+        """连接路径,经跳板机时为 跳板机 -> 目标"""
+        if self.jump is None:
+            return self.label
+        return f"{self.jump.route} -> {self.label}"
+    
+    # ---- 连接 ----
+    
+    def connect(self, password=None, on_status=None):
+        """建立SSH连接和SFTP会话(未指定密钥和密码时使用SSH agent和默认密钥)"""
+        self._password = password
+        self._closed = False
+        self._open(on_status or (lambda message: None))
+        return self
+    
+    def _open(self, status):
+        """使用缓存的认证信息建立连接"""
+        status("正在建立SSH连接...")
+        
+        client = instrument_ssh_client(paramiko.SSHClient(), self.perf)
+        client.set_missing_host_key_policy(_host_key_policy())
+        if self.jump is not None:
+            # 经跳板机已认证的传输打开通道,不再为跳板机重新握手
+            status(f"经跳板机 {self.jump.label} 连接...")
+            warm = {'sock': self.jump.open_tunnel(self.hostname, self.port)}
+        else:
+            warm = self.prewarmer.take(self.hostname, self.port) if self.prewarmer else {}
+            if warm:
+                status("使用预热的连接...")
+        
+        try:
+            if self._auth_key is not None:
+                # 重连:直接使用上次成功的密钥(密钥文件或agent中的密钥),只需一次认证往返
+                status("使用缓存的密钥认证...")
+                try:
+                    client.connect(self.hostname, port=self.port, username=self.username,
+                                   pkey=self._auth_key, allow_agent=False, look_for_keys=False,
+                                   timeout=self.timeout, **warm)
+                except paramiko.AuthenticationException:
+                    self._auth_key = None
+                    client.close()
+                    return self._open(status)
+            elif self.key_file:
+                # 密钥认证
+                status("使用密钥文件认证...")
+                if self._pkey is None:
+                    self._pkey = paramiko.RSAKey.from_private_key_file(self.key_file)
+                client.connect(self.hostname, port=self.port, username=self.username,
+                               pkey=self._pkey, timeout=self.timeout, **warm)
+            else:
+                # 密码认证
+                status("使用密码认证...")
+                client.connect(self.hostname, port=self.port, username=self.username,
+                               password=self._password, timeout=self.timeout, **warm)
+            
+            transport = client.get_transport()
+            transport.set_keepalive(self.KEEPALIVE_INTERVAL)
+            self.link.attach(transport)
+            auth_handler = getattr(transport, 'auth_handler', None)
+            if getattr(auth_handler, 'private_key', None) is not None:
+                self._auth_key = auth_handler.private_key
+            
+            # 创建SFTP客户端
+            sftp_client = None
+            if self.use_sftp:
+                status("正在建立SFTP连接...")
+                sftp_client = client.open_sftp()
+        except Exception:
+            client.close()
+            raise
+        
+        self.ssh_client = client
+        self.sftp_client = sftp_client
+        self.bundle_supported = None
+        self.posix_rename = True
+        self._hash_tool = None
+        self._check_file_algorithm = None
+        self._agent = None
+        self._generation += 1
+    
+    def close(self):
+        """关闭连接"""
+        self._closed = True
+        self._drop_connection()
+    
+    def _drop_connection(self):
+        """关闭当前的SSH/SFTP对象"""
+        sftp_client, ssh_client = self.sftp_client, self.ssh_client
+        self.sftp_client = None
+        self.ssh_client = None
+        self.bundle_supported = None
+        if self._agent:
+            self._agent.close()
+        self._agent = None
+        for client in (sftp_client, ssh_client):
+            if client is not None:
+                try:
+                    client.close()
+                except Exception:
+                    pass
+    
+    def open_tunnel(self, hostname, port):
+        """打开到 hostname:port 的direct-tcpip通道(本会话作为跳板机);传输已断开时先重连"""
+        for attempt in range(2):
+            generation = self._generation
+            client = self.ssh_client
+            transport = client.get_transport() if client is not None else None
+            if transport is not None and transport.is_active():
+                try:
+                    with self.perf.span("ssh.open_tunnel"):
+                        return _TunnelSocket(transport.open_channel('direct-tcpip', (hostname, port),
+                                                                    ('127.0.0.1', 0), timeout=self.timeout))
+                except paramiko.ChannelException as e:
+                    raise paramiko.SSHException(
+                        f"跳板机 {self.label} 无法连接到 {hostname}:{port}: {e.text}") from None
+            self.reconnect(generation)
+        raise paramiko.SSHException(f"跳板机 {self.label} 不可用")
+    
+    def is_alive(self):
+        """传输层是否仍然活动"""
+        client = self.ssh_client
+        transport = client.get_transport() if client is not None else None
+        return transport is not None and transport.is_active()
+    
+    def probe(self, timeout=10):
+        """发送一次keepalive请求并等待回复,返回往返时间(秒);连接已死或超时返回None"""
+        client = self.ssh_client
+        transport = client.get_transport() if client is not None else None
+        if transport is None or not transport.is_active():
+            return None
+        
+        result = {}
+        
+        def request():
+            try:
+                with self._global_lock:
+                    started = time.perf_counter()
+                    # OpenSSH对未知的全局请求回复失败,这同样是一次完整的往返
+                    transport.global_request('keepalive@openssh.com', wait=True)
+                    rtt = time.perf_counter() - started
+            except Exception:
+                return
+            if transport.is_active():
+                result['rtt'] = rtt
+                self.link.add_rtt(rtt)
+        
+        thread = threading.Thread(target=request, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if 'rtt' not in result and thread.is_alive():
+            # 网络黑洞:TCP层迟迟不报错,主动关闭以便重连
+            transport.close()
+        return result.get('rtt')
+    
+    def reconnect(self, seen_generation=None, max_attempts=None):
+        """断线后按指数退避重连;其他线程已完成重连时直接返回"""
+        with self._reconnect_lock:
+            if seen_generation is not None and seen_generation != self._generation and self.is_alive():
+                return
+            if self._closed:
+                raise paramiko.SSHException("会话已关闭")
+            
+            if self.on_connection_lost:
+                self.on_connection_lost()
+            status = self.on_status or (lambda message: None)
+            self._drop_connection()
+            
+            attempts = max_attempts or self.RECONNECT_ATTEMPTS
+            delay = self.RECONNECT_BASE_DELAY
+            last_error = None
+            for attempt in range(1, attempts + 1):
+                status(f"连接已断开,正在重连(第 {attempt}/{attempts} 次)...")
+                try:
+                    self._open(lambda message: None)
+                    break
+                except Exception as e:
+                    last_error = e
+                    if self._closed or attempt == attempts:
+                        break
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+            
+            if not self.is_alive():
+                raise last_error or paramiko.SSHException("重连失败")
+        
+        if self.on_reconnected:
+            self.on_reconnected()
+    
+    @_idempotent
+    def getcwd(self):
+        """SFTP会话的初始目录"""
+        return self.sftp_client.getcwd() or "/"
+    
+    # ---- 路径与目录列表 ----
+    
+    @staticmethod
+    def join(directory, name):
+        """拼接远程路径"""
+        return posixpath.join(directory, name)
+    
+    @staticmethod
+    def resolve_path(current_path, path):
+        """根据当前目录解析目标路径(支持 .. 和绝对路径)"""
+        if path == "..":
+            new_path = posixpath.dirname(current_path.rstrip('/'))
+            return new_path or "/"
+        if path.startswith('/'):
+            return path
+        return posixpath.join(current_path, path)
+    
+    def open_sftp_channel(self):
+        """在同一SSH连接上另开一个SFTP通道,供后台任务使用,不与前台请求争用
+        
+        通道的流控窗口按当前在途请求窗口设置,带宽时延积大的链路上不被SSH窗口限速.
+        """
+        with self.perf.span("ssh.open_sftp", "remote", "后台通道"):
+            sftp = paramiko.SFTPClient.from_transport(self.ssh_client.get_transport(),
+                                                      window_size=self.link.channel_window)
+        return instrument_sftp_client(sftp, self.perf)
+    
+    @_idempotent
+    def list_dir(self, path, sftp=None):
+        """列出目录,返回按"目录在前、名称排序"的文件信息列表"""
+        return self._list_dir(path, sftp)
+    
+    def _list_dir(self, path, sftp=None):
+        """list_dir 的实现,出错时不会重连(供推测性的后台任务使用)"""
+        sftp = sftp or self.sftp_client
+        items = sftp.listdir_attr(path)
+        links = self.resolve_links(path, items, sftp)
+        
+        with self.perf.span("listing.build", "listing", path):
+            files = [self._file_info(item, links.get(item.filename)) for item in items]
+            
+            # 排序:目录在前,然后按名称排序
+            files.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
+        return files
+    
+    @staticmethod
+    def _file_info(item, link=None):
+        """由SFTPAttributes生成列表项;link为符号链接的 (链接目标, 目标属性)"""
+        file_info = {
+            'name': item.filename,
+            'size': item.st_size if item.st_size else 0,
+            'type': 'directory' if stat.S_ISDIR(item.st_mode) else 'file',
+            'permissions': stat.filemode(item.st_mode),
+            'modified': format_time(item.st_mtime),
+            'attr': item  # 完整属性,属性对话框无需再次stat
+        }
+        if link is not None:
+            # 符号链接按目标的类型显示,失效链接当作文件
+            target, target_attr = link
+            file_info['link_target'] = target
+            file_info['broken'] = target_attr is None
+            if target_attr is not None:
+                file_info['type'] = 'directory' if stat.S_ISDIR(target_attr.st_mode) else 'file'
+                file_info['size'] = target_attr.st_size or 0
+        return file_info
+    
+    def stat_entries(self, directory, names, sftp=None):
+        """批量获取目录中若干条目的列表项(一次流水线lstat),已不存在的条目不返回"""
+        sftp = sftp or self.sftp_client
+        paths = {self.join(directory, name): name for name in names}
+        stats = self._agent_results("stat", list(paths))
+        if stats is not None:
+            # 辅助程序的lstat结果已带链接目标和目标属性,不需要再解析链接
+            items, links = [], {}
+            for path, value in stats.items():
+                if value is None:
+                    continue
+                attr_values, target, target_values = value
+                item = self._agent_attr(attr_values, paths[path])
+                items.append(item)
+                if stat.S_ISLNK(item.st_mode):
+                    links[item.filename] = (target, self._agent_attr(target_values) if target_values else None)
+            return [self._file_info(item, links.get(item.filename)) for item in items]
+        
+        items = []
+        for path, attr in PipelinedRequests(sftp).stat_many(list(paths), follow=False).items():
+            if attr is not None:
+                attr.filename = paths[path]
+                items.append(attr)
+        links = self.resolve_links(directory, items, sftp)
+        return [self._file_info(item, links.get(item.filename)) for item in items]
+    
+    def resolve_links(self, directory, items, sftp=None):
+        """解析一个目录列表中的全部符号链接,返回 名称 -> (链接目标, 目标属性或None)
+        
+        未缓存的链接在一个流水线批次中完成stat和readlink,不会每个链接一次往返.
+        """
+        now = time.monotonic()
+        resolved = {}
+        missing = {}
+        for item in items:
+            if item.st_mode is None or not stat.S_ISLNK(item.st_mode):
+                continue
+            path = self.join(directory, item.filename)
+            cached = self._link_cache.get(path)
+            if cached and cached[0] == item.st_mtime and now - cached[1] < self.LINK_CACHE_TTL:
+                resolved[item.filename] = cached[2:]
+            else:
+                missing[path] = item
+        
+        if missing:
+            with self.perf.span("listing.links", "listing", f"{len(missing)} 个链接"):
+                results = PipelinedRequests(sftp or self.sftp_client).resolve_links(list(missing))
+            if len(self._link_cache) > self.LINK_CACHE_LIMIT:
+                self._link_cache.clear()
+            for path, (target, target_attr) in results.items():
+                item = missing[path]
+                self._link_cache[path] = (item.st_mtime, now, target, target_attr)
+                resolved[item.filename] = (target, target_attr)
+        return resolved
+    
+    @_idempotent
+    def check_dir(self, path):
+        """确认目录存在且可读,否则抛出异常"""
+        self.sftp_client.listdir(path)
+    
+    @_idempotent
+    def stat(self, path):
+        """获取文件属性"""
+        return self.describe(path, self.sftp_client.stat(path))
+    
+    @staticmethod
+    def describe(path, file_attr):
+        """把SFTPAttributes整理为属性对话框所用的信息"""
+        owner, group = SSHSession._owner_names(file_attr)
+        return {
+            'name': posixpath.basename(path.rstrip('/')) or path,
+            'path': path,
+            'size': file_attr.st_size if file_attr.st_size else 0,
+            'type': 'Directory' if stat.S_ISDIR(file_attr.st_mode) else 'File',
+            'permissions': stat.filemode(file_attr.st_mode),
+            'modified': format_time(file_attr.st_mtime),
+            'accessed': format_time(file_attr.st_atime),
+            'owner': owner,
+            'group': group
+        }
+    
+    @staticmethod
+    def _owner_names(file_attr):
+        """从列目录返回的长格式行(ls -l风格)中取属主和属组名,没有时退回数字ID"""
+        fields = (getattr(file_attr, 'longname', None) or "").split(None, 4)
+        if len(fields) >= 4 and not fields[2].isdigit():
+            return fields[2], fields[3]
+        uid, gid = file_attr.st_uid, file_attr.st_gid
+        return (str(uid) if uid is not None else "-"), (str(gid) if gid is not None else "-")
+    
+    def fetch_details(self, directory, files, dir_sizes=False):
+        """为一批列表项获取派生信息:属主/属组名、链接目标,dir_sizes=True时还有目录的递归大小
+        
+        属主来自列目录已有的长格式行;链接目标在独立的SFTP通道上通过一次流水线readlink获取
+        (供后台线程调用,不与前台请求争用同一通道的回复);目录大小由一条远程du命令统一计算,
+        会遍历整个目录树,只在明确需要时计算.返回 名称 -> 信息.
+        """
+        details = {}
+        links = []
+        directories = []
+        for file_info in files:
+            attr = file_info.get('attr')
+            owner, group = self._owner_names(attr) if attr is not None else ("-", "-")
+            details[file_info['name']] = {'owner': owner, 'group': group,
+                                          'link_target': file_info.get('link_target'), 'dir_size': None}
+            if attr is not None and attr.st_mode is not None and stat.S_ISLNK(attr.st_mode):
+                # 列目录时已解析过的链接无需再次readlink;du不跟随链接,不计算大小
+                if file_info.get('link_target') is None:
+                    links.append(file_info['name'])
+            elif file_info['type'] == 'directory' and dir_sizes:
+                directories.append(file_info['name'])
+        
+        with self.perf.span("details.fetch", "listing", f"{len(files)} 项"):
+            if links:
+                paths = {self.join(directory, name): name for name in links}
+                sftp = self.open_sftp_channel()
+                try:
+                    for path, target in PipelinedRequests(sftp).readlink_many(paths).items():
+                        details[paths[path]]['link_target'] = target
+                finally:
+                    sftp.close()
+            if directories:
+                for name, size in self._dir_sizes(directory, directories).items():
+                    details[name]['dir_size'] = size
+        return details
+    
+    def _dir_sizes(self, directory, names):
+        """一条远程du命令(或一次辅助程序请求)计算多个目录的递归大小(字节);远程不支持时返回空字典"""
+        paths = {self.join(directory, name): name for name in names}
+        usage = self._agent_results("du", list(paths))
+        if usage is not None:
+            return {paths[path]: size for path, size in usage.items() if not isinstance(size, Exception)}
+        
+        quoted = " ".join(shlex.quote("./" + name) for name in names)
+        command = f"cd {shlex.quote(directory)} && du -sk -- {quoted} 2>/dev/null"
+        try:
+            result = self.exec_command(command)
+        except Exception:
+            return {}
+        sizes = {}
+        for line in result['stdout'].splitlines():
+            size, _, path = line.partition('\t')
+            if size.isdigit() and path.startswith('./'):
+                sizes[path[2:]] = int(size) * 1024
+        return sizes
+    
+    # ---- 远程辅助程序 ----
+    
+    def agent(self):
+        """返回已启动的远程辅助程序;未启用或本次连接上无法运行时返回None"""
+        if not self.use_agent or self._agent is False or self.ssh_client is None:
+            return None
+        with self._agent_lock:
+            if self._agent is None or not self._agent.alive:
+                try:
+                    with self.perf.span("agent.start", "remote", self.label):
+                        self._agent = RemoteAgent.start(self, self.timeout)
+                except Exception as e:
+                    self._agent = False
+                    if self.on_status:
+                        self.on_status(f"{e} (改用SFTP)")
+                    return None
+            return self._agent
+    
+    def _agent_call(self, op, detail="", **params):
+        """通过辅助程序执行一个操作;辅助程序不可用或通道断开时返回None,由调用方改用SFTP"""
+        agent = self.agent()
+        if agent is None:
+            return None
+        try:
+            with self.perf.span(f"agent.{op}", "remote", detail):
+                return agent.call(op, **params)
+        except (EOFError, socket.timeout, paramiko.SSHException):
+            # 本次改用SFTP,下次调用时重新启动
+            agent.close()
+            return None
+    
+    def _agent_results(self, op, paths, **params):
+        """对一批路径执行辅助程序操作,返回 路径 -> 结果(单个路径的失败为IOError);不可用时返回None"""
+        values = self._agent_call(op, f"{len(paths)} 项", paths=paths, **params)
+        if values is None:
+            return None
+        return {path: RemoteAgent.error(value['error']) if isinstance(value, dict) else value
+                for path, value in zip(paths, values)}
+    
+    @staticmethod
+    def _agent_attr(values, filename=None):
+        """由辅助程序返回的 [mode, size, uid, gid, atime, mtime] 生成SFTPAttributes"""
+        attr = paramiko.SFTPAttributes()
+        attr.st_mode, attr.st_size, attr.st_uid, attr.st_gid, attr.st_atime, attr.st_mtime = values
+        if filename is not None:
+            attr.filename = filename
+        return attr
+    
+    # ---- 文件操作 ----
+    
+    def mkdir(self, path):
+        self.sftp_client.mkdir(path)
+    
+    def remove(self, path):
+        self.sftp_client.remove(path)
+    
+    def rmdir(self, path):
+        self.sftp_client.rmdir(path)
+    
+    def delete(self, paths):
+        """删除多个文件或目录(目录连同全部内容,不跟随符号链接),返回 路径 -> 异常或None
+        
+        有远程辅助程序时一次往返完成;否则经SFTP遍历目录树,按层流水线删除.
+        """
+        paths = list(paths)
+        results = self._agent_results("remove", paths, recursive=True)
+        if results is not None:
+            return results
+        with self.perf.span("sftp.delete_tree", "remote", f"{len(paths)} 项"):
+            return {path: self._sftp_delete_tree(path) for path in paths}
+    
+    def _sftp_delete_tree(self, path):
+        """经SFTP删除一个文件或目录树:先一批删除全部文件和链接,再由深到浅逐层删除目录;返回异常或None"""
+        try:
+            if not stat.S_ISDIR(self.sftp_client.lstat(path).st_mode):
+                self.sftp_client.remove(path)
+                return None
+            files = []
+            levels = collections.defaultdict(list)   # 深度 -> 目录
+            levels[0].append(path)
+            pending = [(path, 0)]
+            while pending:
+                directory, depth = pending.pop()
+                for item in self.sftp_client.listdir_attr(directory):
+                    item_path = posixpath.join(directory, item.filename)
+                    if stat.S_ISDIR(item.st_mode):
+                        levels[depth + 1].append(item_path)
+                        pending.append((item_path, depth + 1))
+                    else:
+                        files.append(item_path)
+            batches = [[(item, _protocol.CMD_REMOVE, item) for item in files]]
+            batches += [[(item, _protocol.CMD_RMDIR, item) for item in levels[depth]]
+                        for depth in sorted(levels, reverse=True)]
+            requests = PipelinedRequests(self.sftp_client)
+            for batch in batches:
+                for code, error in requests.mutate(batch).values():
+                    if error is not None:
+                        return error
+            return None
+        except IOError as e:
+            return e
+    
+    def rename(self, old_path, new_path):
+        """重命名文件/目录(目标已存在时由posix-rename原子覆盖)"""
+        error = self.rename_many([(old_path, new_path)])[old_path]
+        if error is not None:
+            raise error
+    
+    def rename_many(self, pairs):
+        """在一个流水线批次中重命名 [(旧路径, 新路径)],返回 旧路径 -> 异常或None"""
+        pairs = list(pairs)
+        requests = PipelinedRequests(self.sftp_client)
+        with self.perf.span("sftp.rename_many", "remote", f"{len(pairs)} 项"):
+            results = requests.rename_many(pairs, posix=self.posix_rename)
+        self.posix_rename = requests.posix_rename
+        return {old: error for old, (code, error) in results.items()}
+    
+    def move(self, paths, target_dir):
+        """把多个文件/目录移动到另一个目录,返回 原路径 -> 异常或None"""
+        return self.rename_many([(path, self.join(target_dir, posixpath.basename(path.rstrip('/'))))
+                                 for path in paths])
+    
+    @_idempotent
+    def set_attributes(self, paths, mode=None, uid=None, gid=None, times=None):
+        """批量修改权限、属主和时间戳(一个流水线批次),返回 路径 -> 异常或None
+        
+        mode 为权限位(如0o644);uid和gid需同时给出;times 为 (atime, mtime).
+        """
+        attributes = {}
+        for path in paths:
+            attr = paramiko.SFTPAttributes()
+            if mode is not None:
+                attr.st_mode = mode & 0o7777
+            if uid is not None and gid is not None:
+                attr.st_uid, attr.st_gid = uid, gid
+            if times is not None:
+                attr.st_atime, attr.st_mtime = times
+            attributes[path] = attr
+        with self.perf.span("sftp.setstat_many", "remote", f"{len(attributes)} 项"):
+            return PipelinedRequests(self.sftp_client).setstat_many(attributes)
+    
+    def symlink(self, target, path):
+        """创建指向 target 的符号链接 path"""
+        self.sftp_client.symlink(target, path)
+    
+    # ---- 文件传输 ----
+    
+    @_idempotent
+    def upload(self, local_path, remote_path, verify=False):
+        """上传文件,返回校验结果(未校验时为None)
+        
+        先写入同目录下的暂存文件,完成后原子重命名到目标,读者只会看到旧文件或完整的新文件;
+        verify=True时在发布前比对分块哈希、重传不一致的块.
+        """
+        self._discard_stale()
+        staged = [(local_path, self.staging_path(remote_path), remote_path)]
+        temp_path = staged[0][1]
+        try:
+            if not verify:
+                self.sftp_client.put(local_path, temp_path)
+                result = None
+            else:
+                hasher = BlockHasher(self._verify_algorithms(), self.VERIFY_BLOCK_SIZE)
+                try:
+                    with open(local_path, 'rb') as f:
+                        self.sftp_client.putfo(_HashingFile(f, hasher), temp_path,
+                                               file_size=os.fstat(f.fileno()).st_size)
+                finally:
+                    local_blocks = hasher.finish()
+                result = self._verify_upload(local_path, temp_path, local_blocks, hasher.size)
+            error = self._publish(staged)[remote_path]
+        except Exception:
+            self._discard([temp_path])
+            raise
+        if error is not None:
+            self._discard([temp_path])
+            raise error
+        return result
+    
+    @_idempotent
+    def upload_many(self, pairs, on_progress=None, label=None):
+        """上传多个文件 [(本地路径, 远程路径)],返回 (文件数, 字节数)
+        
+        多个SFTP通道并行写入暂存文件;全部成功后才发布(发布屏障),任一文件失败时
+        删除所有暂存文件,目标保持原样.
+        """
+        self._discard_stale()
+        staged = [(local_path, self.staging_path(remote_path), remote_path) for local_path, remote_path in pairs]
+        progress = TransferProgress(label or f"上传 {len(staged)} 个文件", on_progress)
+        if not staged:
+            progress.finish()
+            return 0, 0
+        jobs = collections.deque(staged)
+        started = []
+        lock = threading.Lock()
+        failed = threading.Event()
+        
+        def stage():
+            sftp = self.open_sftp_channel()
+            try:
+                while not failed.is_set():
+                    with lock:
+                        if not jobs:
+                            return
+                        local_path, temp_path, remote_path = jobs.popleft()
+                        started.append(temp_path)
+                    sent = [0]
+                    
+                    def report(done, total):
+                        with lock:
+                            progress.add_bytes(done - sent[0])
+                        sent[0] = done
+                    sftp.put(local_path, temp_path, callback=report)
+                    with lock:
+                        progress.add(0)
+            except Exception:
+                failed.set()
+                raise
+            finally:
+                sftp.close()
+        
+        workers = max(1, min(self.link.workers, len(staged)))
+        try:
+            with self.perf.span("upload.stage", "transfer", f"{len(staged)} 个文件"):
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(stage) for _ in range(workers)]
+                for future in futures:
+                    future.result()
+            results = self._publish(staged)
+        except Exception:
+            self._discard(started)
+            raise
+        errors = [(temp_path, remote_path, results[remote_path]) for local_path, temp_path, remote_path in staged
+                  if results[remote_path] is not None]
+        if errors:
+            self._discard([temp_path for temp_path, remote_path, error in errors])
+            names = ", ".join(posixpath.basename(remote_path) for temp_path, remote_path, error in errors[:5])
+            raise IOError(f"{len(errors)} 个文件发布失败 ({names}): {errors[0][2]}")
+        progress.finish()
+        return progress.files, progress.bytes
+    
+    @staticmethod
+    def staging_path(remote_path):
+        """上传暂存文件的路径:与目标在同一目录(重命名不跨文件系统)的隐藏临时名"""
+        directory, name = posixpath.split(remote_path)
+        return posixpath.join(directory, f".{name}.{os.urandom(4).hex()}.part")
+    
+    def _publish(self, staged):
+        """发布暂存文件 [(本地路径, 暂存路径, 目标路径)],返回 目标路径 -> 异常或None
+        
+        一个批次设置权限和修改时间(与本地文件一致),下一个批次用posix-rename原子替换目标.
+        """
+        requests = PipelinedRequests(self.sftp_client)
+        attributes = {}
+        for local_path, temp_path, remote_path in staged:
+            local = os.stat(local_path)
+            attr = paramiko.SFTPAttributes()
+            attr.st_mode = stat.S_IMODE(local.st_mode)
+            attr.st_atime, attr.st_mtime = int(local.st_atime), int(local.st_mtime)
+            attributes[temp_path] = attr
+        with self.perf.span("upload.publish", "remote", f"{len(staged)} 项"):
+            # 不支持修改权限/时间的服务器上仍然发布,只是属性保持服务器默认值
+            requests.setstat_many(attributes)
+            pairs = [(temp_path, remote_path) for local_path, temp_path, remote_path in staged]
+            results = requests.rename_many(pairs, posix=self.posix_rename)
+            self.posix_rename = requests.posix_rename
+            # 标准RENAME不覆盖已存在的目标,此时服务器只回复通用的FAILURE;ENOENT、EACCES等
+            # 其它失败与目标无关,不能因此删除目标
+            retry = [(temp_path, remote_path) for temp_path, remote_path in pairs
+                     if results[temp_path][0] == _protocol.SFTP_FAILURE]
+            if retry and not self.posix_rename:
+                # 删除目标前确认暂存文件仍在,否则只会丢掉旧文件而无可替换
+                staged_attrs = requests.stat_many([temp_path for temp_path, remote_path in retry], follow=False)
+                retry = [(temp_path, remote_path) for temp_path, remote_path in retry
+                         if staged_attrs[temp_path] is not None and stat.S_ISREG(staged_attrs[temp_path].st_mode)]
+                if retry:
+                    # 只能先删除再重命名,此时无法保证原子性
+                    requests.mutate([(remote_path, _protocol.CMD_REMOVE, remote_path)
+                                     for temp_path, remote_path in retry])
+                    results.update(requests.rename_many(retry, posix=False))
+        return {remote_path: results[temp_path][1] for temp_path, remote_path in pairs}
+    
+    def _discard(self, temp_paths):
+        """尽力删除暂存文件;连接已断开时记下,由重连后的下一次上传(包括自动重试)删除"""
+        if not temp_paths:
+            return
+        try:
+            PipelinedRequests(self.sftp_client).mutate([(path, _protocol.CMD_REMOVE, path) for path in temp_paths])
+        except Exception:
+            self._stale_parts.extend(temp_paths)
+    
+    def _discard_stale(self):
+        """删除之前断线时遗留的暂存文件"""
+        stale, self._stale_parts = self._stale_parts, []
+        self._discard(stale)
+    
+    @_idempotent
+    def download(self, remote_path, local_path, verify=False):
+        """下载文件;verify=True时比对分块哈希、重新获取不一致的块,返回校验结果"""
+        if not verify:
+            self.sftp_client.get(remote_path, local_path, max_concurrent_prefetch_requests=self.link.window)
+            return None
+        hasher = BlockHasher(self._verify_algorithms(), self.VERIFY_BLOCK_SIZE)
+        try:
+            with open(local_path, 'wb') as f:
+                self.sftp_client.getfo(remote_path, _HashingFile(f, hasher))
+        finally:
+            local_blocks = hasher.finish()
+        return self._verify_download(remote_path, local_path, local_blocks, hasher.size)
+    
+    # ---- 传输校验 ----
+    
+    def _verify_algorithms(self):
+        """本地需要计算的哈希算法:远程有哈希命令时与之一致,否则覆盖check-file可能用到的算法"""
+        if self._hash_tool is None:
+            self._hash_tool = False
+            probe = " ".join(tool for tool, algorithm in self.VERIFY_TOOLS)
+            try:
+                result = self.exec_command(
+                    f'for t in {probe}; do command -v "$t" >/dev/null 2>&1 && {{ echo "$t"; break; }}; done')
+                tools = dict(self.VERIFY_TOOLS)
+                found = result['stdout'].strip()
+                if found in tools:
+                    self._hash_tool = (found, tools[found])
+            except Exception:
+                # 只允许SFTP子系统的服务器,改用check-file扩展
+                pass
+        if self._hash_tool:
+            return (self._hash_tool[1],)
+        if self._check_file_algorithm:
+            return (self._check_file_algorithm,)
+        return self.CHECK_FILE_ALGORITHMS
+    
+    def remote_block_hashes(self, path, size, blocks=None):
+        """在服务器端计算文件的分块哈希,返回 (算法, {块序号: 十六进制摘要});无法计算时算法为None
+        
+        优先在一条命令中用dd逐块交给sha256sum等工具,否则使用SFTP的check-file扩展.
+        blocks 为None时计算全部块.
+        """
+        block = self.VERIFY_BLOCK_SIZE
+        count = -(-size // block)
+        indexes = list(range(count)) if blocks is None else sorted(blocks)
+        algorithms = self._verify_algorithms()
+        if not indexes:
+            return algorithms[0], {}
+        
+        if self._hash_tool:
+            tool, algorithm = self._hash_tool
+            if blocks is None:
+                loop = f"i=0; while [ $i -lt {count} ]; do"
+                step = "; i=$((i+1)); done"
+            else:
+                loop = f"for i in {' '.join(map(str, indexes))}; do"
+                step = "; done"
+            command = (f"{loop} dd if={shlex.quote(path)} bs={block} skip=$i count=1 2>/dev/null"
+                       f" | {tool}{step}")
+            with self.perf.span("verify.remote_hash", "remote", f"{len(indexes)} 块"):
+                result = self.exec_command(command)
+            digests = [line.split()[0] for line in result['stdout'].splitlines() if line.strip()]
+            if len(digests) != len(indexes):
+                raise IOError(f"远程哈希计算失败: {result['stderr'].strip() or result['exit_code']}")
+            return algorithm, dict(zip(indexes, digests))
+        
+        with self.perf.span("verify.check_file", "remote", f"{len(indexes)} 块"):
+            with self.sftp_client.open(path, 'rb') as f:
+                for algorithm in algorithms:
+                    try:
+                        if blocks is None:
+                            data = f.check(algorithm, 0, size, block)
+                        else:
+                            data = b"".join(f.check(algorithm, i * block, min(block, size - i * block), block)
+                                            for i in indexes)
+                    except IOError:
+                        continue
+                    self._check_file_algorithm = algorithm
+                    digest_size = hashlib.new(algorithm).digest_size
+                    digests = [data[i:i + digest_size].hex() for i in range(0, len(data), digest_size)]
+                    return algorithm, dict(zip(indexes, digests))
+        return None, {}
+    
+    def _verify_download(self, remote_path, local_path, local_blocks, local_size):
+        """比对下载结果,按块重新获取不一致的范围(远程文件为准)"""
+        block = self.VERIFY_BLOCK_SIZE
+        size = self.sftp_client.stat(remote_path).st_size
+        algorithm, remote = self.remote_block_hashes(remote_path, size)
+        if algorithm is None:
+            return {'verified': False, 'algorithm': None, 'blocks': 0, 'repaired': 0}
+        
+        local = dict(enumerate(local_blocks[algorithm]))
+        if local_size != size:
+            # 长度不同:截断到远程长度,最后一个不完整块及其后的块都需重新获取
+            os.truncate(local_path, size)
+            for index in range(min(local_size, size) // block, len(local)):
+                local.pop(index, None)
+        
+        repaired = set()
+        for attempt in range(self.VERIFY_ATTEMPTS + 1):
+            bad = [index for index in sorted(remote) if local.get(index) != remote[index]]
+            if not bad:
+                return {'verified': True, 'algorithm': algorithm, 'blocks': len(remote),
+                        'repaired': len(repaired)}
+            if attempt == self.VERIFY_ATTEMPTS:
+                break
+            ranges = [(index * block, min(block, size - index * block)) for index in bad]
+            with self.perf.span("verify.refetch", "remote", f"{len(bad)} 块"):
+                with self.sftp_client.open(remote_path, 'rb') as remote_file, open(local_path, 'r+b') as f:
+                    for index, data in zip(bad, remote_file.readv(ranges)):
+                        f.seek(index * block)
+                        f.write(data)
+                        local[index] = hashlib.new(algorithm, data).hexdigest()
+            repaired.update(bad)
+        raise IOError(f"下载校验失败: {len(bad)} 个数据块在重新获取后仍不一致")
+    
+    def _verify_upload(self, local_path, remote_path, local_blocks, local_size):
+        """比对上传结果,按块重新写入不一致的范围(本地文件为准)"""
+        block = self.VERIFY_BLOCK_SIZE
+        if self.sftp_client.stat(remote_path).st_size != local_size:
+            self.sftp_client.truncate(remote_path, local_size)
+        
+        repaired = set()
+        pending = None
+        for attempt in range(self.VERIFY_ATTEMPTS + 1):
+            algorithm, remote = self.remote_block_hashes(remote_path, local_size, pending)
+            if algorithm is None:
+                return {'verified': False, 'algorithm': None, 'blocks': 0, 'repaired': 0}
+            local = local_blocks[algorithm]
+            bad = [index for index in sorted(remote) if remote[index] != local[index]]
+            if not bad:
+                return {'verified': True, 'algorithm': algorithm, 'blocks': len(local),
+                        'repaired': len(repaired)}
+            if attempt == self.VERIFY_ATTEMPTS:
+                break
+            with self.perf.span("verify.rewrite", "remote", f"{len(bad)} 块"):
+                with open(local_path, 'rb') as f, self.sftp_client.open(remote_path, 'r+b') as remote_file:
+                    for index in bad:
+                        f.seek(index * block)
+                        data = f.read(block)
+                        if hashlib.new(algorithm, data).hexdigest() != local[index]:
+                            raise IOError(f"本地文件在上传期间被修改: {local_path}")
+                        remote_file.seek(index * block)
+                        remote_file.write(data)
+            repaired.update(bad)
+            pending = bad
+        raise IOError(f"上传校验失败: {len(bad)} 个数据块在重新写入后仍不一致")
+    
+    @_idempotent
+    def upload_dir(self, local_dir, remote_parent, bundle=True, on_progress=None, on_status=None):
+        """上传目录,返回 (文件数, 字节数)"""
+        if bundle and self.check_bundle_support(on_status):
+            return self._bundle_upload(local_dir, remote_parent, on_progress)
+        return self._sftp_upload_tree(local_dir, remote_parent, on_progress)
+    
+    @_idempotent
+    def download_dir(self, remote_path, local_dir, bundle=True, on_progress=None, on_status=None):
+        """下载目录到local_dir下,返回 (文件数, 字节数)"""
+        if bundle and self.check_bundle_support(on_status):
+            return self._bundle_download(remote_path, local_dir, on_progress)
+        return self._sftp_download_tree(remote_path, local_dir, on_progress)
+    
+    def check_bundle_support(self, on_status=None):
+        """检测远程是否可以通过shell执行tar(每个连接只检测一次)"""
+        if self.bundle_supported is None:
+            try:
+                stdin, stdout, stderr = self.ssh_client.exec_command("tar --version")
+                stdout.read()
+                self.bundle_supported = stdout.channel.recv_exit_status() == 0
+            except Exception:
+                # 服务器只允许SFTP子系统(例如 ForceCommand internal-sftp)
+                self.bundle_supported = False
+            if not self.bundle_supported and on_status:
+                on_status("远程无可用shell或tar,改用SFTP逐个传输")
+        return self.bundle_supported
+    
+    def _bundle_download(self, remote_path, local_dir, on_progress=None):
+        """通过tar流下载目录:远程tar cf -,本地边接收边解包,不落临时文件"""
+        parent, name = posixpath.split(remote_path.rstrip('/'))
+        command = f"tar cf - -C {shlex.quote(parent or '/')} {shlex.quote(name)}"
+        stdin, stdout, stderr = self.ssh_client.exec_command(command)
+        stdin.close()
+        
+        progress = TransferProgress(f"打包下载 {name}", on_progress)
+        with tarfile.open(fileobj=stdout, mode='r|') as tar:
+            for member in tar:
+                if hasattr(tarfile, 'data_filter'):
+                    tar.extract(member, local_dir, filter='data')
+                else:
+                    # 旧版本Python没有解包过滤器,手动拒绝越出目标目录的成员
+                    target = os.path.realpath(os.path.join(local_dir, member.name))
+                    if not target.startswith(os.path.realpath(local_dir) + os.sep):
+                        raise ValueError(f"不安全的归档成员: {member.name}")
+                    tar.extract(member, local_dir)
+                if member.isfile():
+                    progress.add(member.size)
+        
+        exit_code = stdout.channel.recv_exit_status()
+        if exit_code != 0:
+            error_msg = stderr.read().decode('utf-8', errors='ignore').strip()
+            raise IOError(f"远程tar退出码 {exit_code}: {error_msg}")
+        progress.finish()
+        return progress.files, progress.bytes
+    
+    def _bundle_upload(self, local_dir, remote_parent, on_progress=None):
+        """通过tar流上传目录:本地边打包边写入通道,远程tar xf -解包"""
+        local_dir = os.path.normpath(local_dir)
+        name = os.path.basename(local_dir)
+        command = f"tar xf - -C {shlex.quote(remote_parent)}"
+        stdin, stdout, stderr = self.ssh_client.exec_command(command)
+        
+        progress = TransferProgress(f"打包上传 {name}", on_progress)
+        with tarfile.open(fileobj=stdin, mode='w|') as tar:
+            for root, dirs, files in os.walk(local_dir):
+                rel_root = os.path.relpath(root, os.path.dirname(local_dir))
+                tar.add(root, arcname=rel_root, recursive=False)
+                for dir_name in dirs:
+                    # os.walk不会进入符号链接目录,链接本身仍需打包
+                    if os.path.islink(os.path.join(root, dir_name)):
+                        tar.add(os.path.join(root, dir_name), arcname=os.path.join(rel_root, dir_name), recursive=False)
+                for file_name in files:
+                    local_path = os.path.join(root, file_name)
+                    tar.add(local_path, arcname=os.path.join(rel_root, file_name), recursive=False)
+                    if os.path.isfile(local_path) and not os.path.islink(local_path):
+                        progress.add(os.path.getsize(local_path))
+        stdin.flush()
+        stdin.channel.shutdown_write()
+        
+        exit_code = stdout.channel.recv_exit_status()
+        if exit_code != 0:
+            error_msg = stderr.read().decode('utf-8', errors='ignore').strip()
+            raise IOError(f"远程tar退出码 {exit_code}: {error_msg}")
+        progress.finish()
+        return progress.files, progress.bytes
+    
+    def _sftp_download_tree(self, remote_path, local_dir, on_progress=None):
+        """无shell时的回退方案:通过SFTP逐个下载目录树"""
+        name = posixpath.basename(remote_path.rstrip('/'))
+        progress = TransferProgress(f"SFTP下载 {name}", on_progress)
+        for remote_item, relative, attr in self._walk_remote(remote_path):
+            local_item = os.path.join(local_dir, *relative.split('/'))
+            if stat.S_ISDIR(attr.st_mode):
+                os.makedirs(local_item, exist_ok=True)
+            else:
+                self.sftp_client.get(remote_item, local_item)
+                progress.add(attr.st_size or 0)
+        progress.finish()
+        return progress.files, progress.bytes
+    
+    def _walk_remote(self, remote_path, sftp=None):
+        """遍历远程目录树,依次产生 (远程路径, 以根名称开头的相对路径, 属性)
+        
+        只产生目录和普通文件,目录先于其内容.根本身是文件时只产生它自己.
+        """
+        sftp = sftp or self.sftp_client
+        name = posixpath.basename(remote_path.rstrip('/')) or remote_path
+        entries = self._agent_call("walk", remote_path, path=remote_path)
+        if entries is not None:
+            # 辅助程序按同样的规则在远程一次遍历完
+            for relative, *values in entries:
+                suffix = relative[len(name):]
+                yield (remote_path.rstrip('/') + suffix if suffix else remote_path), relative, \
+                    self._agent_attr(values)
+            return
+        root_attr = sftp.stat(remote_path)
+        if not stat.S_ISDIR(root_attr.st_mode):
+            if stat.S_ISREG(root_attr.st_mode):
+                yield remote_path, name, root_attr
+            return
+        # 符号链接会被跟随.每个待处理目录带上祖先目录按链接目标解析后的路径,
+        # 链接指回祖先时跳过;经过的链接层数超过上限时同样停止,以防链接环
+        root = posixpath.normpath(remote_path)
+        pending = [(remote_path, name, root_attr, root, frozenset([root]), 0)]
+        while pending:
+            remote_dir, relative, dir_attr, real_dir, ancestors, link_depth = pending.pop()
+            yield remote_dir, relative, dir_attr
+            items = sftp.listdir_attr(remote_dir)
+            links = self.resolve_links(remote_dir, items, sftp)
+            for item in items:
+                remote_item = posixpath.join(remote_dir, item.filename)
+                relative_item = f"{relative}/{item.filename}"
+                item_attr = item
+                real_item = posixpath.join(real_dir, item.filename)
+                item_depth = link_depth
+                if item.filename in links:
+                    target, item_attr = links[item.filename]
+                    if item_attr is None:
+                        continue  # 失效链接
+                    if stat.S_ISDIR(item_attr.st_mode):
+                        real_item = posixpath.normpath(posixpath.join(real_dir, target))
+                        item_depth += 1
+                        if real_item in ancestors or item_depth > self.MAX_LINK_DEPTH:
+                            continue
+                if stat.S_ISDIR(item_attr.st_mode):
+                    pending.append((remote_item, relative_item, item_attr, real_item,
+                                    ancestors | {real_item}, item_depth))
+                elif stat.S_ISREG(item_attr.st_mode):
+                    yield remote_item, relative_item, item_attr
+    
+    # ---- 流式下载 ----
+    
+    @contextlib.contextmanager
+    def _streaming(self, label, on_progress=None):
+        """流式下载的公共环境:独立的SFTP通道、固定缓冲池和后台写入线程"""
+        sftp = self.open_sftp_channel()
+        writer = _SinkWriter(BufferPool(self.STREAM_BUFFERS, paramiko.SFTPFile.MAX_REQUEST_SIZE))
+        progress = TransferProgress(label, on_progress)
+        try:
+            yield sftp, writer, progress
+            writer.drain()
+        finally:
+            writer.close()
+            sftp.close()
+        progress.finish()
+    
+    def _stream_file(self, sftp, remote_path, sink, writer, progress, limit=None):
+        """以固定窗口流水线读取一个远程文件,按顺序写入sink,返回字节数
+        
+        limit 给出时最多读取这么多字节(归档成员的大小需与头部一致).
+        """
+        pool = writer.pool
+        chunk = pool.size
+        responses = _Responses()
+        pending = {}
+        received = {}
+        next_offset = 0
+        emit_offset = 0
+        end = limit
+        
+        with sftp.open(remote_path, 'rb') as remote_file:
+            handle = remote_file.handle
+            
+            def request(offset, length):
+                num = sftp._async_request(responses, _protocol.CMD_READ, handle,
+                                          _protocol.int64(offset), length)
+                pending[num] = (offset, length)
+            
+            while True:
+                while len(pending) < self.link.window and (end is None or next_offset < end):
+                    length = chunk if end is None else min(chunk, end - next_offset)
+                    request(next_offset, length)
+                    next_offset += length
+                if not pending:
+                    break
+                sftp._read_response()
+                
+                for num, t, msg in responses.items:
+                    offset, length = pending.pop(num)
+                    if t == _protocol.CMD_DATA:
+                        data = msg.get_string()
+                        received[offset] = data
+                        if 0 < len(data) < length:
+                            # 服务器可以返回少于请求的字节数,补发剩余部分
+                            request(offset + len(data), length - len(data))
+                        elif not data:
+                            end = offset if end is None else min(end, offset)
+                    elif t == _protocol.CMD_STATUS:
+                        code, error = PipelinedRequests._status(t, msg)
+                        if code != _protocol.SFTP_EOF:
+                            raise error
+                        received[offset] = b""
+                        end = offset if end is None else min(end, offset)
+                    else:
+                        raise IOError(f"意外的SFTP回复类型 {t}")
+                responses.items.clear()
+                
+                # 按偏移顺序交给写入线程,借不到缓冲区时在此等待(背压)
+                while emit_offset in received and (end is None or emit_offset < end):
+                    data = received.pop(emit_offset)
+                    if not data:
+                        break
+                    if end is not None:
+                        data = data[:end - emit_offset]
+                    buffer = pool.acquire()
+                    buffer[:len(data)] = data
+                    writer.put(sink, buffer, len(data))
+                    emit_offset += len(data)
+                    progress.add_bytes(len(data))
+                received = {offset: data for offset, data in received.items() if offset >= emit_offset}
+        
+        if limit is not None and emit_offset != limit:
+            raise IOError(f"{remote_path}: 预期 {limit} 字节,只读到 {emit_offset} 字节(文件在下载期间被截短?)")
+        return emit_offset
+    
+    def open_archive(self, remote_path):
+        """读取远程归档的成员列表而不下载整个文件,返回 RemoteArchive"""
+        return RemoteArchive(self, remote_path)
+    
+    def stream_download(self, remote_path, sink, on_progress=None):
+        """把远程文件流式写入任意sink(有write和close方法),内存占用固定,返回字节数
+        
+        sink 可以是 FileSink、CommandSink(本地解压程序等)或 HashSink(只计算校验和).
+        """
+        name = posixpath.basename(remote_path.rstrip('/'))
+        try:
+            with self._streaming(f"流式下载 {name}", on_progress) as (sftp, writer, progress):
+                self._stream_file(sftp, remote_path, sink, writer, progress)
+                progress.add(0)
+        except Exception:
+            try:
+                sink.close()
+            except Exception:
+                pass
+            raise
+        sink.close()
+        return progress.bytes
+    
+    def checksum(self, remote_paths, algorithm='sha256', on_progress=None):
+        """计算文件的校验和,返回 路径 -> 十六进制摘要
+        
+        有远程辅助程序时在远程计算,只传回摘要;否则流式下载后在本地计算(不保存).
+        """
+        digests = {}
+        hashes = self._agent_results("hash", list(remote_paths), algorithm=algorithm)
+        if hashes is not None:
+            progress = TransferProgress(f"计算校验和 {len(remote_paths)} 个文件", on_progress)
+            for path, value in hashes.items():
+                if isinstance(value, Exception):
+                    raise value
+                digests[path], size = value
+                progress.add(size)
+            progress.finish()
+            return digests
+        with self._streaming(f"计算校验和 {len(remote_paths)} 个文件", on_progress) as (sftp, writer, progress):
+            for path in remote_paths:
+                sink = HashSink(algorithm)
+                self._stream_file(sftp, path, sink, writer, progress)
+                writer.drain()
+                digests[path] = sink.hexdigest()
+                progress.add(0)
+        return digests
+    
+    def download_to_archive(self, remote_paths, archive_path, on_progress=None):
+        """把多个远程文件/目录流式打包进一个本地归档(按扩展名选择zip或tar),返回 (文件数, 字节数)"""
+        archive = ArchiveWriter(archive_path)
+        try:
+            label = f"打包下载到 {os.path.basename(archive_path)}"
+            with self._streaming(label, on_progress) as (sftp, writer, progress):
+                for remote_path in remote_paths:
+                    for remote_item, relative, attr in self._walk_remote(remote_path, sftp):
+                        if stat.S_ISDIR(attr.st_mode):
+                            continue
+                        size = attr.st_size or 0
+                        with archive.open_member(relative, size, attr.st_mtime, attr.st_mode & 0o7777) as member:
+                            self._stream_file(sftp, remote_item, member, writer, progress, limit=size)
+                            writer.drain()
+                        progress.add(0)
+        except Exception:
+            # 不留下看似完整的半截归档
+            try:
+                archive.close()
+            finally:
+                os.remove(archive_path)
+            raise
+        archive.close()
+        return progress.files, progress.bytes
+    
+    def _sftp_upload_tree(self, local_dir, remote_parent, on_progress=None):
+        """无shell时的回退方案:通过SFTP上传目录树(先建目录,再并行暂存、统一发布文件)"""
+        local_dir = os.path.normpath(local_dir)
+        name = os.path.basename(local_dir)
+        pairs = []
+        directories = []
+        for root, dirs, files in os.walk(local_dir):
+            rel_root = os.path.relpath(root, os.path.dirname(local_dir)).replace('\\', '/')
+            remote_dir = posixpath.join(remote_parent, rel_root)
+            directories.append(remote_dir)
+            for file_name in files:
+                local_path = os.path.join(root, file_name)
+                if os.path.isfile(local_path) and not os.path.islink(local_path):
+                    pairs.append((local_path, posixpath.join(remote_dir, file_name)))
+        # 有辅助程序时一次请求建好全部目录,否则逐个mkdir(父目录在前)
+        if self._agent_results("mkdirs", directories) is None:
+            for remote_dir in directories:
+                try:
+                    self.sftp_client.mkdir(remote_dir)
+                except IOError:
+                    pass  # 目录已存在
+        return self.upload_many(pairs, on_progress, f"SFTP上传 {name}")
+    
+    # ---- 远程命令 ----
+    
+    def exec_command(self, command, on_output=None):
+        """执行远程命令,返回包含输出和退出码的结果
+        
+        指定 on_output(line, is_stderr) 时边接收边按行回调,适合长时间运行的命令.
+        """
+        stdin, stdout, stderr = self.ssh_client.exec_command(command)
+        if on_output is None:
+            stdout_data = stdout.read().decode('utf-8', errors='ignore')
+            stderr_data = stderr.read().decode('utf-8', errors='ignore')
+        else:
+            stdout_data, stderr_data = self._stream_channel(stdout.channel, on_output)
+        exit_code = stdout.channel.recv_exit_status()
+        
+        return {
+            'command': command,
+            'stdout': stdout_data,
+            'stderr': stderr_data,
+            'exit_code': exit_code
+        }
+    
+    @staticmethod
+    def _stream_channel(channel, on_output):
+        """交替读取标准输出和错误输出,每收到完整的一行就回调"""
+        streams = {
+            False: (channel.recv_ready, channel.recv),
+            True: (channel.recv_stderr_ready, channel.recv_stderr),
+        }
+        decoders = {key: codecs.getincrementaldecoder('utf-8')(errors='ignore') for key in streams}
+        pending = {key: "" for key in streams}
+        collected = {key: [] for key in streams}
+        
+        def feed(is_stderr, text):
+            collected[is_stderr].append(text)
+            lines = (pending[is_stderr] + text).split('\n')
+            pending[is_stderr] = lines.pop()
+            for line in lines:
+                on_output(line, is_stderr)
+        
+        while True:
+            select.select([channel], [], [], 1.0)
+            received = False
+            for is_stderr, (ready, recv) in streams.items():
+                if ready():
+                    feed(is_stderr, decoders[is_stderr].decode(recv(32768)))
+                    received = True
+            if not received and channel.eof_received:
+                break
+        
+        for is_stderr in streams:
+            feed(is_stderr, decoders[is_stderr].decode(b'', final=True))
+            if pending[is_stderr]:
+                on_output(pending[is_stderr], is_stderr)
+        return "".join(collected[False]), "".join(collected[True])
+    
+    def system_info(self):
+        """收集远程系统信息"""
+        commands = [
+            ("系统信息", "uname -a"),
+            ("磁盘使用", "df -h"),
+            ("内存信息", "free -h"),
+            ("CPU信息", "cat /proc/cpuinfo | grep 'model name' | head -1"),
+            ("系统负载", "uptime")
+        ]
+        
+        info_text = "远程系统信息\n" + "="*50 + "\n\n"
+        
+        for title, cmd in commands:
+            stdin, stdout, stderr = self.ssh_client.exec_command(cmd)
+            output = stdout.read().decode('utf-8', errors='ignore').strip()
+            if output:
+                info_text += f"{title}:\n{output}\n\n"
+        return info_text
+
+
+class ConnectionPrewarmer:
+    """为常用主机预先完成TCP连接和SSH握手(版本交换、密钥交换),真正连接时直接从认证开始
+    
+    服务器会断开迟迟不认证的连接(OpenSSH的LoginGraceTime默认120秒),因此预热结果只保留
+    ttl 秒,过期后关闭.需要paramiko支持 SSHClient.connect 的 transport_factory 参数(3.2+),
+    否则预热不生效,连接照常进行.
+    """
+    
+    def __init__(self, ttl=60.0, timeout=10):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._warm = {}       # (主机, 端口) -> (transport, 完成时间)
+        self._warming = set()
+    
+    @staticmethod
+    def supported():
+        return 'transport_factory' in inspect.signature(paramiko.SSHClient.connect).parameters
+    
+    def warm(self, hostname, port=22):
+        """在后台开始预热;已预热或正在预热时什么也不做"""
+        key = (hostname, int(port))
+        with self._lock:
+            self._expire()
+            if key in self._warm or key in self._warming:
+                return
+            self._warming.add(key)
+        threading.Thread(target=self._run, args=(key,), daemon=True).start()
+    
+    def take(self, hostname, port=22):
+        """取出预热好的连接,返回供 SSHClient.connect 使用的参数(没有时为空字典)"""
+        with self._lock:
+            self._expire()
+            entry = self._warm.pop((hostname, int(port)), None)
+        if entry is None:
+            return {}
+        transport = entry[0]
+        if not transport.is_active():
+            return {}
+        # 握手已在预热时完成,connect中的start_client不必再做
+        transport.start_client = lambda *args, **kwargs: None
+        return {'sock': transport.sock, 'transport_factory': lambda sock, **kwargs: transport}
+    
+    def close(self):
+        with self._lock:
+            entries, self._warm = list(self._warm.values()), {}
+        for transport, finished in entries:
+            transport.close()
+    
+    def _expire(self):
+        now = time.monotonic()
+        for key, (transport, finished) in list(self._warm.items()):
+            if now - finished > self.ttl or not transport.is_active():
+                del self._warm[key]
+                transport.close()
+    
+    def _run(self, key):
+        transport = None
+        try:
+            if self.supported():
+                sock = socket.create_connection(key, timeout=self.timeout)
+                transport = paramiko.Transport(sock)
+                transport.start_client(timeout=self.timeout)
+        except Exception:
+            # 预热失败不影响之后的正常连接
+            if transport is not None:
+                transport.close()
+            transport = None
+        with self._lock:
+            self._warming.discard(key)
+            if transport is not None:
+                self._warm[key] = (transport, time.monotonic())
+
+
+class _TunnelSocket:
+    """跳板机通道的socket包装:跳板机断开后关闭通道不再抛出异常(paramiko在传输线程中关闭socket)"""
+    
+    def __init__(self, channel):
+        self.channel = channel
+    
+    def __getattr__(self, name):
+        return getattr(self.channel, name)
+    
+    def close(self):
+        try:
+            self.channel.close()
+        except (EOFError, OSError, paramiko.SSHException):
+            pass
+
+
+class BastionPool:
+    """跳板机连接池
+    
+    每个跳板机只建立一条认证过的SSH传输(不打开SFTP),所有经它访问的内网主机
+    各自在这条传输上打开direct-tcpip通道,不再重复跳板机的握手和认证.
+    """
+    
+    def __init__(self, perf=None, timeout=10):
+        self.perf = perf
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._bastions = {}   # (主机, 用户名, 端口) -> SSHSession
+        self._locks = {}      # 同一跳板机同时只建立一次连接
+    
+    def get(self, spec, key_file=None, connect=None, default_port=22):
+        """返回已连接的跳板机会话;spec 形如 user@host[:port]
+        
+        connect(session) 负责认证(默认使用agent和默认密钥),只在跳板机尚未连接时调用.
+        """
+        key = parse_target(spec, default_port)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            bastion = self._bastions.get(key)
+            if bastion is not None and bastion.is_alive():
+                return bastion
+            hostname, username, port = key
+            bastion = SSHSession(hostname, username, port, key_file=key_file, perf=self.perf,
+                                 timeout=self.timeout, use_sftp=False)
+            if connect is not None:
+                connect(bastion)
+            else:
+                bastion.connect()
+            self._bastions[key] = bastion
+            return bastion
+    
+    def __len__(self):
+        return len(self._bastions)
+    
+    def close(self):
+        with self._lock:
+            bastions, self._bastions = list(self._bastions.values()), {}
+        for bastion in bastions:
+            bastion.close()
+
+
+class PortForward:
+    """一条端口转发及其统计;kind 为 'local'(-L,本地监听) 或 'remote'(-R,服务器监听)"""
+    
+    def __init__(self, kind, listen_host, listen_port, target_host, target_port):
+        self.kind = kind
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.target_host = target_host
+        self.target_port = target_port
+        self.active = 0              # 当前连接数
+        self.total = 0               # 累计连接数
+        self.bytes_sent = 0          # 发往目标的字节数
+        self.bytes_received = 0      # 从目标返回的字节数
+        self.rate_sent = 0.0         # 最近一个统计周期的速率(字节/秒)
+        self.rate_received = 0.0
+        self.error = None            # 最近一次连接失败的原因
+        self.listener = None         # 本地转发的监听socket
+        self.removed = False
+        self._sampled = (time.monotonic(), 0, 0)
+    
+    @property
+    def spec(self):
+        flag = "-L" if self.kind == 'local' else "-R"
+        return f"{flag} {self.listen_host}:{self.listen_port} -> {self.target_host}:{self.target_port}"
+    
+    def _sample(self, now):
+        started, sent, received = self._sampled
+        elapsed = max(now - started, 1e-6)
+        self.rate_sent = (self.bytes_sent - sent) / elapsed
+        self.rate_received = (self.bytes_received - received) / elapsed
+        self._sampled = (now, self.bytes_sent, self.bytes_received)
+    
+    def stats(self):
+        return {'spec': self.spec, 'kind': self.kind, 'active': self.active, 'total': self.total,
+                'bytes_sent': self.bytes_sent, 'bytes_received': self.bytes_received,
+                'rate_sent': self.rate_sent, 'rate_received': self.rate_received, 'error': self.error}
+
+
+class _ForwardedConnection:
+    """一条被转发的连接:本地socket与SSH通道之间各方向最多缓冲一块数据"""
+    
+    def __init__(self, forward, sock, channel):
+        self.forward = forward
+        self.sock = sock
+        self.channel = channel
+        self.to_channel = b""
+        self.to_sock = b""
+        self.sock_eof = False
+        self.channel_eof = False
+        self.closed = False
+
+
+class PortForwarder:
+    """端口转发管理器
+    
+    本地转发(-L)和远程转发(-R)都走会话现有的SSH传输.所有连接的数据转发由一个
+    selectors事件循环完成(paramiko的Channel提供可select的fileno),不为每个socket
+    创建线程;只有打开通道、连接本地目标这类阻塞操作交给一个小线程池.
+    会话重连后,远程转发会在新的传输上重新申请.
+    """
+    
+    BUFFER_SIZE = 64 * 1024
+    STATS_INTERVAL = 1.0         # 速率统计周期(秒)
+    SEND_RETRY = 0.02            # 通道发送窗口已满时的重试间隔(秒)
+    
+    def __init__(self, session, workers=4):
+        self.session = session
+        self.forwards = []
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._calls = queue.Queue()      # 其他线程交给事件循环执行的操作
+        self._connections = set()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._generation = session._generation
+        self._last_sample = time.monotonic()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    # ---- 添加与删除 ----
+    
+    def add_local(self, listen_port, target_host, target_port, listen_host="127.0.0.1"):
+        """本地监听 listen_host:listen_port,连接经SSH通道转到远程可达的 target_host:target_port"""
+        listener = socket.create_server((listen_host, listen_port))
+        listener.setblocking(False)
+        forward = PortForward('local', listen_host, listener.getsockname()[1], target_host, target_port)
+        forward.listener = listener
+        with self._lock:
+            self.forwards.append(forward)
+        self._call(self._selector.register, listener, selectors.EVENT_READ,
+                   functools.partial(self._accept, forward))
+        return forward
+    
+    def add_remote(self, listen_port, target_host, target_port, listen_host="127.0.0.1"):
+        """服务器监听 listen_host:listen_port,连接转回本机可达的 target_host:target_port"""
+        forward = PortForward('remote', listen_host, listen_port, target_host, target_port)
+        with self.session._global_lock:
+            forward.listen_port = self._transport().request_port_forward(
+                listen_host, listen_port, self._on_forwarded_channel)
+        with self._lock:
+            self.forwards.append(forward)
+        self._call(lambda: None)   # 唤醒事件循环,开始统计
+        return forward
+    
+    def remove(self, forward):
+        """停止一条转发并关闭它的所有连接"""
+        with self._lock:
+            if forward.removed:
+                return
+            forward.removed = True
+            self.forwards.remove(forward)
+        if forward.kind == 'remote':
+            self._cancel_remote(forward)
+        self._call(self._drop_forward, forward)
+    
+    def snapshot(self):
+        with self._lock:
+            return [forward.stats() for forward in self.forwards]
+    
+    def close(self):
+        for forward in list(self.forwards):
+            self.remove(forward)
+        self._closed = True
+        self._call(lambda: None)
+        self._thread.join(5)
+        self._executor.shutdown(wait=False)
+    
+    def _transport(self):
+        client = self.session.ssh_client
+        transport = client.get_transport() if client is not None else None
+        if transport is None or not transport.is_active():
+            raise paramiko.SSHException("未连接")
+        return transport
+    
+    def _cancel_remote(self, forward):
+        # 不用 Transport.cancel_port_forward:它会清除所有远程转发共用的处理函数
+        try:
+            with self.session._global_lock:
+                self._transport().global_request("cancel-tcpip-forward",
+                                                 (forward.listen_host, forward.listen_port), wait=True)
+        except (paramiko.SSHException, OSError, EOFError):
+            pass
+    
+    # ---- 建立连接(线程池) ----
+    
+    def _on_forwarded_channel(self, channel, origin, server):
+        """paramiko传输线程回调:服务器上有连接到达远程转发端口"""
+        with self._lock:
+            forward = next((f for f in self.forwards
+                            if f.kind == 'remote' and f.listen_port == server[1]), None)
+        if forward is None:
+            channel.close()
+            return
+        self._executor.submit(self._open_remote, forward, channel)
+    
+    def _open_remote(self, forward, channel):
+        try:
+            sock = socket.create_connection((forward.target_host, forward.target_port),
+                                            timeout=self.session.timeout)
+        except OSError as e:
+            forward.error = str(e)
+            channel.close()
+            return
+        self._call(self._attach, forward, sock, channel)
+    
+    def _open_local(self, forward, sock):
+        try:
+            channel = self.session.open_tunnel(forward.target_host, forward.target_port)
+        except Exception as e:
+            forward.error = str(e)
+            sock.close()
+            return
+        self._call(self._attach, forward, sock, channel)
+    
+    def _restore_remote(self, forwards):
+        """重连后在新传输上重新申请远程转发(尽量保持原端口)"""
+        for forward in forwards:
+            try:
+                with self.session._global_lock:
+                    self._transport().request_port_forward(
+                        forward.listen_host, forward.listen_port, self._on_forwarded_channel)
+                forward.error = None
+            except Exception as e:
+                forward.error = f"重新申请转发失败: {e}"
+    
+    # ---- 事件循环 ----
+    
+    def _call(self, func, *args):
+        """在事件循环线程中执行 func(*args)"""
+        self._calls.put((func, args))
+        try:
+            self._wake_w.send(b"x")
+        except OSError:
+            pass
+    
+    def _run(self):
+        try:
+            while not self._closed:
+                if any(conn.to_channel for conn in self._connections):
+                    timeout = self.SEND_RETRY
+                elif self.forwards:
+                    timeout = self.STATS_INTERVAL
+                else:
+                    timeout = None    # 没有转发时不做任何定时唤醒
+                for key, mask in self._selector.select(timeout):
+                    if key.data is None:
+                        try:
+                            self._wake_r.recv(4096)
+                        except OSError:
+                            pass
+                    else:
+                        key.data(mask)
+                while not self._calls.empty():
+                    func, args = self._calls.get_nowait()
+                    func(*args)
+                for conn in [conn for conn in self._connections if conn.to_channel]:
+                    self._write_channel(conn)
+                    self._update(conn)
+                self._tick()
+        finally:
+            for conn in list(self._connections):
+                self._close_connection(conn)
+            for forward in self.forwards:
+                if forward.listener is not None:
+                    forward.listener.close()
+            self._selector.close()
+            self._wake_r.close()
+            self._wake_w.close()
+    
+    def _tick(self):
+        now = time.monotonic()
+        if now - self._last_sample < self.STATS_INTERVAL:
+            return
+        self._last_sample = now
+        with self._lock:
+            forwards = list(self.forwards)
+        for forward in forwards:
+            forward._sample(now)
+        generation = self.session._generation
+        if generation != self._generation:
+            self._generation = generation
+            remote = [forward for forward in forwards if forward.kind == 'remote']
+            if remote:
+                self._executor.submit(self._restore_remote, remote)
+    
+    def _accept(self, forward, mask):
+        while True:
+            try:
+                sock, _ = forward.listener.accept()
+            except (BlockingIOError, OSError):
+                return
+            self._executor.submit(self._open_local, forward, sock)
+    
+    def _attach(self, forward, sock, channel):
+        if forward.removed or self._closed:
+            sock.close()
+            channel.close()
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        channel.setblocking(False)
+        conn = _ForwardedConnection(forward, sock, channel)
+        self._connections.add(conn)
+        forward.active += 1
+        forward.total += 1
+        forward.error = None
+        self._update(conn)
+    
+    def _drop_forward(self, forward):
+        if forward.listener is not None:
+            try:
+                self._selector.unregister(forward.listener)
+            except (KeyError, ValueError):
+                pass
+            forward.listener.close()
+        for conn in [conn for conn in self._connections if conn.forward is forward]:
+            self._close_connection(conn)
+    
+    def _count(self, conn, size, from_sock):
+        # 本地转发中socket一端是客户端,远程转发中通道一端是客户端
+        if from_sock == (conn.forward.kind == 'local'):
+            conn.forward.bytes_sent += size
+        else:
+            conn.forward.bytes_received += size
+    
+    def _on_sock(self, conn, mask):
+        if mask & selectors.EVENT_WRITE:
+            self._write_sock(conn)
+        if mask & selectors.EVENT_READ and not conn.closed and not conn.to_channel:
+            try:
+                data = conn.sock.recv(self.BUFFER_SIZE)
+            except BlockingIOError:
+                data = None
+            except OSError:
+                self._close_connection(conn)
+                return
+            if data == b"":
+                conn.sock_eof = True
+                try:
+                    conn.channel.shutdown_write()
+                except (OSError, EOFError, paramiko.SSHException):
+                    pass
+            elif data:
+                self._count(conn, len(data), from_sock=True)
+                conn.to_channel = data
+                self._write_channel(conn)
+        self._update(conn)
+    
+    def _on_channel(self, conn, mask):
+        if conn.to_sock:
+            return
+        try:
+            data = conn.channel.recv(self.BUFFER_SIZE)
+        except socket.timeout:
+            data = None
+        except (OSError, EOFError, paramiko.SSHException):
+            self._close_connection(conn)
+            return
+        if data == b"":
+            conn.channel_eof = True
+            try:
+                conn.sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+        elif data:
+            self._count(conn, len(data), from_sock=False)
+            conn.to_sock = data
+            self._write_sock(conn)
+        self._update(conn)
+    
+    def _write_channel(self, conn):
+        while conn.to_channel and not conn.closed:
+            try:
+                sent = conn.channel.send(conn.to_channel)
+            except socket.timeout:
+                return    # 发送窗口已满,稍后重试
+            except (OSError, EOFError, paramiko.SSHException):
+                self._close_connection(conn)
+                return
+            if sent == 0:
+                self._close_connection(conn)
+                return
+            conn.to_channel = conn.to_channel[sent:]
+    
+    def _write_sock(self, conn):
+        while conn.to_sock and not conn.closed:
+            try:
+                sent = conn.sock.send(conn.to_sock)
+            except BlockingIOError:
+                return
+            except OSError:
+                self._close_connection(conn)
+                return
+            conn.to_sock = conn.to_sock[sent:]
+    
+    def _update(self, conn):
+        """按缓冲状态调整两端关注的事件:有数据待写时暂停读取另一端(背压)"""
+        if conn.closed:
+            return
+        if conn.sock_eof and conn.channel_eof and not conn.to_sock and not conn.to_channel:
+            self._close_connection(conn)
+            return
+        sock_events = 0
+        if not conn.sock_eof and not conn.to_channel:
+            sock_events |= selectors.EVENT_READ
+        if conn.to_sock:
+            sock_events |= selectors.EVENT_WRITE
+        channel_events = selectors.EVENT_READ if not conn.channel_eof and not conn.to_sock else 0
+        self._set_events(conn.sock, sock_events, functools.partial(self._on_sock, conn))
+        self._set_events(conn.channel, channel_events, functools.partial(self._on_channel, conn))
+    
+    def _set_events(self, fileobj, events, callback):
+        try:
+            key = self._selector.get_key(fileobj)
+        except KeyError:
+            key = None
+        if not events:
+            if key is not None:
+                self._selector.unregister(fileobj)
+        elif key is None:
+            self._selector.register(fileobj, events, callback)
+        elif key.events != events:
+            self._selector.modify(fileobj, events, callback)
+    
+    def _close_connection(self, conn):
+        if conn.closed:
+            return
+        conn.closed = True
+        self._connections.discard(conn)
+        conn.forward.active -= 1
+        for end in (conn.sock, conn.channel):
+            try:
+                self._selector.unregister(end)
+            except (KeyError, ValueError):
+                pass
+            try:
+                end.close()
+            except (OSError, EOFError, paramiko.SSHException):
+                pass
+
+
+class ProfileStore:
+    """保存的连接配置(JSON文件),每个配置是一个字典
+    
+    字段: name, hostname, username, port, key_file, jump_host, default_path, favourite.
+    """
+    
+    FIELDS = ('name', 'hostname', 'username', 'port', 'key_file', 'jump_host', 'default_path', 'favourite')
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".ssh_gui_file_manager", "profiles.json")
+    
+    def __init__(self, path=None):
+        self.path = path or self.DEFAULT_PATH
+        self.profiles = {}
+        self.load()
+    
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = []
+        except ValueError:
+            # 文件损坏时改名保留,以空配置继续,避免下次保存时覆盖
+            os.replace(self.path, self.path + ".bad")
+            data = []
+        self.profiles = {item['name']: self._normalize(item) for item in data if item.get('name')}
+        return self
+    
+    def save(self):
+        """写入临时文件后替换,中途失败不会损坏已有配置"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.list(), f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+    
+    @classmethod
+    def _normalize(cls, profile):
+        profile = {field: profile.get(field) for field in cls.FIELDS}
+        profile['port'] = int(profile['port'] or 22)
+        profile['favourite'] = bool(profile['favourite'])
+        return profile
+    
+    def list(self):
+        """收藏的在前,其余按名称排序"""
+        return sorted(self.profiles.values(), key=lambda p: (not p['favourite'], p['name'].lower()))
+    
+    def favourites(self):
+        return [profile for profile in self.list() if profile['favourite']]
+    
+    def get(self, name):
+        return self.profiles.get(name)
+    
+    def put(self, profile):
+        profile = self._normalize(profile)
+        self.profiles[profile['name']] = profile
+        self.save()
+        return profile
+    
+    def delete(self, name):
+        if self.profiles.pop(name, None) is not None:
+            self.save()
+
+
+class ConnectionMonitor:
+    """连接监视:定期探测连接,判定断开后触发自动重连
+    
+    传输层的keepalive保证空闲连接不被中间设备回收;本监视器额外发送
+    需要回复的探测请求,以便在TCP层尚未报错时也能及时发现死连接.
+    """
+    
+    def __init__(self, session, interval=15, timeout=10, on_failed=None):
+        self.session = session
+        self.interval = interval
+        self.timeout = timeout
+        self.on_failed = on_failed
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self.session.probe(self.timeout) is not None:
+                continue
+            if self._stop.is_set():
+                return
+            try:
+                self.session.reconnect(seen_generation=self.session._generation)
+            except Exception as e:
+                if self.on_failed and not self._stop.is_set():
+                    self.on_failed(e)
+                return
+
+
+class ListingCache:
+    """目录列表缓存:按路径保存最近的列表,超过有效期或条目数上限后淘汰(LRU)"""
+    
+    def __init__(self, ttl=15.0, limit=64):
+        self.ttl = ttl
+        self.limit = limit
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, path):
+        """返回仍在有效期内的列表,否则返回None"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            stored, files = entry
+            if time.monotonic() - stored > self.ttl:
+                del self._entries[path]
+                return None
+            self._entries.move_to_end(path)
+            return files
+    
+    def __contains__(self, path):
+        return self.get(path) is not None
+    
+    def put(self, path, files):
+        with self._lock:
+            self._entries[path] = (time.monotonic(), files)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.limit:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, path=None):
+        """使某个目录(未指定时为全部)的缓存失效"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+class TerminalHistory:
+    """终端输出历史:按 (文本, 标签) 段保存在有界环形缓冲区中,超过字符上限时丢弃最旧的段
+    
+    偏移量是从会话开始累计的全局字符位置,丢弃旧段后仍然有效;start/end 是当前保留的范围.
+    """
+    
+    def __init__(self, max_chars=4 * 1024 * 1024):
+        self.max_chars = max_chars
+        self._segments = collections.deque()   # [全局起始偏移, 文本, 标签]
+        self.start = 0
+        self.end = 0
+        self._text = None
+        self._folded = None
+    
+    def __len__(self):
+        return self.end - self.start
+    
+    def append(self, text, tag=None):
+        """追加一段输出,返回因超出上限被丢弃的字符数"""
+        if not text:
+            return 0
+        self._segments.append([self.end, text, tag])
+        self.end += len(text)
+        self._text = self._folded = None
+        dropped = 0
+        while self.end - self.start > self.max_chars:
+            segment = self._segments[0]
+            excess = self.end - self.start - self.max_chars
+            if len(segment[1]) <= excess:
+                self._segments.popleft()
+                self.start += len(segment[1])
+                dropped += len(segment[1])
+            else:
+                # 单段超过剩余上限时只截掉它的开头
+                segment[1] = segment[1][excess:]
+                segment[0] += excess
+                self.start += excess
+                dropped += excess
+        return dropped
+    
+    def clear(self):
+        self._segments.clear()
+        self.start = self.end
+        self._text = self._folded = None
+    
+    def text(self):
+        """全部保留的历史文本(拼接结果缓存到下次追加)"""
+        if self._text is None:
+            self._text = "".join(segment[1] for segment in self._segments)
+        return self._text
+    
+    def segments(self, start=None, end=None):
+        """返回 [start, end) 范围内的 (文本, 标签) 段,范围会被限制在保留的历史内"""
+        start = self.start if start is None else max(start, self.start)
+        end = self.end if end is None else min(end, self.end)
+        result = []
+        for offset, text, tag in self._segments:
+            if offset + len(text) <= start:
+                continue
+            if offset >= end:
+                break
+            result.append((text[max(start - offset, 0):end - offset], tag))
+        return result
+    
+    def line_start(self, offset):
+        """offset 所在行的行首偏移(不早于保留的历史开头)"""
+        offset = min(max(offset, self.start), self.end)
+        return self.text().rfind("\n", 0, offset - self.start) + 1 + self.start
+    
+    def next_line(self, offset):
+        """offset 之后下一行的行首偏移,没有换行时返回 end"""
+        offset = min(max(offset, self.start), self.end)
+        index = self.text().find("\n", offset - self.start)
+        return self.end if index < 0 else index + 1 + self.start
+    
+    def tail_start(self, chars):
+        """末尾约 chars 个字符的起点,对齐到行首"""
+        if self.end - chars <= self.start:
+            return self.start
+        return self.next_line(self.end - chars)
+    
+    def _haystack(self, match_case):
+        text = self.text()
+        if match_case:
+            return text
+        if self._folded is None:
+            folded = text.lower()
+            # 少数字符转小写后长度会变,此时偏移无法对应,退回正则匹配
+            self._folded = folded if len(folded) == len(text) else False
+        return self._folded
+    
+    def find(self, query, offset=None, backwards=False, match_case=False):
+        """从 offset 起查找 query,返回匹配的全局偏移或None
+        
+        向前查找返回起点不早于 offset 的第一个匹配;向后查找返回起点早于 offset 的最后一个匹配.
+        """
+        if not query:
+            return None
+        if offset is None:
+            offset = self.end if backwards else self.start
+        position = min(max(offset - self.start, 0), self.end - self.start)
+        haystack = self._haystack(match_case)
+        if haystack is False:
+            pattern = re.compile(re.escape(query), re.IGNORECASE)
+            if not backwards:
+                match = pattern.search(self.text(), position)
+                return None if match is None else match.start() + self.start
+            last = None
+            for match in pattern.finditer(self.text(), 0, position + len(query) - 1):
+                last = match.start()
+            return None if last is None else last + self.start
+        needle = query if match_case else query.lower()
+        if backwards:
+            index = haystack.rfind(needle, 0, position + len(needle) - 1)
+        else:
+            index = haystack.find(needle, position)
+        return None if index < 0 else index + self.start
+    
+    def count(self, query, match_case=False):
+        """历史中 query 出现的次数"""
+        if not query:
+            return 0
+        haystack = self._haystack(match_case)
+        if haystack is False:
+            return len(re.findall(re.escape(query), self.text(), re.IGNORECASE))
+        return haystack.count(query if match_case else query.lower())
+    
+    def export(self, path):
+        """把保留的历史写入文本文件,返回写入的字符数"""
+        text = self.text()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return len(text)
+
+
+class DirectoryPrefetcher:
+    """推测性预取:在独立的低优先级SFTP通道上,提前列出用户接下来可能进入的目录
+    
+    每次 request() 会替换之前尚未处理的候选;cancel() 立即放弃队列,
+    正在进行的那一次列目录结束后结果仍会写入缓存,但不会再继续.
+    预算限制每轮最多列出的目录数、最大条目数和总耗时,避免占用太多带宽.
+    """
+    
+    def __init__(self, session, cache, max_dirs=8, max_entries=20000, max_seconds=3.0):
+        self.session = session
+        self.cache = cache
+        self.max_dirs = max_dirs
+        self.max_entries = max_entries
+        self.max_seconds = max_seconds
+        self._generation = 0
+        self._queue = []
+        self._condition = threading.Condition()
+        self._sftp = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def request(self, paths):
+        """提交新一轮候选目录(按优先级排列),已缓存的会被跳过"""
+        with self._condition:
+            self._generation += 1
+            self._queue = [path for path in dict.fromkeys(paths) if path not in self.cache]
+            self._condition.notify()
+    
+    def cancel(self):
+        """用户有了真实请求:放弃所有尚未开始的预取"""
+        with self._condition:
+            self._generation += 1
+            self._queue = []
+    
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._queue = []
+            self._condition.notify()
+        self._drop_channel()
+    
+    def _drop_channel(self):
+        sftp, self._sftp = self._sftp, None
+        if sftp is not None:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                generation = self._generation
+                queue, self._queue = self._queue[:self.max_dirs], []
+            
+            started = time.monotonic()
+            entries = 0
+            for path in queue:
+                if (generation != self._generation or self._closed
+                        or entries >= self.max_entries or time.monotonic() - started > self.max_seconds):
+                    break
+                if path in self.cache:
+                    continue
+                try:
+                    if self._sftp is None:
+                        self._sftp = self.session.open_sftp_channel()
+                    with self.session.perf.span("prefetch.list_dir", "listing", path):
+                        # 不经过 list_dir 的自动重连:推测性的预取失败时不应触发重连
+                        files = self.session._list_dir(path, self._sftp)
+                except Exception as e:
+                    if isinstance(e, IOError) and self._sftp is not None and not self._sftp.sock.closed:
+                        continue  # 没有权限或已被删除
+                    # 通道已断开:放弃本轮,下次重新打开通道
+                    self._drop_channel()
+                    break
+                entries += len(files)
+                self.cache.put(path, files)
+
+
+class DirectoryWatcher:
+    """监视远程目录的变化并推送增量更新
+    
+    远程装有 inotifywait 时,在一个常驻的exec通道上运行 `inotifywait -m`,
+    把创建/删除/修改事件攒成小批后只对变化的条目做一次流水线lstat;
+    否则退回自适应轮询:只比较目录的mtime,变化时才重新列目录,
+    无变化时逐步拉长轮询间隔.
+    
+    on_update(upserts, deletes) 接收增量(列表项列表, 名称列表),
+    on_listing(files) 接收轮询模式下的完整列表.回调在监视线程中执行.
+    """
+    
+    BATCH_DELAY = 0.2        # 事件攒批时间(秒)
+    POLL_MIN_INTERVAL = 2.0  # 轮询的最短间隔(秒)
+    POLL_MAX_INTERVAL = 30.0 # 目录长期不变时的最长间隔(秒)
+    
+    def __init__(self, session, path, on_update, on_listing, on_status=None):
+        self.session = session
+        self.path = path
+        self.on_update = on_update
+        self.on_listing = on_listing
+        self.on_status = on_status or (lambda message: None)
+        self.mode = None
+        self._stop = threading.Event()
+        self._channel = None
+        self._sftp = None
+    
+    def start(self):
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+        for resource in (self._channel, self._sftp):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+    
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+    
+    def _run(self):
+        try:
+            self._sftp = self.session.open_sftp_channel()
+            if self._inotify_available():
+                self.mode = "inotify"
+                self.on_status(f"正在监视 {self.path} (inotify)")
+                self._watch_inotify()
+            if not self.stopped:
+                self.mode = "poll"
+                self.on_status(f"正在监视 {self.path} (轮询)")
+                self._watch_poll()
+        except Exception as e:
+            if not self.stopped:
+                self.on_status(f"目录监视已停止: {e}")
+    
+    def _inotify_available(self):
+        try:
+            result = self.session.exec_command("command -v inotifywait")
+        except Exception:
+            return False
+        return result['exit_code'] == 0 and bool(result['stdout'].strip())
+    
+    def _watch_inotify(self):
+        """读取inotifywait的事件流;通道意外结束时返回,由调用者退回轮询"""
+        command = ("exec inotifywait -m -q --format '%e %f' "
+                   "-e create,delete,modify,attrib,close_write,moved_to,moved_from,delete_self,move_self "
+                   f"-- {shlex.quote(self.path)}")
+        stdin, stdout, stderr = self.session.ssh_client.exec_command(command)
+        self._channel = stdout.channel
+        self._channel.settimeout(self.BATCH_DELAY)
+        
+        buffer = b""
+        changed, deleted = set(), set()
+        while not self.stopped:
+            try:
+                data = self._channel.recv(32768)
+                if not data:
+                    break
+                buffer += data
+            except socket.timeout:
+                # 一段时间没有新事件:提交攒下的一批
+                if changed or deleted:
+                    self._apply(changed, deleted)
+                    changed, deleted = set(), set()
+                continue
+            
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                events, _, name = line.decode('utf-8', errors='replace').partition(' ')
+                events = set(events.split(','))
+                if events & {'DELETE_SELF', 'MOVE_SELF'}:
+                    self.stop()
+                    self.on_status(f"{self.path} 已被删除或移动,停止监视")
+                    return
+                if events & {'DELETE', 'MOVED_FROM'}:
+                    deleted.add(name)
+                    changed.discard(name)
+                elif name:
+                    changed.add(name)
+                    deleted.discard(name)
+    
+    def _apply(self, changed, deleted):
+        """对变化的条目做一次批量lstat,消失的条目作为删除处理"""
+        upserts = self.session.stat_entries(self.path, changed, self._sftp) if changed else []
+        found = {file_info['name'] for file_info in upserts}
+        self.on_update(upserts, sorted(deleted | (changed - found)))
+    
+    def _watch_poll(self):
+        """自适应轮询:目录mtime不变就不重新列目录,并逐步拉长间隔"""
+        interval = self.POLL_MIN_INTERVAL
+        last_mtime = self._sftp.stat(self.path).st_mtime
+        recheck = False
+        while not self._stop.wait(interval):
+            mtime = self._sftp.stat(self.path).st_mtime
+            if mtime == last_mtime and not recheck:
+                interval = min(interval * 1.5, self.POLL_MAX_INTERVAL)
+                continue
+            # mtime只精确到秒:变化后再多列一次,补上同一秒内发生的后续修改
+            recheck = mtime != last_mtime
+            last_mtime = mtime
+            interval = self.POLL_MIN_INTERVAL
+            self.on_listing(self.session.list_dir(self.path, self._sftp))
+
+
+# ---- 多主机 ----
+
+def run_on_hosts(targets, command, connect, max_workers=8, on_output=None, on_result=None):
+    """在多台主机上并行执行同一命令
+    
+    connect(target) 返回已连接的 SSHSession;同时最多保持 max_workers 个会话.
+    on_output(target, line, is_stderr) 流式接收输出,on_result(result) 在每台主机结束时回调.
+    返回与 targets 顺序一致的结果列表,连接或执行失败时 exit_code 为 None 并记录 error.
+    """
+    def run_one(target):
+        started = time.perf_counter()
+        result = {'target': target, 'command': command, 'stdout': "", 'stderr': "",
+                  'exit_code': None, 'error': None}
+        try:
+            with connect(target) as session:
+                line_callback = None
+                if on_output is not None:
+                    line_callback = lambda line, is_stderr: on_output(target, line, is_stderr)
+                result.update(session.exec_command(command, on_output=line_callback))
+        except Exception as e:
+            result['error'] = str(e) or e.__class__.__name__
+        result['seconds'] = time.perf_counter() - started
+        if on_result is not None:
+            on_result(result)
+        return result
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return list(pool.map(run_one, targets))
+
+
+def group_identical_results(results):
+    """把输出和退出码完全相同的主机合并为一组,按组大小从大到小排列"""
+    groups = {}
+    for result in results:
+        key = (result['stdout'], result['stderr'], result['exit_code'], result['error'])
+        groups.setdefault(key, []).append(result['target'])
+    return sorted(
+        ({'targets': targets, 'stdout': stdout, 'stderr': stderr, 'exit_code': exit_code, 'error': error}
+         for (stdout, stderr, exit_code, error), targets in groups.items()),
+        key=lambda group: -len(group['targets']))
+
+
+def format_results_table(results):
+    """生成各主机退出码汇总表的文本行"""
+    width = max([len("主机")] + [len(result['target']) for result in results])
+    lines = [f"{'主机':<{width}}  退出码      耗时  状态"]
+    for result in results:
+        code = "-" if result['exit_code'] is None else str(result['exit_code'])
+        if result['error']:
+            state = f"错误: {result['error']}"
+        else:
+            state = "成功" if result['exit_code'] == 0 else "失败"
+        lines.append(f"{result['target']:<{width}}  {code:>6}  {result['seconds']:7.2f}s  {state}")
+    ok = sum(1 for result in results if result['exit_code'] == 0)
+    lines.append(f"共 {len(results)} 台主机: {ok} 台成功, {len(results) - ok} 台失败")
+    return lines
+
+
+# ---- 命令行 ----
+
+def parse_target(target, default_port=22):
+    """解析 user@host[:port],返回 (主机, 用户名, 端口)"""
+    username, _, host = target.rpartition('@')
+    port = default_port
+    if host.count(':') == 1:
+        host, port_text = host.split(':')
+        port = int(port_text)
+    return host, username or getpass.getuser(), port
+
+
+def parse_forward(spec):
+    """解析 [bind_address:]port:host:hostport(同ssh -L/-R),返回 (监听地址, 端口, 目标主机, 目标端口)"""
+    parts = spec.split(':')
+    if len(parts) == 3:
+        parts.insert(0, "127.0.0.1")
+    if len(parts) != 4:
+        raise ValueError(f"转发格式应为 [bind_address:]port:host:hostport: {spec}")
+    bind_host, port, host, host_port = parts
+    return bind_host or "127.0.0.1", int(port), host, int(host_port)
+
+
+class _PasswordPrompt:
+    """多主机并行时只询问一次密码"""
+    
+    def __init__(self, password=None):
+        self.password = password
+        self._lock = threading.Lock()
+    
+    def get(self, session):
+        with self._lock:
+            if self.password is None:
+                self.password = getpass.getpass(f"{session.label} 的密码: ")
+            return self.password
+
+
+def _connect_for_cli(session, prompt):
+    """命令行连接:先尝试密钥/agent,失败后在终端询问密码"""
+    password = prompt.password
+    try:
+        return session.connect(password=password)
+    except paramiko.SSHException:
+        # 认证失败,或既没有agent也没有默认密钥可用
+        if session.key_file or password is not None or not sys.stdin.isatty():
+            raise
+        return session.connect(password=prompt.get(session))
+
+
+def _cli_session(args, target, prompt):
+    """按命令行参数创建会话;指定了跳板机时经共用的跳板机连接"""
+    hostname, username, port = parse_target(target, args.port)
+    jump = None
+    if args.jump:
+        jump = args.bastions.get(args.jump, key_file=args.key,
+                                 connect=lambda bastion: _connect_for_cli(bastion, args.jump_prompt))
+    return SSHSession(hostname, username, port, key_file=args.key, jump=jump, use_agent=args.agent)
+
+
+def _cli_run_host(args, target, prompt, output):
+    """在一台主机上执行命令行子命令,返回退出码"""
+    session = _cli_session(args, target, prompt)
+    hostname = session.hostname
+    with _connect_for_cli(session, prompt):
+        command = args.command
+        if command == "ls":
+            for info in session.list_dir(args.path):
+                size = "-" if info['type'] == 'directory' else str(info['size'])
+                link = f" -> {info['link_target']}" if info.get('link_target') is not None else ""
+                output(f"{info['permissions']} {size:>12} {info['modified']} {info['name']}{link}")
+        elif command == "stat":
+            for key, value in session.stat(args.path).items():
+                output(f"{key}: {value}")
+        elif command == "get":
+            local = args.local.format(host=hostname)
+            if args.recursive:
+                os.makedirs(local, exist_ok=True)
+                files, total = session.download_dir(args.remote, local, bundle=not args.no_bundle)
+                output(f"{files} 个文件, {format_size(total)}")
+            else:
+                _cli_report_verify(session.download(args.remote, local, verify=args.verify), output)
+        elif command == "put":
+            if args.recursive:
+                files, total = 0, 0
+                for local in args.local:
+                    done = session.upload_dir(local, args.remote, bundle=not args.no_bundle)
+                    files, total = files + done[0], total + done[1]
+                output(f"{files} 个文件, {format_size(total)}")
+            elif len(args.local) > 1:
+                pairs = [(local, posixpath.join(args.remote, os.path.basename(local))) for local in args.local]
+                files, total = session.upload_many(pairs)
+                output(f"{files} 个文件, {format_size(total)}")
+            else:
+                remote = args.remote
+                if remote.endswith('/'):
+                    remote = posixpath.join(remote, os.path.basename(args.local[0]))
+                _cli_report_verify(session.upload(args.local[0], remote, verify=args.verify), output)
+        elif command == "cat":
+            sink = CommandSink(args.to_command) if args.to_command else FileSink(sys.stdout.buffer)
+            session.stream_download(args.remote, sink)
+        elif command == "sum":
+            for path, digest in session.checksum(args.paths, args.algorithm).items():
+                output(f"{digest}  {path}")
+        elif command == "archive":
+            files, total = session.download_to_archive(args.paths, args.archive.format(host=hostname))
+            output(f"{files} 个文件, {format_size(total)}")
+        elif command == "peek":
+            _cli_peek(session, args, output)
+        elif command == "mkdir":
+            session.mkdir(args.path)
+        elif command == "rm":
+            if args.recursive:
+                return _cli_report_errors(session.delete(args.paths), output)
+            for path in args.paths:
+                if args.dir:
+                    session.rmdir(path)
+                else:
+                    session.remove(path)
+        elif command == "mv":
+            if len(args.paths) == 1:
+                session.rename(args.paths[0], args.dest)
+            else:
+                return _cli_report_errors(session.move(args.paths, args.dest), output)
+        elif command == "chmod":
+            return _cli_report_errors(session.set_attributes(args.paths, mode=int(args.mode, 8)), output)
+        elif command == "ln":
+            session.symlink(args.target_path, args.link_path)
+        elif command == "exec":
+            result = session.exec_command(" ".join(args.remote_command))
+            for line in result['stdout'].splitlines():
+                output(line)
+            for line in result['stderr'].splitlines():
+                output(line, error=True)
+            return result['exit_code']
+        elif command == "info":
+            for line in session.system_info().splitlines():
+                output(line)
+        elif command == "forward":
+            _cli_forward(session, args, output)
+    return 0
+
+
+def _cli_peek(session, args, output):
+    """列出远程归档内的目录,或提取其中一个成员"""
+    archive = session.open_archive(args.archive)
+    try:
+        member = archive.members.get(args.member.strip('/')) if args.member else None
+        if member is None or member['type'] == 'directory':
+            if args.member and member is None and args.member.strip('/'):
+                raise FileNotFoundError(f"归档中没有 {args.member}")
+            for info in archive.list_dir(args.member or ""):
+                size = "-" if info['type'] == 'directory' else str(info['size'])
+                link = f" -> {info['link_target']}" if info.get('link_target') is not None else ""
+                output(f"{info['permissions']} {size:>12} {info['modified']} {info['path']}{link}")
+            return
+        if args.output:
+            local = args.output.format(host=session.hostname)
+            if os.path.isdir(local):
+                local = os.path.join(local, posixpath.basename(member['name']))
+            total = archive.extract(member['name'], FileSink(local))
+            output(f"{local}: {format_size(total)}")
+        else:
+            archive.extract(member['name'], FileSink(sys.stdout.buffer))
+    finally:
+        archive.close()
+
+
+def _cli_forward(session, args, output):
+    """保持端口转发直到Ctrl+C"""
+    with PortForwarder(session) as forwarder:
+        for spec in args.local:
+            bind_host, port, host, host_port = parse_forward(spec)
+            output(f"转发 {forwarder.add_local(port, host, host_port, bind_host).spec}")
+        for spec in args.remote:
+            bind_host, port, host, host_port = parse_forward(spec)
+            output(f"转发 {forwarder.add_remote(port, host, host_port, bind_host).spec}")
+        while not args.stop.wait(args.interval or None):
+            for row in forwarder.snapshot():
+                error = f"  错误: {row['error']}" if row['error'] else ""
+                output(f"{row['spec']}  连接 {row['active']}/{row['total']}  "
+                       f"发送 {format_size(int(row['rate_sent']))}/秒  "
+                       f"接收 {format_size(int(row['rate_received']))}/秒{error}")
+
+
+def _cli_report_verify(result, output):
+    """输出传输校验结果"""
+    if result is None:
+        return
+    if not result['verified']:
+        output("警告: 远程无法计算哈希,未校验", error=True)
+    else:
+        output(f"{result['algorithm']} 校验通过: {result['blocks']} 块, 重传 {result['repaired']} 块")
+
+
+def _cli_report_errors(errors, output):
+    """输出批量操作中失败的条目,返回退出码"""
+    failed = {path: error for path, error in errors.items() if error is not None}
+    for path, error in failed.items():
+        output(f"{path}: {error}", error=True)
+    return 1 if failed else 0
+
+
+def _cli_multi_exec(args, prompt, make_output):
+    """多主机执行命令:流式输出或合并相同输出,最后打印退出码汇总表"""
+    def connect(target):
+        return _connect_for_cli(_cli_session(args, target, prompt), prompt)
+    
+    outputs = {target: make_output(target) for target in args.target}
+    on_output = None
+    if not args.group:
+        on_output = lambda target, line, is_stderr: outputs[target](line, error=is_stderr)
+    results = run_on_hosts(args.target, " ".join(args.remote_command), connect,
+                           max_workers=args.jobs, on_output=on_output)
+    
+    if args.group:
+        for group in group_identical_results(results):
+            print(f"==> {len(group['targets'])} 台主机: {', '.join(group['targets'])}")
+            if group['error']:
+                print(f"错误: {group['error']}")
+            sys.stdout.write(group['stdout'])
+            sys.stderr.write(group['stderr'])
+            sys.stdout.flush()
+    for line in format_results_table(results):
+        print(line, file=sys.stderr)
+    
+    failed = [result for result in results if result['exit_code'] != 0]
+    return max((result['exit_code'] or 1) for result in failed) if failed else 0
+
+
+def build_cli_parser():
+    """命令行参数定义"""
+    parser = argparse.ArgumentParser(
+        prog="ssh_file_core",
+        description="SSH远程资源管理器命令行:无界面地浏览、传输文件和执行命令,可对多台主机并行操作"
+    )
+    parser.add_argument("-t", "--target", action="append", required=True,
+                        help="目标主机 user@host[:port],可重复指定以并行处理多台主机")
+    parser.add_argument("-p", "--port", type=int, default=22, help="默认端口(默认22)")
+    parser.add_argument("-i", "--key", help="RSA私钥文件")
+    parser.add_argument("-J", "--jump", metavar="USER@HOST[:PORT]",
+                        help="经跳板机连接;多台主机共用一条到跳板机的连接")
+    parser.add_argument("--password-env", metavar="VAR", help="从环境变量VAR读取密码")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="最多同时连接的主机数(默认8)")
+    parser.add_argument("--no-bundle", action="store_true", help="目录传输不使用tar打包,逐个文件SFTP传输")
+    parser.add_argument("--agent", action="store_true",
+                        help="上传并使用远程辅助程序(需要远程python3),批量操作一次往返完成")
+    
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ls", help="列出目录")
+    p.add_argument("path", nargs="?", default=".")
+    p = sub.add_parser("stat", help="显示文件属性")
+    p.add_argument("path")
+    p = sub.add_parser("get", help="下载文件或目录")
+    p.add_argument("remote")
+    p.add_argument("local", help="本地路径,可包含 {host} 以区分多台主机")
+    p.add_argument("-r", "--recursive", action="store_true", help="下载目录")
+    p.add_argument("--verify", action="store_true", help="比对分块哈希,不一致的块自动重新获取(单个文件)")
+    p = sub.add_parser("put", help="上传文件或目录(先写入暂存文件,完成后原子重命名到目标)")
+    p.add_argument("local", nargs="+", help="本地路径;多个文件时并行上传,全部完成后统一发布")
+    p.add_argument("remote", help="远程路径;以/结尾时保留本地文件名,多个文件或目录上传时为父目录")
+    p.add_argument("-r", "--recursive", action="store_true", help="上传目录")
+    p.add_argument("--verify", action="store_true", help="比对分块哈希,不一致的块自动重新写入(单个文件)")
+    p = sub.add_parser("cat", help="流式输出远程文件到标准输出或本地命令,内存占用固定")
+    p.add_argument("remote")
+    p.add_argument("--to-command", metavar="CMD", help="写入本地命令的标准输入,如 'zstd -d -o out'")
+    p = sub.add_parser("sum", help="计算远程文件的校验和(流式读取,不保存)")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-a", "--algorithm", default="sha256", choices=sorted(hashlib.algorithms_guaranteed))
+    p = sub.add_parser("archive", help="把远程文件/目录流式打包到一个本地归档(.zip/.tar/.tar.gz)")
+    p.add_argument("archive", help="本地归档路径,可包含 {host} 以区分多台主机")
+    p.add_argument("paths", nargs="+")
+    p = sub.add_parser("peek", help="浏览远程归档(.zip/.tar.*/.gz)或提取其中一个成员,不下载整个归档")
+    p.add_argument("archive")
+    p.add_argument("member", nargs="?", help="归档内的目录(列出)或文件(提取)")
+    p.add_argument("-o", "--output", help="提取到本地路径(默认写到标准输出),可包含 {host}")
+    p = sub.add_parser("mkdir", help="创建目录")
+    p.add_argument("path")
+    p = sub.add_parser("rm", help="删除文件或空目录")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-d", "--dir", action="store_true", help="删除空目录")
+    p.add_argument("-r", "--recursive", action="store_true", help="连同内容删除目录(不跟随符号链接)")
+    p = sub.add_parser("mv", help="重命名;给出多个源路径时移动到目标目录(一个流水线批次)")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("dest")
+    p = sub.add_parser("chmod", help="修改权限(一个流水线批次)")
+    p.add_argument("mode", help="八进制权限,如 644")
+    p.add_argument("paths", nargs="+")
+    p = sub.add_parser("ln", help="创建符号链接")
+    p.add_argument("target_path", metavar="target")
+    p.add_argument("link_path", metavar="link")
+    p = sub.add_parser("forward", help="端口转发,直到Ctrl+C;定期输出各转发的连接数和速率")
+    p.add_argument("-L", dest="local", action="append", default=[], metavar="[BIND:]PORT:HOST:HOSTPORT",
+                   help="本地转发(同ssh -L),可重复")
+    p.add_argument("-R", dest="remote", action="append", default=[], metavar="[BIND:]PORT:HOST:HOSTPORT",
+                   help="远程转发(同ssh -R),可重复")
+    p.add_argument("--interval", type=float, default=5.0, help="统计输出间隔(秒),0表示不输出")
+    p = sub.add_parser("exec", help="执行远程命令")
+    p.add_argument("-g", "--group", action="store_true",
+                   help="多台主机时合并输出完全相同的主机(全部结束后输出)")
+    p.add_argument("remote_command", nargs=argparse.REMAINDER)
+    sub.add_parser("info", help="显示远程系统信息")
+    return parser
+
+
+def run_cli(argv=None):
+    """命令行入口,返回进程退出码"""
+    args = build_cli_parser().parse_args(argv)
+    args.bastions = BastionPool()
+    args.stop = threading.Event()   # Ctrl+C时通知端口转发等长时间运行的子命令结束
+    password = os.environ.get(args.password_env) if args.password_env else None
+    prompt = _PasswordPrompt(password)
+    args.jump_prompt = _PasswordPrompt(password)   # 跳板机的密码单独询问
+    multi = len(args.target) > 1
+    print_lock = threading.Lock()
+    
+    def make_output(target):
+        def output(line, error=False):
+            stream = sys.stderr if error else sys.stdout
+            with print_lock:
+                print(f"[{target}] {line}" if multi else line, file=stream)
+        return output
+    
+    def run_one(target):
+        output = make_output(target)
+        try:
+            return _cli_run_host(args, target, prompt, output)
+        except Exception as e:
+            output(f"错误: {e}", error=True)
+            return 1
+    
+    try:
+        if args.command == "exec" and multi:
+            return _cli_multi_exec(args, prompt, make_output)
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = [pool.submit(run_one, target) for target in args.target]
+            try:
+                codes = [future.result() for future in futures]
+            except KeyboardInterrupt:
+                # 信号只送达主线程,由它通知各主机的子命令收尾
+                args.stop.set()
+                codes = [future.result() for future in futures]
+        return max(codes) if codes else 0
+    finally:
+        args.bastions.close()
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -1,33 +1,121 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
-import paramiko
+import importlib.util
 import os
-import stat
+import posixpath
+import sys
 import datetime
 import threading
+import time
 from typing import List, Dict, Optional
-import queue
 import traceback
+import collections
+import queue
 
-# 兼容不同版本的 Paramiko 主机密钥策略
-try:
-    # 尝试导入 AutoAddHostKeyPolicy(新版本)
-    AutoAddHostKeyPolicy = paramiko.AutoAddHostKeyPolicy
-except AttributeError:
-    try:
-        # 尝试从 client 模块导入(某些版本)
-        from paramiko.client import AutoAddPolicy as AutoAddHostKeyPolicy
-    except ImportError:
-        # 如果都不存在,创建自定义策略
-        class AutoAddHostKeyPolicy(paramiko.MissingHostKeyPolicy):
-            def missing_host_key(self, client, hostname, key):
-                # 自动接受所有主机密钥
-                pass
+from ssh_file_core import (SSHSession, BastionPool, ConnectionMonitor, ConnectionPrewarmer, DirectoryWatcher,
+                           DirectoryPrefetcher, FileSink, ListingCache, ListingView, PerfRecorder, PortForwarder,
+                           ProfileStore, RemoteArchive, TerminalHistory, compare_listings, format_size, list_local_dir,
+                           run_cli, parse_target, run_on_hosts, group_identical_results, paramiko, warm_imports)
+
+
+class MessageDispatcher:
+    """线程安全的UI消息分发器
+    
+    工作线程通过put()投递消息;只有在队列由空变为非空时才调用一次wakeup
+    (GUI中为event_generate),主线程被唤醒后通过drain()一次取出全部消息,
+    并合并冗余消息,避免轮询和重复处理.
+    """
+    
+    def __init__(self, wakeup=None):
+        self.wakeup = wakeup
+        self._lock = threading.Lock()
+        self._messages = []
+        self._wakeup_pending = False
+    
+    def put(self, message):
+        """投递消息(可在任意线程调用)"""
+        with self._lock:
+            self._messages.append(message)
+            if self._wakeup_pending or self.wakeup is None:
+                return
+            self._wakeup_pending = True
+        try:
+            self.wakeup()
+        except (RuntimeError, tk.TclError):
+            # 主循环尚未启动或窗口已销毁,下次投递时重试唤醒
+            with self._lock:
+                self._wakeup_pending = False
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._messages)
+    
+    def drain(self):
+        """取出全部待处理消息并合并(在主线程调用)"""
+        with self._lock:
+            messages = self._messages
+            self._messages = []
+            self._wakeup_pending = False
+        return self.coalesce(messages)
+    
+    @staticmethod
+    def coalesce(messages):
+        """合并冗余消息
+        
+        - 同一路径的refresh只保留最后一次
+        - status只保留最后一条(中间状态不可能被看到)
+        - 同一任务的transfer进度只保留最新一条
+        其余消息保持原有顺序.
+        """
+        seen = set()
+        kept = []
+        for message_type, data in reversed(messages):
+            if message_type == "refresh":
+                key = ("refresh", data)
+            elif message_type == "status":
+                key = ("status",)
+            elif message_type == "transfer":
+                key = ("transfer", data['label'])
+            else:
+                kept.append((message_type, data))
+                continue
+            if key not in seen:
+                seen.add(key)
+                kept.append((message_type, data))
+        kept.reverse()
+        return kept
 
 
 class SSHFileManagerGUI:
     """SSH远程文件管理器GUI类"""
     
+    STATUS_INTERVAL = 0.1      # 状态栏最短刷新间隔(秒)
+    NOTIFICATION_LIMIT = 500   # 通知日志保留条数
+    WARM_IMPORT_DELAY = 500    # 窗口显示后多久开始在后台导入paramiko(毫秒)
+    DETAILS_CACHE_LIMIT = 50000  # 属主、目录大小等派生信息缓存的最大条目数
+    
+    PREFETCH_DIRS = 8          # 每轮最多预取的目录数
+    PREFETCH_SECONDS = 3.0     # 每轮预取的时间预算(秒)
+    
+    LINK_METER_INTERVAL = 1000   # 连接期间状态栏吞吐量的刷新间隔(毫秒)
+    RTT_PROBE_INTERVAL = 5       # keepalive探测(测量往返时间、发现死连接)的间隔(秒)
+    
+    TERMINAL_HISTORY_CHARS = 4 * 1024 * 1024  # 终端历史(可搜索、可导出)保留的最大字符数
+    TERMINAL_RENDER_CHARS = 200000            # 终端文本框中只渲染末尾这么多字符
+    TERMINAL_SEARCH_CONTEXT = 20000           # 跳转到较早的匹配时,匹配前后各渲染的字符数
+    
+    # 列标题与对应的排序列
+    COLUMN_TITLES = {'#0': '文件名称', 'size': '大小', 'type': '类型',
+                     'permissions': '权限', 'modified': '修改时间'}
+    SORT_COLUMNS = {'#0': 'name', 'size': 'size', 'type': 'type',
+                    'permissions': 'permissions', 'modified': 'modified'}
+    
+    # 对比模式下各侧条目的标记: (哪一侧, 对比状态) -> 树视图标签
+    COMPARE_TAGS = {('local', 'newer_local'): 'cmp_newer', ('local', 'only_local'): 'cmp_missing',
+                    ('local', 'differs'): 'cmp_differs', ('remote', 'newer_remote'): 'cmp_newer',
+                    ('remote', 'only_remote'): 'cmp_missing', ('remote', 'differs'): 'cmp_differs'}
+    DRAG_THRESHOLD = 6         # 按下鼠标后移动多少像素才算开始拖动
+    
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("SSH远程资源管理器")
@@ -47,19 +135,70 @@ class SSHFileManagerGUI:
         self.root.option_add('*TkDefaultFont', 'Arial 10')
         self.root.option_add('*Font', 'Arial 10')
         
-        # SSH连接相关
-        self.ssh_client = None
-        self.sftp_client = None
+        # SSH连接相关(会话逻辑见 ssh_file_core.SSHSession)
+        self.session = None
         self.current_path = "/"
         self.connected = False
         
+        # 保存的连接配置;收藏的主机在启动后、鼠标移到连接按钮上时预先完成握手
+        self.profiles = ProfileStore()
+        self.prewarmer = ConnectionPrewarmer()
+        
         # GUI组件
         self.setup_gui()
         self.setup_styles()
         
-        # 消息队列用于线程间通信
-        self.message_queue = queue.Queue()
-        self.root.after(100, self.process_queue)
+        # 性能采集
+        self.perf = PerfRecorder()
+        self.perf_window = None
+        
+        # 跳板机连接(断开连接时关闭)
+        self.bastions = BastionPool(perf=self.perf)
+        
+        # 端口转发(添加第一条转发时创建,断开连接时关闭)
+        self.forwarder = None
+        self.forward_window = None
+        
+        # 通知日志(取代操作结果弹窗)
+        self.notifications = collections.deque(maxlen=self.NOTIFICATION_LIMIT)
+        self.unread_errors = 0
+        self.notification_window = None
+        
+        # 状态栏限频与目录刷新合并
+        self._last_status_time = 0.0
+        self._pending_status = None
+        self._status_after_id = None
+        self._refresh_running = False
+        self._refresh_pending = False
+        
+        # 断线重连:监视线程与重连后要恢复的视图状态
+        self.monitor = None
+        self._saved_view = None
+        
+        # 当前列表(内存索引,排序和过滤不重新列目录)与属性缓存,可见区域的派生信息在后台预取
+        self.listing = ListingView([])
+        self.current_files = self.listing.files
+        self.sort_column = 'name'
+        self.sort_reverse = False
+        self._filter_after_id = None
+        self._visible_count = 0
+        self.tree_items = {}
+        self.details_cache = {}
+        self._details_pending = set()
+        self._properties_size = None   # (路径, 标签):属性对话框中等待填入的目录大小
+        self._prefetch_after_id = None
+        
+        # 当前目录的监视器(监视模式开启时)
+        self.watcher = None
+        
+        # 目录列表缓存与推测性预取(进入子目录、返回上级时直接使用缓存)
+        self.listing_cache = ListingCache()
+        self.prefetcher = None
+        self.visit_history = collections.deque(maxlen=20)
+        
+        # 消息队列用于线程间通信:工作线程投递后通过虚拟事件唤醒主线程,不再轮询
+        self.message_queue = MessageDispatcher(self._wakeup_ui)
+        self.root.bind('<<MessageQueued>>', self.process_queue)
     
     def setup_styles(self):
         """设置GUI样式"""
@@ -127,8 +266,27 @@ class SSHFileManagerGUI:
         # 状态栏
         self.setup_status_bar(main_frame)
         
-        # 终端区域
-        self.setup_terminal_frame(main_frame)
+        # 终端区域默认隐藏,第一次显示时才创建
+        self.terminal_frame = None
+        self.terminal_visible = False
+        self.terminal_history = TerminalHistory(self.TERMINAL_HISTORY_CHARS)
+        self._term_base = 0            # 文本框第一个字符在历史中的全局偏移
+        self._term_end = 0             # 文本框最后渲染到的全局偏移
+        self._term_following = True    # 文本框是否显示历史末尾(跳转到较早的匹配时为False)
+        self._term_hit = None
+        self._term_search_after_id = None
+        
+        # 本地文件面板(双栏视图)默认隐藏,第一次显示时才创建
+        self.local_frame = None
+        self.local_visible = False
+        self.local_path = os.path.expanduser("~")
+        self.local_listing = ListingView([])
+        self.local_items = {}
+        self._compare_marked = False
+        self._drag = None
+        
+        # 拖放产生的传输按顺序排队,由一个后台线程执行
+        self.transfer_jobs = None
     
     def setup_connection_frame(self, parent):
         """设置连接区域"""
@@ -196,6 +354,37 @@ class SSHFileManagerGUI:
         key_label = ttk.Label(key_frame, textvariable=self.key_file_var, foreground="#666666", 
                              font=('Arial', 9, 'italic'))
         key_label.pack(side=tk.LEFT)
+        
+        # 第三行:保存的连接配置
+        row = 2
+        ttk.Label(conn_frame, text="连接配置:", font=('Arial', 10, 'bold')).grid(row=row, column=0, padx=(0, 8), pady=5, sticky=tk.W)
+        self.profile_var = tk.StringVar()
+        self.profile_combo = ttk.Combobox(conn_frame, textvariable=self.profile_var, width=23, font=('Arial', 10))
+        self.profile_combo.grid(row=row, column=1, padx=(0, 15), pady=5, sticky=(tk.W, tk.E))
+        self.profile_combo.bind('<<ComboboxSelected>>', self.load_profile)
+        self._update_profile_list()
+        
+        ttk.Label(conn_frame, text="跳板机:", font=('Arial', 10, 'bold')).grid(row=row, column=2, padx=(0, 8), pady=5, sticky=tk.W)
+        self.jump_host_var = tk.StringVar()
+        ttk.Entry(conn_frame, textvariable=self.jump_host_var, width=20, font=('Arial', 10)).grid(
+            row=row, column=3, padx=(0, 15), pady=5, sticky=(tk.W, tk.E))
+        
+        ttk.Label(conn_frame, text="默认路径:", font=('Arial', 10, 'bold')).grid(row=row, column=4, padx=(0, 8), pady=5, sticky=tk.W)
+        self.default_path_var = tk.StringVar()
+        ttk.Entry(conn_frame, textvariable=self.default_path_var, width=10, font=('Arial', 10)).grid(
+            row=row, column=5, padx=(0, 15), pady=5, sticky=(tk.W, tk.E))
+        
+        profile_buttons = ttk.Frame(conn_frame)
+        profile_buttons.grid(row=row, column=6, padx=(10, 0), pady=5, sticky=tk.W)
+        self.favourite_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(profile_buttons, text="收藏", variable=self.favourite_var).pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Button(profile_buttons, text="保存配置", command=self.save_profile,
+                  style='Toolbutton.TButton').pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(profile_buttons, text="删除配置", command=self.delete_profile,
+                  style='Toolbutton.TButton').pack(side=tk.LEFT)
+        
+        # 鼠标移到连接按钮上时就开始握手,点击时多半已经完成
+        self.connect_btn.bind('<Enter>', lambda e: self.prewarm_current())
     
     def setup_toolbar(self, parent):
         """设置工具栏"""
@@ -233,10 +422,32 @@ class SSHFileManagerGUI:
                                    state="disabled", style='Toolbutton.TButton')
         self.upload_btn.pack(side=tk.LEFT, padx=(0, 10))
         
+        self.upload_dir_btn = ttk.Button(left_btn_frame, text="上传目录", command=self.upload_directory, 
+                                       state="disabled", style='Toolbutton.TButton')
+        self.upload_dir_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
         self.mkdir_btn = ttk.Button(left_btn_frame, text="新建目录", command=self.create_directory, 
                                   state="disabled", style='Toolbutton.TButton')
         self.mkdir_btn.pack(side=tk.LEFT, padx=(0, 10))
         
+        # 打包传输模式:目录通过tar流在一个通道内传输
+        self.bundle_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(left_btn_frame, text="打包传输", variable=self.bundle_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 传输校验:单个文件传输后比对分块哈希,不一致的块自动重传
+        self.verify_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(left_btn_frame, text="传输校验", variable=self.verify_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 远程辅助程序:上传一个python3小脚本,递归删除、校验和、目录大小等批量操作一次往返完成
+        self.agent_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(left_btn_frame, text="远程辅助程序", variable=self.agent_var,
+                        command=self.toggle_agent).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 监视模式:远程目录有变化时自动更新列表
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(left_btn_frame, text="监视目录", variable=self.watch_var,
+                        command=self.toggle_watch).pack(side=tk.LEFT, padx=(0, 10))
+        
         # 右侧按钮组
         right_btn_frame = ttk.Frame(btn_frame)
         right_btn_frame.pack(side=tk.RIGHT)
@@ -244,6 +455,18 @@ class SSHFileManagerGUI:
         self.terminal_btn = ttk.Button(right_btn_frame, text="终端", command=self.toggle_terminal,
                                      style='Toolbutton.TButton')
         self.terminal_btn.pack(side=tk.RIGHT)
+        
+        self.local_btn = ttk.Button(right_btn_frame, text="本地面板", command=self.toggle_local_pane,
+                                  style='Toolbutton.TButton')
+        self.local_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # 过滤框:输入即过滤当前列表,支持 * ? [] 通配符
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', lambda *args: self._schedule_filter())
+        filter_entry = ttk.Entry(right_btn_frame, textvariable=self.filter_var, width=20, font=('Consolas', 10))
+        filter_entry.pack(side=tk.RIGHT, padx=(0, 15))
+        filter_entry.bind('<Escape>', lambda e: self.filter_var.set(""))
+        ttk.Label(right_btn_frame, text="过滤:").pack(side=tk.RIGHT, padx=(0, 5))
     
     def setup_file_browser(self, parent):
         """设置文件浏览器"""
@@ -251,19 +474,20 @@ class SSHFileManagerGUI:
         self.paned_window = ttk.PanedWindow(parent, orient=tk.VERTICAL)
         self.paned_window.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
         
+        # 左右分栏:本地文件面板(显示时)在左,远程文件浏览器在右
+        self.commander_pane = ttk.PanedWindow(self.paned_window, orient=tk.HORIZONTAL)
+        
         # 文件浏览框架
-        browser_frame = ttk.LabelFrame(self.paned_window, text="远程文件浏览器", padding="10")
+        browser_frame = ttk.LabelFrame(self.commander_pane, text="远程文件浏览器", padding="10")
         
         # 创建高清Treeview
         self.tree = ttk.Treeview(browser_frame, columns=('size', 'type', 'permissions', 'modified'), 
                                show='tree headings', style='Treeview')
         
-        # 设置列标题
-        self.tree.heading('#0', text='文件名称')
-        self.tree.heading('size', text='大小')
-        self.tree.heading('type', text='类型')
-        self.tree.heading('permissions', text='权限')
-        self.tree.heading('modified', text='修改时间')
+        # 设置列标题,点击标题按该列排序
+        for column, title in self.COLUMN_TITLES.items():
+            self.tree.heading(column, text=title,
+                              command=lambda c=column: self.sort_by(self.SORT_COLUMNS[c]))
         
         # 优化列宽设置
         self.tree.column('#0', width=400, minwidth=250)
@@ -275,7 +499,8 @@ class SSHFileManagerGUI:
         # 高清滚动条
         tree_scrolly = ttk.Scrollbar(browser_frame, orient=tk.VERTICAL, command=self.tree.yview)
         tree_scrollx = ttk.Scrollbar(browser_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=tree_scrolly.set, xscrollcommand=tree_scrollx.set)
+        self.tree_scrolly = tree_scrolly
+        self.tree.configure(yscrollcommand=self._on_tree_scroll, xscrollcommand=tree_scrollx.set)
         
         # 网格布局
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(0, 2), pady=(0, 2))
@@ -288,24 +513,34 @@ class SSHFileManagerGUI:
         # 绑定事件
         self.tree.bind('<Double-1>', self.on_item_double_click)
         self.tree.bind('<Button-3>', self.show_context_menu)  # 右键菜单
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self._bind_drag(self.tree)
         
         # 添加到PanedWindow
-        self.paned_window.add(browser_frame, weight=3)
+        self.commander_pane.add(browser_frame, weight=1)
+        self.paned_window.add(self.commander_pane, weight=3)
         
-        # 上下文菜单
-        self.setup_context_menu()
+        # 上下文菜单在第一次右键时创建
+        self.context_menu = None
     
     def setup_context_menu(self):
         """设置右键上下文菜单"""
         self.context_menu = tk.Menu(self.root, tearoff=0, font=('Arial', 10))
         self.context_menu.add_command(label="下载", command=self.download_selected)
+        self.context_menu.add_command(label="下载到本地面板", command=self.download_to_local_pane)
+        self.context_menu.add_command(label="打包下载为归档...", command=self.archive_selected)
+        self.context_menu.add_command(label="浏览归档内容", command=self.browse_archive_selected)
+        self.context_menu.add_command(label="计算校验和", command=self.checksum_selected)
+        self.context_menu.add_command(label="计算目录大小", command=self.dir_sizes_selected)
         self.context_menu.add_command(label="删除", command=self.delete_selected)
         self.context_menu.add_command(label="重命名", command=self.rename_selected)
+        self.context_menu.add_command(label="移动到...", command=self.move_selected)
+        self.context_menu.add_command(label="修改权限...", command=self.chmod_selected)
         self.context_menu.add_separator()
         self.context_menu.add_command(label="属性", command=self.show_properties)
     
-    def setup_terminal_frame(self, parent):
-        """设置终端区域"""
+    def setup_terminal_frame(self):
+        """设置终端区域(第一次显示终端时调用)"""
         self.terminal_frame = ttk.LabelFrame(self.paned_window, text="远程终端", padding="10")
         
         # 终端输出区域
@@ -315,7 +550,21 @@ class SSHFileManagerGUI:
         # 高清终端文本框
         self.terminal_text = tk.Text(terminal_text_frame, height=12, font=('Consolas', 11), 
                                    bg='#1e1e1e', fg='#d4d4d4', insertbackground='#d4d4d4',
-                                   selectbackground='#264f78', relief='flat', borderwidth=0)
+                                   selectbackground='#264f78', relief='flat', borderwidth=0,
+                                   state=tk.DISABLED)
+        
+        # 终端文本标签样式(只配置一次)
+        self.terminal_text.tag_config("welcome", foreground="#81c784", font=('Consolas', 10))
+        self.terminal_text.tag_config("timestamp", foreground="#888888", font=('Consolas', 10))
+        self.terminal_text.tag_config("command", foreground="#ffeb3b", font=('Consolas', 11, 'bold'))
+        self.terminal_text.tag_config("output", foreground="#e8e8e8", font=('Consolas', 10))
+        self.terminal_text.tag_config("error_header", foreground="#f44336", font=('Consolas', 10, 'bold'))
+        self.terminal_text.tag_config("error", foreground="#ffcdd2", font=('Consolas', 10))
+        self.terminal_text.tag_config("success_info", foreground="#4caf50", font=('Consolas', 10, 'bold'))
+        self.terminal_text.tag_config("error_info", foreground="#f44336", font=('Consolas', 10, 'bold'))
+        self.terminal_text.tag_config("search_hit", background="#f9a825", foreground="#1e1e1e")
+        self.terminal_text.tag_raise("search_hit")
+        self.terminal_text.bind('<Control-f>', lambda e: self.term_search_entry.focus_set())
         
         # 高清滚动条
         terminal_scroll = ttk.Scrollbar(terminal_text_frame, orient=tk.VERTICAL, command=self.terminal_text.yview)
@@ -324,6 +573,29 @@ class SSHFileManagerGUI:
         self.terminal_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 2))
         terminal_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # 历史搜索与导出
+        search_frame = ttk.Frame(self.terminal_frame)
+        search_frame.pack(fill=tk.X, pady=(6, 0))
+        
+        ttk.Label(search_frame, text="搜索历史:").pack(side=tk.LEFT, padx=(0, 5))
+        self.term_search_var = tk.StringVar()
+        self.term_search_var.trace_add("write", lambda *args: self._schedule_terminal_search())
+        self.term_search_entry = ttk.Entry(search_frame, textvariable=self.term_search_var, width=30)
+        self.term_search_entry.pack(side=tk.LEFT, padx=(0, 5))
+        self.term_search_entry.bind('<Return>', lambda e: self.search_terminal(backwards=True))
+        self.term_search_entry.bind('<Shift-Return>', lambda e: self.search_terminal(backwards=False))
+        self.term_search_entry.bind('<Escape>', lambda e: self.term_search_var.set(""))
+        
+        ttk.Button(search_frame, text="上一个", style='Toolbutton.TButton',
+                   command=lambda: self.search_terminal(backwards=True)).pack(side=tk.LEFT, padx=(0, 2))
+        ttk.Button(search_frame, text="下一个", style='Toolbutton.TButton',
+                   command=lambda: self.search_terminal(backwards=False)).pack(side=tk.LEFT, padx=(0, 8))
+        self.term_search_info = tk.StringVar()
+        ttk.Label(search_frame, textvariable=self.term_search_info, foreground='#666666').pack(side=tk.LEFT)
+        
+        ttk.Button(search_frame, text="导出历史...", style='Toolbutton.TButton',
+                   command=self.export_terminal_history).pack(side=tk.RIGHT)
+        
         # 命令输入区域
         cmd_frame = ttk.Frame(self.terminal_frame)
         cmd_frame.pack(fill=tk.X, pady=(10, 0))
@@ -339,9 +611,6 @@ class SSHFileManagerGUI:
         exec_btn = ttk.Button(cmd_frame, text="执行", command=self.execute_command,
                             style='Toolbutton.TButton')
         exec_btn.pack(side=tk.RIGHT)
-        
-        # 默认隐藏终端
-        self.terminal_visible = False
     
     def setup_status_bar(self, parent):
         """设置状态栏"""
@@ -375,6 +644,23 @@ class SSHFileManagerGUI:
         self.progress_bar.pack(side=tk.LEFT, padx=(0, 10))
         self.progress_bar.pack_forget()  # 默认隐藏
         
+        # 传输面板:显示文件数和文件/秒
+        self.transfer_var = tk.StringVar()
+        transfer_label = ttk.Label(progress_frame, textvariable=self.transfer_var, 
+                                 font=('Consolas', 9), foreground='#0078d4')
+        transfer_label.pack(side=tk.LEFT, padx=(0, 15))
+        
+        # 连接吞吐量与往返时间(仅连接期间每秒刷新)
+        self.link_var = tk.StringVar()
+        ttk.Label(progress_frame, textvariable=self.link_var,
+                  font=('Consolas', 9), foreground='#666666').pack(side=tk.LEFT, padx=(0, 15))
+        self._link_after_id = None
+        
+        # 通知日志入口
+        self.notify_btn = ttk.Button(progress_frame, text="通知", command=self.show_notification_log,
+                                   style='Toolbutton.TButton')
+        self.notify_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
         # 时间显示
         self.time_var = tk.StringVar()
         time_label = ttk.Label(progress_frame, textvariable=self.time_var, 
@@ -384,14 +670,54 @@ class SSHFileManagerGUI:
         # 启动时间更新
         self.update_time()
     
+    def _update_link_meter(self):
+        """刷新状态栏的收发速率和往返时间;采样结果同时用于调整传输并发度"""
+        self._link_after_id = None
+        if not self.connected or self.session is None:
+            self.link_var.set("")
+            return
+        link = self.session.link
+        link.sample()
+        info = link.snapshot()
+        text = f"↑{format_size(int(info['rate_sent']))}/s ↓{format_size(int(info['rate_received']))}/s"
+        if info['rtt'] is not None:
+            text += f"  RTT {info['rtt'] * 1000:.0f} ms"
+            if info['congested']:
+                text += " (拥塞)"
+        self.link_var.set(text)
+        self._link_after_id = self.root.after(self.LINK_METER_INTERVAL, self._update_link_meter)
+    
     def update_time(self):
-        """更新时间显示"""
-        current_time = datetime.datetime.now().strftime("%H:%M:%S")
-        self.time_var.set(current_time)
-        self.root.after(1000, self.update_time)
+        """更新时间显示:只显示到分钟,在下一分钟开始时再唤醒,空闲时不再每秒唤醒进程"""
+        now = datetime.datetime.now()
+        self.time_var.set(now.strftime("%H:%M"))
+        delay = 60 - now.second - now.microsecond / 1e6
+        self.root.after(max(int(delay * 1000), 1), self.update_time)
+    
+    def post_status(self, message, status_type="info"):
+        """限频设置状态栏:间隔内的更新只保留最后一条,延迟到间隔结束时显示"""
+        now = time.monotonic()
+        wait = self.STATUS_INTERVAL - (now - self._last_status_time)
+        if wait <= 0 and self._status_after_id is None:
+            self.set_status(message, status_type)
+            return
+        self._pending_status = (message, status_type)
+        if self._status_after_id is None:
+            self._status_after_id = self.root.after(max(int(wait * 1000), 1), self._flush_status)
+    
+    def _flush_status(self):
+        """显示被限频推迟的状态"""
+        self._status_after_id = None
+        if self._pending_status is not None:
+            message, status_type = self._pending_status
+            self.set_status(message, status_type)
     
     def set_status(self, message, status_type="info"):
         """设置状态栏信息"""
+        # 直接设置的状态优先于尚未显示的限频状态
+        self._pending_status = None
+        self._last_status_time = time.monotonic()
+        
         # 设置状态图标
         icons = {
             "info": "i",
@@ -428,6 +754,87 @@ class SSHFileManagerGUI:
         else:
             self.selected_key_file = None
     
+    # ---- 连接配置 ----
+    
+    def _update_profile_list(self):
+        """刷新配置下拉列表(收藏的配置排在前面)"""
+        self.profile_combo['values'] = [p['name'] for p in self.profiles.list()]
+    
+    def load_profile(self, event=None):
+        """把选中的配置填入连接表单,并在后台预热该主机"""
+        profile = self.profiles.get(self.profile_var.get())
+        if profile is None:
+            return
+        self.hostname_var.set(profile['hostname'] or "")
+        self.username_var.set(profile['username'] or "")
+        self.port_var.set(str(profile['port']))
+        self.jump_host_var.set(profile['jump_host'] or "")
+        self.default_path_var.set(profile['default_path'] or "")
+        self.favourite_var.set(profile['favourite'])
+        self.selected_key_file = profile['key_file']
+        self.auth_var.set("key" if profile['key_file'] else "password")
+        self.key_file_var.set(os.path.basename(profile['key_file']) if profile['key_file'] else "")
+        self.prewarm_current()
+    
+    def save_profile(self):
+        """把当前连接表单保存为配置(同名覆盖)"""
+        hostname = self.hostname_var.get().strip()
+        username = self.username_var.get().strip()
+        if not hostname or not username:
+            messagebox.showerror("输入错误", "请填写完整的服务器地址和用户名!")
+            return
+        name = self.profile_var.get().strip() or f"{username}@{hostname}"
+        key_file = getattr(self, 'selected_key_file', None) if self.auth_var.get() == "key" else None
+        try:
+            self.profiles.put({
+                'name': name, 'hostname': hostname, 'username': username,
+                'port': int(self.port_var.get().strip() or 22), 'key_file': key_file,
+                'jump_host': self.jump_host_var.get().strip() or None,
+                'default_path': self.default_path_var.get().strip() or None,
+                'favourite': self.favourite_var.get()})
+        except ValueError:
+            messagebox.showerror("端口错误", "端口号必须是1-65535之间的整数!")
+            return
+        except OSError as e:
+            self.set_status(f"保存配置失败: {e}", "error")
+            return
+        self.profile_var.set(name)
+        self._update_profile_list()
+        self.set_status(f"已保存连接配置: {name}", "success")
+    
+    def delete_profile(self):
+        """删除选中的配置"""
+        name = self.profile_var.get().strip()
+        if not self.profiles.get(name):
+            return
+        if not messagebox.askyesno("确认删除", f"确定要删除连接配置 '{name}' 吗?"):
+            return
+        try:
+            self.profiles.delete(name)
+        except OSError as e:
+            self.set_status(f"删除配置失败: {e}", "error")
+            return
+        self.profile_var.set("")
+        self._update_profile_list()
+        self.set_status(f"已删除连接配置: {name}", "success")
+    
+    def prewarm_current(self):
+        """在后台为表单中的主机完成TCP连接和SSH握手"""
+        hostname = self.hostname_var.get().strip()
+        if self.connected or not hostname or self.jump_host_var.get().strip():
+            return
+        try:
+            self.prewarmer.warm(hostname, int(self.port_var.get().strip()))
+        except ValueError:
+            pass
+    
+    def _warm_up(self):
+        """窗口显示后:预先导入paramiko,并预热收藏的主机"""
+        warm_imports()
+        for profile in self.profiles.favourites():
+            if not profile['jump_host']:
+                self.prewarmer.warm(profile['hostname'], profile['port'])
+    
     def connect_ssh(self):
         """连接SSH服务器"""
         if self.connected:
@@ -459,48 +866,77 @@ class SSHFileManagerGUI:
                 messagebox.showerror("文件不存在", f"密钥文件不存在:\n{self.selected_key_file}")
                 return
         
-        # 在单独线程中连接
+        # 在单独线程中连接;输入密码期间握手在后台进行
         self.set_status("正在连接服务器...", "connecting")
         self.connect_btn.config(state="disabled")
+        if self.auth_var.get() == "password":
+            self.prewarm_current()
         
-        thread = threading.Thread(target=self._connect_thread, args=(hostname, username, port))
+        default_path = self.default_path_var.get().strip() or None
+        jump_host = self.jump_host_var.get().strip() or None
+        thread = threading.Thread(target=self._connect_thread,
+                                  args=(hostname, username, port, default_path, jump_host))
         thread.daemon = True
         thread.start()
     
-    def _connect_thread(self, hostname, username, port):
+    def _connect_bastion(self, bastion):
+        """跳板机认证:先用密钥/agent,失败后询问密码"""
+        try:
+            bastion.connect(on_status=self._post_status_message)
+        except paramiko.SSHException:
+            password = simpledialog.askstring("跳板机认证", f"请输入跳板机 {bastion.label} 的密码:", show='*')
+            if not password:
+                raise
+            bastion.connect(password=password, on_status=self._post_status_message)
+    
+    def _connect_thread(self, hostname, username, port, default_path=None, jump_host=None):
         """连接线程"""
         try:
-            self.message_queue.put(("status", "正在建立SSH连接..."))
-            
-            self.ssh_client = paramiko.SSHClient()
-            self.ssh_client.set_missing_host_key_policy(AutoAddHostKeyPolicy())
+            key_file = None
+            password = None
             
             # 获取认证信息
             if self.auth_var.get() == "key" and hasattr(self, 'selected_key_file'):
-                # 密钥认证
-                self.message_queue.put(("status", "使用密钥文件认证..."))
-                private_key = paramiko.RSAKey.from_private_key_file(self.selected_key_file)
-                self.ssh_client.connect(hostname, port=port, username=username, pkey=private_key, timeout=10)
+                key_file = self.selected_key_file
             else:
-                # 密码认证
                 password = simpledialog.askstring("密码认证", 
                                                 f"请输入 {username}@{hostname} 的密码:", 
                                                 show='*')
                 if not password:
                     self.message_queue.put(("error", "连接已取消"))
                     return
-                
-                self.message_queue.put(("status", "使用密码认证..."))
-                self.ssh_client.connect(hostname, port=port, username=username, password=password, timeout=10)
             
-            # 创建SFTP客户端
-            self.message_queue.put(("status", "正在建立SFTP连接..."))
-            self.sftp_client = self.ssh_client.open_sftp()
-            self.current_path = self.sftp_client.getcwd() or "/"
+            jump = None
+            if jump_host:
+                self._post_status_message(f"正在连接跳板机 {jump_host}...")
+                jump = self.bastions.get(jump_host, key_file=key_file, connect=self._connect_bastion)
+            session = SSHSession(hostname, username, port, key_file=key_file, perf=self.perf,
+                                 prewarmer=self.prewarmer, jump=jump, use_agent=self.agent_var.get())
+            session.connect(password=password, on_status=self._post_status_message)
+            session.on_status = self._post_status_message
+            session.on_connection_lost = lambda: self.message_queue.put(("connection_lost", None))
+            session.on_reconnected = lambda: self.message_queue.put(("connection_restored", None))
+            
+            self.session = session
+            self.current_path = session.getcwd()
+            if default_path:
+                # 配置中的默认路径不可用时停留在初始目录
+                try:
+                    default_path = SSHSession.resolve_path(self.current_path, default_path)
+                    session.check_dir(default_path)
+                    self.current_path = default_path
+                except Exception as e:
+                    self.message_queue.put(("status", f"默认路径不可用: {e}"))
             self.connected = True
+            self.monitor = ConnectionMonitor(
+                session, interval=self.RTT_PROBE_INTERVAL,
+                on_failed=lambda e: self.message_queue.put(("connection_failed", str(e)))).start()
+            self.prefetcher = DirectoryPrefetcher(session, self.listing_cache, max_dirs=self.PREFETCH_DIRS,
+                                                  max_seconds=self.PREFETCH_SECONDS)
             
-            self.message_queue.put(("success", f"成功连接到 {username}@{hostname}:{port}"))
+            self.message_queue.put(("success", f"成功连接到 {session.route}"))
             self.message_queue.put(("refresh", None))
+            self.message_queue.put(("link_meter", None))
             
         except paramiko.AuthenticationException:
             self.message_queue.put(("error", "认证失败:用户名、密码或密钥错误"))
@@ -509,27 +945,50 @@ class SSHFileManagerGUI:
         except Exception as e:
             self.message_queue.put(("error", f"连接失败:{str(e)}"))
     
+    def _post_status_message(self, message):
+        """供核心引擎回调:把状态信息投递到消息队列"""
+        self.message_queue.put(("status", message))
+    
+    def _post_transfer_progress(self, info):
+        """供核心引擎回调:把传输进度投递到消息队列"""
+        self.message_queue.put(("transfer", info))
+    
     def disconnect_ssh(self):
         """断开SSH连接"""
-        if self.sftp_client:
-            self.sftp_client.close()
-        if self.ssh_client:
-            self.ssh_client.close()
+        self._stop_watch()
+        if self.prefetcher:
+            self.prefetcher.close()
+            self.prefetcher = None
+        self.listing_cache.invalidate()
+        self.visit_history.clear()
+        if self.forwarder:
+            self.forwarder.close()
+            self.forwarder = None
+        if self.monitor:
+            self.monitor.stop()
+            self.monitor = None
+        if self.session:
+            self.session.close()
+        self.bastions.close()
         
         self.connected = False
-        self.ssh_client = None
-        self.sftp_client = None
+        self.session = None
         
         # 更新GUI状态
         self.connect_btn.config(state="normal")
         self.disconnect_btn.config(state="disabled")
         self.refresh_btn.config(state="disabled")
         self.upload_btn.config(state="disabled")
+        self.upload_dir_btn.config(state="disabled")
         self.mkdir_btn.config(state="disabled")
         
         # 清空文件列表
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        items = set(self.tree.get_children()) | set(self.tree_items.values())
+        if items:
+            self.tree.delete(*items)
+        self.tree_items = {}
+        self.listing = ListingView([])
+        self.current_files = self.listing.files
         
         # 重置路径
         self.path_var.set("/")
@@ -541,6 +1000,16 @@ class SSHFileManagerGUI:
         if not self.connected:
             return
         
+        # 已有刷新在进行时只做标记,完成后再补刷一次,避免并发多个刷新线程
+        if self._refresh_running:
+            self._refresh_pending = True
+            return
+        self._refresh_running = True
+        self._refresh_pending = False
+        self._cancel_prefetch()
+        # 刷新多由增删改触发,子目录的缓存可能已过时
+        self.listing_cache.invalidate()
+        
         thread = threading.Thread(target=self._refresh_thread)
         thread.daemon = True
         thread.start()
@@ -548,30 +1017,41 @@ class SSHFileManagerGUI:
     def _refresh_thread(self):
         """刷新目录线程"""
         try:
-            files = []
-            for item in self.sftp_client.listdir_attr(self.current_path):
-                file_info = {
-                    'name': item.filename,
-                    'size': item.st_size if item.st_size else 0,
-                    'type': 'directory' if stat.S_ISDIR(item.st_mode) else 'file',
-                    'permissions': stat.filemode(item.st_mode),
-                    'modified': datetime.datetime.fromtimestamp(item.st_mtime).strftime('%Y-%m-%d %H:%M:%S') if item.st_mtime else 'Unknown'
-                }
-                files.append(file_info)
-            
-            # 排序:目录在前,然后按名称排序
-            files.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
-            
-            self.message_queue.put(("update_tree", files))
+            path = self.current_path
+            files = self.session.list_dir(path)
+            self.listing_cache.put(path, files)
+            self._post_listing(files)
             
         except Exception as e:
             self.message_queue.put(("error", f"刷新目录失败: {str(e)}"))
+        finally:
+            self.message_queue.put(("refresh_done", None))
+    
+    def _post_listing(self, files):
+        """在工作线程中建立排序索引后交给界面显示"""
+        listing = ListingView(files, self.sort_column, self.sort_reverse).prepare((self.sort_column,))
+        self.message_queue.put(("update_tree", listing))
+        # 列表显示后再预先计算其余各列的排序,之后点击列标题无需等待.
+        # 已交给界面的索引只在主线程中使用,这里另建一个,由主线程合并
+        indexed = ListingView(files).prepare(ListingView.COLUMNS)
+        self.message_queue.put(("listing_indexed", (listing, indexed)))
     
-    def update_file_tree(self, files):
-        """更新文件树"""
+    def update_file_tree(self, listing):
+        """更新文件树(接受文件信息列表或已建好索引的ListingView)"""
+        if not isinstance(listing, ListingView):
+            listing = ListingView(listing)
+        listing.sort(self.sort_column, self.sort_reverse)
+        listing.pattern = self.filter_var.get().strip()
+        self.listing = listing
+        self.current_files = listing.files
+        
         # 清空现有项目
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        with self.perf.span("ui.tree_clear"):
+            # 被过滤摘下的行不在get_children()中,需要一并删除
+            items = set(self.tree.get_children()) | set(self.tree_items.values())
+            if items:
+                self.tree.delete(*items)
+            self.tree_items = {}
         
         # 添加返回上级目录项
         if self.current_path != "/":
@@ -579,59 +1059,357 @@ class SSHFileManagerGUI:
                            values=("", "directory", "", ""), tags=("parent",))
         
         # 添加文件和目录
-        for file_info in files:
-            # 根据文件类型选择图标
-            if file_info['type'] == 'directory':
-                icon = "[DIR]"
-                size_text = "<目录>"
-                type_display = "目录"
-            else:
-                # 根据文件扩展名选择标识
-                name = file_info['name'].lower()
-                if name.endswith(('.txt', '.log', '.md', '.readme')):
-                    icon = "[TXT]"
-                elif name.endswith(('.py', '.js', '.html', '.css', '.java', '.cpp', '.c')):
-                    icon = "[CODE]"
-                elif name.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg')):
-                    icon = "[IMG]"
-                elif name.endswith(('.zip', '.tar', '.gz', '.rar', '.7z')):
-                    icon = "[ARC]"
-                elif name.endswith(('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx')):
-                    icon = "[DOC]"
-                elif name.endswith(('.mp3', '.wav', '.flac', '.aac')):
-                    icon = "[AUD]"
-                elif name.endswith(('.mp4', '.avi', '.mkv', '.mov', '.wmv')):
-                    icon = "[VID]"
-                else:
-                    icon = "[FILE]"
-                
-                size_text = self._format_size(file_info['size'])
-                type_display = "文件"
-            
-            # 插入到树视图
-            item_id = self.tree.insert("", tk.END, 
-                           text=f"{icon} {file_info['name']}", 
-                           values=(size_text, type_display, 
-                                 file_info['permissions'], file_info['modified']),
-                           tags=(file_info['type'],))
+        self._render_listing()
         
         # 配置标签样式
         self.tree.tag_configure('directory', foreground='#0078d4', font=('Arial', 10, 'bold'))
         self.tree.tag_configure('file', foreground='#333333')
         self.tree.tag_configure('parent', foreground='#666666', font=('Arial', 10, 'italic'))
+        self.tree.tag_configure('symlink', font=('Arial', 10, 'italic'))
         
         # 更新路径显示
         self.path_var.set(self.current_path)
         
+        # 重连后恢复断线前的选中项和滚动位置
+        if self._saved_view and self._saved_view['path'] == self.current_path:
+            self._restore_view(self._saved_view)
+        self._saved_view = None
+        
+        # 监视模式下跟随当前目录
+        if self.watch_var.get() and (self.watcher is None or self.watcher.stopped
+                                     or self.watcher.path != self.current_path):
+            self._start_watch()
+        
+        # 记录访问历史并推测性预取可能进入的目录
+        if not self.visit_history or self.visit_history[-1] != self.current_path:
+            self.visit_history.append(self.current_path)
+        self._prefetch_neighbours()
+        
+        # 已缓存的目录大小直接显示,其余可见条目在后台预取
+        for name, file_info in self.current_files.items():
+            details = self._cached_details(name)
+            if details and details['dir_size'] is not None and name in self.tree_items:
+                self.tree.set(self.tree_items[name], 'size', self._format_size(details['dir_size']))
+        self._schedule_prefetch()
+        
         # 更新状态
-        if files:
-            dir_count = len([f for f in files if f['type'] == 'directory'])
-            file_count = len([f for f in files if f['type'] == 'file'])
-            status_msg = f"已连接 - {dir_count} 个目录, {file_count} 个文件"
+        self.set_status(self._listing_status(), "success")
+        self._apply_compare()
+    
+    def _listing_status(self):
+        """状态栏显示的目录统计"""
+        files = self.current_files.values()
+        if not files:
+            return "已连接 - 目录为空"
+        dir_count = sum(1 for f in files if f['type'] == 'directory')
+        status_msg = f"已连接 - {dir_count} 个目录, {len(files) - dir_count} 个文件"
+        if self.listing.pattern:
+            status_msg += f" (过滤后显示 {self._visible_count} 项)"
+        return status_msg
+    
+    def _render_listing(self):
+        """按当前排序和过滤条件排列树中的条目
+        
+        已有的行只移动位置,被过滤掉的行暂时摘下(detach),不重新格式化也不重新列目录.
+        """
+        rows = self.listing.rows()
+        offset = 1 if self.current_path != "/" else 0  # [..] 返回上级目录
+        
+        with self.perf.span("ui.tree_render", detail=f"{len(rows)} 项"):
+            self._render_rows(self.tree, self.tree_items, rows, offset)
+            self._visible_count = len(rows)
+    
+    def _render_rows(self, tree, tree_items, rows, offset):
+        """按顺序排列树中的行:新行才格式化插入,已有的行只移动,不在rows中的行摘下"""
+        visible = set()
+        for index, file_info in enumerate(rows, offset):
+            name = file_info['name']
+            visible.add(name)
+            item = tree_items.get(name)
+            if item is None:
+                text, values, tags = self._format_row(file_info)
+                tree_items[name] = tree.insert("", index, text=text, values=values, tags=tags)
+            else:
+                tree.move(item, "", index)
+        
+        hidden = [item for name, item in tree_items.items() if name not in visible]
+        if hidden:
+            tree.detach(*hidden)
+    
+    def sort_by(self, column):
+        """点击列标题:按该列排序,再次点击切换升降序"""
+        self.listing.sort(column)
+        self.sort_column = self.listing.column
+        self.sort_reverse = self.listing.reverse
+        
+        arrow = " ▼" if self.sort_reverse else " ▲"
+        for heading, title in self.COLUMN_TITLES.items():
+            self.tree.heading(heading, text=title + (arrow if self.SORT_COLUMNS[heading] == column else ""))
+        
+        self._render_listing()
+        selection = self.tree.selection()
+        if selection:
+            self.tree.see(selection[0])
+    
+    def _schedule_filter(self):
+        """输入过滤条件时稍作等待,连续输入只过滤一次"""
+        if self._filter_after_id is not None:
+            self.root.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.root.after(80, self._apply_filter)
+    
+    def _apply_filter(self):
+        self._filter_after_id = None
+        pattern = self.filter_var.get().strip()
+        if pattern == self.listing.pattern:
+            return
+        self.listing.pattern = pattern
+        self._render_listing()
+        self.tree.yview_moveto(0)
+        if self.connected:
+            self.set_status(self._listing_status(), "info")
+        self._schedule_prefetch()
+    
+    def _on_tree_scroll(self, first, last):
+        """文件列表滚动:更新滚动条并安排预取新露出的条目"""
+        self.tree_scrolly.set(first, last)
+        self._schedule_prefetch()
+    
+    def _schedule_prefetch(self):
+        """滚动停止片刻后再预取,避免拖动滚动条时反复发请求"""
+        if self._prefetch_after_id is not None:
+            self.root.after_cancel(self._prefetch_after_id)
+        self._prefetch_after_id = self.root.after(200, self._prefetch_visible)
+    
+    def _cached_details(self, name):
+        """返回条目的派生信息缓存;条目修改时间变化后缓存失效"""
+        file_info = self.current_files.get(name)
+        cached = self.details_cache.get(SSHSession.join(self.current_path, name))
+        if file_info is None or cached is None:
+            return None
+        mtime, details = cached
+        return details if mtime == file_info['attr'].st_mtime else None
+    
+    def _prefetch_visible(self):
+        """为可见区域内尚无缓存的条目批量预取属主和链接目标(目录大小只在需要时计算)"""
+        self._prefetch_after_id = None
+        if not self.connected or not self.session or not self.current_files:
+            return
+        
+        children = self.tree.get_children()
+        top, bottom = self.tree.yview()
+        first = int(top * len(children))
+        last = min(len(children), int(bottom * len(children)) + 1)
+        
+        batch = []
+        for item in children[first:last]:
+            name = self.tree.item(item, "text").split("] ", 1)[-1]
+            path = SSHSession.join(self.current_path, name)
+            if (name in self.current_files and path not in self._details_pending
+                    and self._cached_details(name) is None):
+                batch.append(self.current_files[name])
+                self._details_pending.add(path)
+        
+        if batch:
+            thread = threading.Thread(target=self._prefetch_details_thread,
+                                      args=(self.current_path, batch))
+            thread.daemon = True
+            thread.start()
+    
+    def _prefetch_details_thread(self, path, files, dir_sizes=False):
+        """获取派生信息线程(dir_sizes=True时同时计算目录大小)"""
+        mtimes = {file_info['name']: file_info['attr'].st_mtime for file_info in files}
+        try:
+            details = self.session.fetch_details(path, files, dir_sizes)
+        except Exception:
+            # 预取失败不影响浏览,下次滚动时重试
+            details = {}
+            traceback.print_exc()
+        self.message_queue.put(("details", (path, details, mtimes)))
+    
+    def _apply_details(self, path, details, mtimes):
+        """记录预取结果;仍停留在该目录时把目录大小写入列表"""
+        for name in mtimes:
+            self._details_pending.discard(SSHSession.join(path, name))
+        if len(self.details_cache) > self.DETAILS_CACHE_LIMIT:
+            self.details_cache.clear()
+        
+        for name, info in details.items():
+            key = SSHSession.join(path, name)
+            self.details_cache[key] = (mtimes[name], info)
+            if path == self.current_path and info['dir_size'] is not None and name in self.tree_items:
+                self.tree.set(self.tree_items[name], 'size', self._format_size(info['dir_size']))
+            # 属性对话框仍在等待这个目录的大小
+            if self._properties_size is not None and self._properties_size[0] == key:
+                label = self._properties_size[1]
+                if label.winfo_exists():
+                    size = info['dir_size']
+                    label.config(text=f"{self._format_size(size)} (含子目录)" if size is not None else '-')
+                self._properties_size = None
+    
+    def dir_sizes_selected(self):
+        """在后台计算选中目录的递归大小,完成后写入列表"""
+        files = [self.current_files[name] for name in self._selected_names()
+                 if self.current_files.get(name, {}).get('type') == 'directory'
+                 and 'link_target' not in self.current_files[name]]
+        if not files:
+            return
+        self.set_status(f"正在计算 {len(files)} 个目录的大小...", "info")
+        thread = threading.Thread(target=self._prefetch_details_thread, args=(self.current_path, files, True))
+        thread.daemon = True
+        thread.start()
+    
+    def _prefetch_neighbours(self, first=None):
+        """预取候选:选中的子目录、上级目录、最近访问过的同级目录,以及前几个子目录"""
+        if self.prefetcher is None:
+            return
+        current = self.current_path
+        parent = SSHSession.resolve_path(current, "..")
+        candidates = [first] if first else []
+        if current != "/":
+            candidates.append(parent)
+        candidates += [path for path in reversed(self.visit_history)
+                       if path != current and SSHSession.resolve_path(path, "..") == parent]
+        candidates += [SSHSession.join(current, file_info['name']) for file_info in self.listing.rows()[:self.PREFETCH_DIRS]
+                       if file_info['type'] == 'directory']
+        self.prefetcher.request(candidates)
+    
+    def _on_tree_select(self, event=None):
+        """选中目录时优先预取它"""
+        selection = self.tree.selection()
+        if not selection or self.prefetcher is None:
+            return
+        name = self.tree.item(selection[0], "text").split("] ", 1)[-1]
+        file_info = self.current_files.get(name)
+        if file_info is not None and file_info['type'] == 'directory':
+            self._prefetch_neighbours(SSHSession.join(self.current_path, name))
+    
+    def _cancel_prefetch(self):
+        """用户发起真实请求时放弃尚未开始的预取"""
+        if self.prefetcher is not None:
+            self.prefetcher.cancel()
+    
+    def toggle_agent(self):
+        """启用或停用远程辅助程序(下一个批量操作时按需启动)"""
+        if self.session is not None:
+            self.session.use_agent = self.agent_var.get()
+    
+    def toggle_watch(self):
+        """开启或关闭当前目录的监视"""
+        if self.watch_var.get() and self.connected:
+            self._start_watch()
         else:
-            status_msg = "已连接 - 目录为空"
+            self._stop_watch()
+            if self.connected:
+                self.set_status("已停止监视目录", "info")
+    
+    def _start_watch(self):
+        """为当前目录启动监视器(替换之前的监视器)"""
+        self._stop_watch()
+        path = self.current_path
+        self.watcher = DirectoryWatcher(
+            self.session, path,
+            on_update=lambda upserts, deletes: self.message_queue.put(("watch_update", (path, upserts, deletes))),
+            on_listing=lambda files: self.message_queue.put(
+                ("watch_listing", (path, ListingView(files, self.sort_column, self.sort_reverse)
+                                   .prepare((self.sort_column,))))),
+            on_status=self._post_status_message).start()
+    
+    def _stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+    
+    def apply_watch_update(self, upserts, deletes):
+        """把监视到的变化增量应用到列表,不重新列目录"""
+        for name in deletes:
+            item = self.tree_items.pop(name, None)
+            if item is not None:
+                self.tree.delete(item)
+            self.listing.remove(name)
+        
+        for file_info in upserts:
+            self.listing.update(file_info)
+        
+        # 只插入或移动变化的行;按位置从前到后处理,保证插入下标有效
+        offset = 1 if self.current_path != "/" else 0  # [..] 返回上级目录
+        positions = {info['name']: index for index, info in enumerate(self.listing.rows(), offset)}
+        for file_info in sorted(upserts, key=lambda info: positions.get(info['name'], -1)):
+            name = file_info['name']
+            text, values, tags = self._format_row(file_info)
+            item = self.tree_items.get(name)
+            if name not in positions:
+                # 不符合当前过滤条件
+                if item is None:
+                    item = self.tree_items[name] = self.tree.insert("", tk.END, text=text,
+                                                                   values=values, tags=tags)
+                else:
+                    self.tree.item(item, text=text, values=values, tags=tags)
+                self.tree.detach(item)
+            elif item is None:
+                self.tree_items[name] = self.tree.insert("", positions[name], text=text,
+                                                         values=values, tags=tags)
+            else:
+                self.tree.item(item, text=text, values=values, tags=tags)
+                self.tree.move(item, "", positions[name])
+        self._visible_count = len(positions)
+        
+        self._schedule_prefetch()
+        self._apply_compare()
+    
+    def _save_view(self):
+        """记录当前目录的选中项和滚动位置"""
+        selected = {self.tree.item(item, "text") for item in self.tree.selection()}
+        return {'path': self.current_path, 'selected': selected,
+                'yview': self.tree.yview()[0]}
+    
+    def _restore_view(self, view):
+        """按名称重新选中条目并滚动回原位置"""
+        if view['selected']:
+            items = [item for item in self.tree.get_children()
+                     if self.tree.item(item, "text") in view['selected']]
+            if items:
+                self.tree.selection_set(items)
+        self.tree.yview_moveto(view['yview'])
+    
+    @staticmethod
+    def _format_row(file_info):
+        """把文件信息格式化为树视图的一行: (文本, 列值, 标签)"""
+        # 根据文件类型选择图标
+        if file_info.get('broken'):
+            icon = "[LINK]"
+            size_text = "-"
+            type_display = "失效链接"
+        elif file_info['type'] == 'directory':
+            icon = "[DIR]"
+            size_text = "<目录>"
+            type_display = "目录链接" if 'link_target' in file_info else "目录"
+        else:
+            # 根据文件扩展名选择标识
+            name = file_info['name'].lower()
+            if name.endswith(('.txt', '.log', '.md', '.readme')):
+                icon = "[TXT]"
+            elif name.endswith(('.py', '.js', '.html', '.css', '.java', '.cpp', '.c')):
+                icon = "[CODE]"
+            elif name.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg')):
+                icon = "[IMG]"
+            elif name.endswith(('.zip', '.tar', '.gz', '.tgz', '.bz2', '.xz', '.jar', '.rar', '.7z')):
+                icon = "[ARC]"
+            elif name.endswith(('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx')):
+                icon = "[DOC]"
+            elif name.endswith(('.mp3', '.wav', '.flac', '.aac')):
+                icon = "[AUD]"
+            elif name.endswith(('.mp4', '.avi', '.mkv', '.mov', '.wmv')):
+                icon = "[VID]"
+            else:
+                icon = "[FILE]"
+            
+            size_text = format_size(file_info['size'])
+            type_display = "文件链接" if 'link_target' in file_info else "文件"
         
-        self.set_status(status_msg, "success")
+        tags = (file_info['type'], 'symlink') if 'link_target' in file_info else (file_info['type'],)
+        return (f"{icon} {file_info['name']}",
+                (size_text, type_display, file_info['permissions'], file_info['modified']),
+                tags)
     
     def on_item_double_click(self, event):
         """双击项目事件"""
@@ -653,8 +1431,11 @@ class SSHFileManagerGUI:
             folder_name = item_text[6:].strip()  # 去掉[DIR] 前缀
             self.change_directory(folder_name)
         elif any(prefix in item_text for prefix in ["[FILE]", "[TXT]", "[CODE]", "[IMG]", "[ARC]", "[DOC]", "[AUD]", "[VID]"]):
-            # 是文件,询问是否下载
+            # 是文件,询问是否下载;可浏览的归档直接打开浏览窗口
             file_name = item_text.split("] ", 1)[1] if "] " in item_text else item_text[7:].strip()
+            if RemoteArchive.kind_of(file_name)[0] is not None:
+                self.browse_archive(file_name)
+                return
             result = messagebox.askyesno("下载文件", 
                                        f"是否下载文件 '{file_name}' 到本地?\n\n"
                                        f"提示:您也可以右键点击文件选择下载位置")
@@ -669,6 +1450,7 @@ class SSHFileManagerGUI:
     
     def change_directory(self, path):
         """切换目录"""
+        self._cancel_prefetch()
         thread = threading.Thread(target=self._change_directory_thread, args=(path,))
         thread.daemon = True
         thread.start()
@@ -676,20 +1458,16 @@ class SSHFileManagerGUI:
     def _change_directory_thread(self, path):
         """切换目录线程"""
         try:
-            if path == "..":
-                new_path = os.path.dirname(self.current_path.rstrip('/'))
-                if not new_path:
-                    new_path = "/"
-            elif path.startswith('/'):
-                new_path = path
-            else:
-                new_path = os.path.join(self.current_path, path).replace('\\', '/')
+            new_path = SSHSession.resolve_path(self.current_path, path)
             
-            # 测试目录是否存在
-            self.sftp_client.listdir(new_path)
+            # 优先使用缓存(预取过的目录无需任何往返);否则只列一次目录,
+            # 列目录本身即可确认目录存在
+            files = self.listing_cache.get(new_path)
+            if files is None:
+                files = self.session.list_dir(new_path)
+                self.listing_cache.put(new_path, files)
             self.current_path = new_path
-            
-            self.message_queue.put(("refresh", None))
+            self._post_listing(files)
             
         except Exception as e:
             self.message_queue.put(("error", f"切换目录失败: {str(e)}"))
@@ -701,46 +1479,131 @@ class SSHFileManagerGUI:
             self.change_directory(path)
     
     def upload_file(self):
-        """上传文件"""
+        """上传文件(可多选;多个文件并行上传、全部完成后统一发布)"""
         if not self.connected:
             return
+        self._cancel_prefetch()
         
-        local_path = filedialog.askopenfilename(title="选择要上传的文件")
-        if local_path:
-            remote_name = os.path.basename(local_path)
-            remote_path = os.path.join(self.current_path, remote_name).replace('\\', '/')
+        local_paths = filedialog.askopenfilenames(title="选择要上传的文件")
+        if len(local_paths) == 1:
+            remote_name = os.path.basename(local_paths[0])
+            remote_path = SSHSession.join(self.current_path, remote_name)
             
-            thread = threading.Thread(target=self._upload_thread, args=(local_path, remote_path))
+            thread = threading.Thread(target=self._upload_thread,
+                                      args=(local_paths[0], remote_path, self.verify_var.get()))
+            thread.daemon = True
+            thread.start()
+        elif local_paths:
+            pairs = [(path, SSHSession.join(self.current_path, os.path.basename(path))) for path in local_paths]
+            thread = threading.Thread(target=self._upload_many_thread, args=(pairs,))
             thread.daemon = True
             thread.start()
     
-    def _upload_thread(self, local_path, remote_path):
+    def _upload_thread(self, local_path, remote_path, verify=False):
         """上传文件线程"""
         try:
             self.message_queue.put(("status", f"正在上传: {os.path.basename(local_path)}"))
-            self.sftp_client.put(local_path, remote_path)
-            self.message_queue.put(("success", f"上传完成: {os.path.basename(local_path)}"))
+            result = self.session.upload(local_path, remote_path, verify=verify)
+            self.message_queue.put(("success", f"上传完成: {os.path.basename(local_path)}"
+                                               f"{self._verify_summary(result)}"))
+            self.message_queue.put(("refresh", None))
+        except Exception as e:
+            self.message_queue.put(("error", f"上传失败: {str(e)}"))
+    
+    def _upload_many_thread(self, pairs):
+        """批量上传文件线程"""
+        try:
+            self.message_queue.put(("status", f"正在上传: {len(pairs)} 个文件"))
+            files, total = self.session.upload_many(pairs, self._post_transfer_progress)
+            self.message_queue.put(("success", f"上传完成: {files} 个文件, {format_size(total)}"))
             self.message_queue.put(("refresh", None))
         except Exception as e:
             self.message_queue.put(("error", f"上传失败: {str(e)}"))
     
     def download_file(self, remote_name, local_path):
         """下载文件"""
-        remote_path = os.path.join(self.current_path, remote_name).replace('\\', '/')
+        self._cancel_prefetch()
+        remote_path = SSHSession.join(self.current_path, remote_name)
         
-        thread = threading.Thread(target=self._download_thread, args=(remote_path, local_path))
+        thread = threading.Thread(target=self._download_thread,
+                                  args=(remote_path, local_path, self.verify_var.get()))
         thread.daemon = True
         thread.start()
     
-    def _download_thread(self, remote_path, local_path):
+    def _download_thread(self, remote_path, local_path, verify=False):
         """下载文件线程"""
         try:
             self.message_queue.put(("status", f"正在下载: {os.path.basename(remote_path)}"))
-            self.sftp_client.get(remote_path, local_path)
-            self.message_queue.put(("success", f"下载完成: {os.path.basename(local_path)}"))
+            result = self.session.download(remote_path, local_path, verify=verify)
+            self.message_queue.put(("success", f"下载完成: {os.path.basename(local_path)}"
+                                               f"{self._verify_summary(result)}"))
         except Exception as e:
             self.message_queue.put(("error", f"下载失败: {str(e)}"))
     
+    @staticmethod
+    def _verify_summary(result):
+        """校验结果的简短说明,未校验时为空"""
+        if result is None:
+            return ""
+        if not result['verified']:
+            return " (远程无法计算哈希,未校验)"
+        repaired = f",重传 {result['repaired']} 块" if result['repaired'] else ""
+        return f" ({result['algorithm']} 校验通过{repaired})"
+    
+    def upload_directory(self):
+        """上传目录"""
+        if not self.connected:
+            return
+        self._cancel_prefetch()
+        
+        local_dir = filedialog.askdirectory(title="选择要上传的目录")
+        if local_dir:
+            thread = threading.Thread(target=self._upload_dir_thread, 
+                                      args=(local_dir, self.current_path, self.bundle_var.get()))
+            thread.daemon = True
+            thread.start()
+    
+    def download_directory(self, remote_name, local_dir):
+        """下载目录"""
+        self._cancel_prefetch()
+        remote_path = SSHSession.join(self.current_path, remote_name)
+        
+        thread = threading.Thread(target=self._download_dir_thread, 
+                                  args=(remote_path, local_dir, self.bundle_var.get()))
+        thread.daemon = True
+        thread.start()
+    
+    def _upload_dir_thread(self, local_dir, remote_parent, bundle):
+        """上传目录线程"""
+        name = os.path.basename(os.path.normpath(local_dir))
+        try:
+            self.message_queue.put(("status", f"正在上传目录: {name}"))
+            files, total = self.session.upload_dir(local_dir, remote_parent, bundle,
+                                                   self._post_transfer_progress, self._post_status_message)
+            self.message_queue.put(("success", f"上传目录完成: {name} ({files} 个文件, {format_size(total)})"))
+            self.message_queue.put(("refresh", None))
+        except Exception as e:
+            self.message_queue.put(("error", f"上传目录失败: {str(e)}"))
+    
+    def _download_dir_thread(self, remote_path, local_dir, bundle):
+        """下载目录线程"""
+        name = os.path.basename(remote_path.rstrip('/'))
+        try:
+            self.message_queue.put(("status", f"正在下载目录: {name}"))
+            files, total = self.session.download_dir(remote_path, local_dir, bundle,
+                                                     self._post_transfer_progress, self._post_status_message)
+            self.message_queue.put(("success", f"下载目录完成: {name} ({files} 个文件, {format_size(total)})"))
+        except Exception as e:
+            self.message_queue.put(("error", f"下载目录失败: {str(e)}"))
+    
+    def update_transfer_panel(self, info):
+        """更新传输面板"""
+        text = (f"{info['label']}: {info['files']} 个文件, "
+                f"{info['files_per_sec']:.0f} 文件/秒, {format_size(info['bytes'])}")
+        if info['done']:
+            text += " [完成]"
+        self.transfer_var.set(text)
+    
     def create_directory(self):
         """创建新目录"""
         if not self.connected:
@@ -755,8 +1618,8 @@ class SSHFileManagerGUI:
     def _mkdir_thread(self, dir_name):
         """创建目录线程"""
         try:
-            remote_path = os.path.join(self.current_path, dir_name).replace('\\', '/')
-            self.sftp_client.mkdir(remote_path)
+            remote_path = SSHSession.join(self.current_path, dir_name)
+            self.session.mkdir(remote_path)
             self.message_queue.put(("success", f"创建目录成功: {dir_name}"))
             self.message_queue.put(("refresh", None))
         except Exception as e:
@@ -767,10 +1630,13 @@ class SSHFileManagerGUI:
         if not self.connected:
             return
         
-        # 选择右键点击的项目
+        # 选择右键点击的项目(点在已选中的多项之一上时保留多选)
         item = self.tree.identify('item', event.x, event.y)
         if item:
-            self.tree.selection_set(item)
+            if item not in self.tree.selection():
+                self.tree.selection_set(item)
+            if self.context_menu is None:
+                self.setup_context_menu()
             self.context_menu.post(event.x_root, event.y_root)
     
     def download_selected(self):
@@ -782,7 +1648,12 @@ class SSHFileManagerGUI:
         item = self.tree.item(selection[0])
         item_text = item['text']
         
-        if not item_text.startswith("[DIR]") and "返回上级目录" not in item_text:
+        if item_text.startswith("[DIR]"):
+            dir_name = item_text[6:].strip()
+            local_dir = filedialog.askdirectory(title="选择保存目录")
+            if local_dir:
+                self.download_directory(dir_name, local_dir)
+        elif "返回上级目录" not in item_text:
             file_name = item_text.split("] ", 1)[1] if "] " in item_text else item_text.strip()
             local_path = filedialog.asksaveasfilename(
                 title="保存文件",
@@ -791,6 +1662,187 @@ class SSHFileManagerGUI:
             if local_path:
                 self.download_file(file_name, local_path)
     
+    def archive_selected(self):
+        """把选中的文件和目录流式打包下载为一个本地归档"""
+        names = self._selected_names()
+        if not names:
+            return
+        
+        default = names[0] if len(names) == 1 else posixpath.basename(self.current_path.rstrip('/')) or "archive"
+        archive_path = filedialog.asksaveasfilename(
+            title="保存归档",
+            initialfile=f"{default}.zip",
+            filetypes=[("ZIP归档", "*.zip"), ("tar.gz归档", "*.tar.gz *.tgz"), ("tar归档", "*.tar")]
+        )
+        if archive_path:
+            self._cancel_prefetch()
+            paths = [SSHSession.join(self.current_path, name) for name in names]
+            thread = threading.Thread(target=self._archive_thread, args=(paths, archive_path))
+            thread.daemon = True
+            thread.start()
+    
+    def _archive_thread(self, paths, archive_path):
+        """打包下载线程:远程文件依次流入归档,不落临时文件"""
+        name = os.path.basename(archive_path)
+        try:
+            self.message_queue.put(("status", f"正在打包下载: {name}"))
+            files, total = self.session.download_to_archive(paths, archive_path, self._post_transfer_progress)
+            self.message_queue.put(("success", f"打包下载完成: {name} ({files} 个文件, {format_size(total)})"))
+        except Exception as e:
+            self.message_queue.put(("error", f"打包下载失败: {str(e)}"))
+    
+    def checksum_selected(self):
+        """计算选中文件的SHA-256(只读取不保存)"""
+        names = [name for name in self._selected_names()
+                 if self.current_files.get(name, {}).get('type') == 'file']
+        if not names:
+            return
+        
+        self._cancel_prefetch()
+        paths = [SSHSession.join(self.current_path, name) for name in names]
+        thread = threading.Thread(target=self._checksum_thread, args=(paths,))
+        thread.daemon = True
+        thread.start()
+    
+    def _checksum_thread(self, paths):
+        """计算校验和线程"""
+        try:
+            self.message_queue.put(("status", f"正在计算校验和: {len(paths)} 个文件"))
+            digests = self.session.checksum(paths, 'sha256', self._post_transfer_progress)
+            lines = [f"{digest}  {posixpath.basename(path)}" for path, digest in digests.items()]
+            self.message_queue.put(("checksum", "\n".join(lines)))
+        except Exception as e:
+            self.message_queue.put(("error", f"计算校验和失败: {str(e)}"))
+    
+    def browse_archive_selected(self):
+        """浏览选中的归档"""
+        names = [name for name in self._selected_names()
+                 if self.current_files.get(name, {}).get('type') == 'file']
+        if not names:
+            return
+        if RemoteArchive.kind_of(names[0])[0] is None:
+            messagebox.showinfo("提示", "只支持浏览 .zip/.jar、.tar/.tar.gz/.tgz/.tar.bz2/.tar.xz 和 .gz 文件")
+            return
+        self.browse_archive(names[0])
+    
+    def browse_archive(self, remote_name):
+        """在后台读取归档的成员列表,完成后打开浏览窗口"""
+        self._cancel_prefetch()
+        remote_path = SSHSession.join(self.current_path, remote_name)
+        
+        def run():
+            try:
+                self.message_queue.put(("status", f"正在读取归档目录: {remote_name}"))
+                archive = self.session.open_archive(remote_path)
+                self.message_queue.put(("archive_opened", archive))
+            except Exception as e:
+                self.message_queue.put(("error", f"读取归档失败: {str(e)}"))
+        threading.Thread(target=run, daemon=True).start()
+    
+    def show_archive_browser(self, archive):
+        """归档浏览窗口:像远程目录一样浏览归档内容,提取单个成员时不下载整个归档"""
+        window = tk.Toplevel(self.root)
+        window.title(f"归档 - {posixpath.basename(archive.path)}")
+        window.geometry("820x480")
+        window.transient(self.root)
+        
+        main_frame = ttk.Frame(window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        location_var = tk.StringVar()
+        ttk.Label(main_frame, textvariable=location_var, font=('Arial', 10, 'bold')).pack(anchor=tk.W)
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True, pady=(8, 0))
+        tree = ttk.Treeview(tree_frame, columns=('size', 'type', 'permissions', 'modified'),
+                            show='tree headings', style='Treeview')
+        for column, title in self.COLUMN_TITLES.items():
+            tree.heading(column, text=title)
+        tree.column('#0', width=320, minwidth=200)
+        for column, width in (('size', 100), ('type', 80), ('permissions', 110), ('modified', 160)):
+            tree.column(column, width=width)
+        scroll = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.tag_configure('directory', foreground='#0078d4', font=('Arial', 10, 'bold'))
+        tree.tag_configure('symlink', font=('Arial', 10, 'italic'))
+        
+        state = {'dir': ""}
+        members = {}  # 树视图条目 -> 归档内路径
+        
+        def show(directory):
+            state['dir'] = directory
+            location_var.set(f"{archive.path} : /{directory}")
+            tree.delete(*tree.get_children())
+            members.clear()
+            if directory:
+                tree.insert("", tk.END, text="[UP] .. (返回上级目录)", values=("", "", "", ""))
+            for file_info in archive.list_dir(directory):
+                text, values, tags = self._format_row(file_info)
+                members[tree.insert("", tk.END, text=text, values=values, tags=tags)] = file_info['path']
+        
+        def open_item(event=None):
+            selection = tree.selection()
+            if not selection:
+                return
+            if selection[0] not in members:
+                show(posixpath.dirname(state['dir']))
+                return
+            name = members[selection[0]]
+            if archive.members[name]['type'] == 'directory':
+                show(name)
+            else:
+                extract()
+        
+        def extract():
+            names = [members[item] for item in tree.selection()
+                     if item in members and archive.members[members[item]]['type'] == 'file']
+            if not names:
+                return
+            if len(names) == 1:
+                local_path = filedialog.asksaveasfilename(title="提取文件到...", parent=window,
+                                                          initialfile=posixpath.basename(names[0]))
+                targets = [(names[0], local_path)] if local_path else []
+            else:
+                local_dir = filedialog.askdirectory(title="提取到目录", parent=window)
+                targets = [(name, os.path.join(local_dir, posixpath.basename(name)))
+                           for name in names] if local_dir else []
+            if targets:
+                threading.Thread(target=self._extract_archive_thread, args=(archive, targets),
+                                 daemon=True).start()
+        
+        def close():
+            window.destroy()
+            threading.Thread(target=archive.close, daemon=True).start()
+        
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(btn_frame, text="提取选中...", command=extract,
+                  style='Toolbutton.TButton').pack(side=tk.LEFT)
+        summary = f"{sum(1 for m in archive.members.values() if m['type'] == 'file')} 个文件"
+        if archive.bytes_read:
+            summary += f",读取目录只传输了 {format_size(archive.bytes_read)}"
+        ttk.Label(btn_frame, text=summary, foreground='#666666').pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="关闭", command=close,
+                  style='Toolbutton.TButton').pack(side=tk.RIGHT)
+        
+        tree.bind('<Double-1>', open_item)
+        tree.bind('<Return>', open_item)
+        window.protocol("WM_DELETE_WINDOW", close)
+        show("")
+    
+    def _extract_archive_thread(self, archive, targets):
+        """提取归档成员线程"""
+        try:
+            total = 0
+            for name, local_path in targets:
+                self.message_queue.put(("status", f"正在从归档提取: {posixpath.basename(name)}"))
+                total += archive.extract(name, FileSink(local_path), self._post_transfer_progress)
+            self.message_queue.put(("success", f"提取完成: {len(targets)} 个文件, {format_size(total)}"))
+        except Exception as e:
+            self.message_queue.put(("error", f"提取失败: {str(e)}"))
+    
     def delete_selected(self):
         """删除选中的项目"""
         selection = self.tree.selection()
@@ -805,21 +1857,46 @@ class SSHFileManagerGUI:
             
         item_name = item_text.split("] ", 1)[1] if "] " in item_text else item_text.strip()
         
+        # 指向目录的符号链接只删除链接本身
+        file_info = self.current_files.get(item_name, {})
+        is_directory = file_info.get('type') == 'directory' and 'link_target' not in file_info
+        
         result = messagebox.askyesno("确认删除", f"确定要删除 '{item_name}' 吗?")
         if result:
-            thread = threading.Thread(target=self._delete_thread, args=(item_name, item_text.startswith("[DIR]")))
+            thread = threading.Thread(target=self._delete_thread, args=(item_name, is_directory))
+            thread.daemon = True
+            thread.start()
+    
+    def confirm_recursive_delete(self, item_name):
+        """目录不为空时单独确认,是否连同其中的全部内容删除"""
+        if messagebox.askyesno("目录不为空",
+                               f"目录 '{item_name}' 不为空.\n\n要删除它及其中的全部内容吗?此操作无法撤销.",
+                               icon=messagebox.WARNING, default=messagebox.NO):
+            thread = threading.Thread(target=self._delete_thread, args=(item_name, True, True))
             thread.daemon = True
             thread.start()
     
-    def _delete_thread(self, item_name, is_directory):
-        """删除文件/目录线程"""
+    def _delete_thread(self, item_name, is_directory, recursive=False):
+        """删除文件/目录线程;目录默认只删除空目录,recursive=True时连同内容删除"""
         try:
-            remote_path = os.path.join(self.current_path, item_name).replace('\\', '/')
-            if is_directory:
-                self.sftp_client.rmdir(remote_path)
+            remote_path = SSHSession.join(self.current_path, item_name)
+            if recursive:
+                # 有远程辅助程序时一次往返,否则经SFTP逐层删除
+                error = self.session.delete([remote_path])[remote_path]
+                if error is not None:
+                    raise error
+                self.message_queue.put(("success", f"删除目录及其内容成功: {item_name}"))
+            elif is_directory:
+                try:
+                    self.session.rmdir(remote_path)
+                except IOError:
+                    if self.session.list_dir(remote_path):
+                        self.message_queue.put(("confirm_recursive_delete", item_name))
+                        return
+                    raise
                 self.message_queue.put(("success", f"删除目录成功: {item_name}"))
             else:
-                self.sftp_client.remove(remote_path)
+                self.session.remove(remote_path)
                 self.message_queue.put(("success", f"删除文件成功: {item_name}"))
             
             self.message_queue.put(("refresh", None))
@@ -841,6 +1918,9 @@ class SSHFileManagerGUI:
         
         new_name = simpledialog.askstring("重命名", f"新名称:", initialvalue=old_name)
         if new_name and new_name != old_name:
+            if new_name in self.current_files and not messagebox.askyesno(
+                    "确认覆盖", f"'{new_name}' 已存在,是否覆盖?"):
+                return
             thread = threading.Thread(target=self._rename_thread, args=(old_name, new_name))
             thread.daemon = True
             thread.start()
@@ -848,23 +1928,89 @@ class SSHFileManagerGUI:
     def _rename_thread(self, old_name, new_name):
         """重命名文件/目录线程"""
         try:
-            old_path = os.path.join(self.current_path, old_name).replace('\\', '/')
-            new_path = os.path.join(self.current_path, new_name).replace('\\', '/')
-            
-            # 使用SSH命令执行重命名(SFTP没有直接的重命名方法)
-            stdin, stdout, stderr = self.ssh_client.exec_command(f'mv "{old_path}" "{new_path}"')
-            exit_code = stdout.channel.recv_exit_status()
+            old_path = SSHSession.join(self.current_path, old_name)
+            new_path = SSHSession.join(self.current_path, new_name)
             
-            if exit_code == 0:
-                self.message_queue.put(("success", f"重命名成功: {old_name} -> {new_name}"))
-                self.message_queue.put(("refresh", None))
-            else:
-                error_msg = stderr.read().decode('utf-8').strip()
-                self.message_queue.put(("error", f"重命名失败: {error_msg}"))
+            self.session.rename(old_path, new_path)
+            self.message_queue.put(("success", f"重命名成功: {old_name} -> {new_name}"))
+            self.message_queue.put(("refresh", None))
                 
         except Exception as e:
             self.message_queue.put(("error", f"重命名失败: {str(e)}"))
     
+    def _selected_names(self):
+        """当前选中的条目名称(不含返回上级目录)"""
+        names = []
+        for item in self.tree.selection():
+            item_text = self.tree.item(item, 'text')
+            if "返回上级目录" not in item_text:
+                names.append(item_text.split("] ", 1)[1] if "] " in item_text else item_text.strip())
+        return names
+    
+    def move_selected(self):
+        """把选中的项目移动到另一个目录"""
+        names = self._selected_names()
+        if not names:
+            return
+        
+        target = simpledialog.askstring("移动到", f"把 {len(names)} 个项目移动到目录:",
+                                        initialvalue=self.current_path)
+        if target:
+            target_dir = SSHSession.resolve_path(self.current_path, target.strip())
+            if target_dir != self.current_path:
+                thread = threading.Thread(target=self._move_thread, args=(names, target_dir))
+                thread.daemon = True
+                thread.start()
+    
+    def _move_thread(self, names, target_dir):
+        """批量移动线程:所有重命名请求在一个流水线批次中发出"""
+        try:
+            paths = [SSHSession.join(self.current_path, name) for name in names]
+            errors = self.session.move(paths, target_dir)
+            self._report_batch("移动", errors, f"已移动到 {target_dir}")
+        except Exception as e:
+            self.message_queue.put(("error", f"移动失败: {str(e)}"))
+    
+    def chmod_selected(self):
+        """修改选中项目的权限"""
+        names = self._selected_names()
+        if not names:
+            return
+        
+        current = self.current_files.get(names[0], {}).get('attr')
+        initial = f"{current.st_mode & 0o7777:o}" if current is not None and current.st_mode else "644"
+        mode = simpledialog.askstring("修改权限", f"{len(names)} 个项目的新权限(八进制):",
+                                      initialvalue=initial)
+        if not mode:
+            return
+        try:
+            mode = int(mode.strip(), 8)
+        except ValueError:
+            messagebox.showerror("错误", "权限必须是八进制数字,如 644 或 0755")
+            return
+        thread = threading.Thread(target=self._chmod_thread, args=(names, mode))
+        thread.daemon = True
+        thread.start()
+    
+    def _chmod_thread(self, names, mode):
+        """批量修改权限线程"""
+        try:
+            paths = [SSHSession.join(self.current_path, name) for name in names]
+            errors = self.session.set_attributes(paths, mode=mode)
+            self._report_batch("修改权限", errors, f"权限已改为 {mode:o}")
+        except Exception as e:
+            self.message_queue.put(("error", f"修改权限失败: {str(e)}"))
+    
+    def _report_batch(self, action, errors, summary):
+        """汇报批量操作结果并刷新列表"""
+        failed = [f"{posixpath.basename(path)}: {error}" for path, error in errors.items() if error is not None]
+        done = len(errors) - len(failed)
+        if done:
+            self.message_queue.put(("success", f"{summary}: {done} 项"))
+        if failed:
+            self.message_queue.put(("error", f"{action}失败 {len(failed)} 项:\n" + "\n".join(failed[:20])))
+        self.message_queue.put(("refresh", None))
+    
     def show_properties(self):
         """显示选中项目的属性"""
         selection = self.tree.selection()
@@ -878,6 +2024,25 @@ class SSHFileManagerGUI:
         if "返回上级目录" in item_text:
             return
         
+        # 列目录时已取得完整属性,直接显示;目录大小在后台计算,完成后填入对话框
+        file_info = self.current_files.get(item_name)
+        if file_info is not None:
+            info = SSHSession.describe(SSHSession.join(self.current_path, item_name), file_info['attr'])
+            info['name'] = item_name
+            info['link_target'] = file_info.get('link_target')
+            details = self._cached_details(item_name)
+            if details is not None:
+                info.update(details)
+            is_directory = file_info['type'] == 'directory' and 'link_target' not in file_info
+            info['dir_size_pending'] = is_directory and info.get('dir_size') is None
+            self.show_properties_dialog(info)
+            if info['dir_size_pending']:
+                thread = threading.Thread(target=self._prefetch_details_thread,
+                                          args=(self.current_path, [file_info], True))
+                thread.daemon = True
+                thread.start()
+            return
+        
         thread = threading.Thread(target=self._show_properties_thread, args=(item_name,))
         thread.daemon = True
         thread.start()
@@ -885,18 +2050,9 @@ class SSHFileManagerGUI:
     def _show_properties_thread(self, item_name):
         """显示属性线程"""
         try:
-            remote_path = os.path.join(self.current_path, item_name).replace('\\', '/')
-            file_attr = self.sftp_client.stat(remote_path)
-            
-            info = {
-                'name': item_name,
-                'path': remote_path,
-                'size': file_attr.st_size if file_attr.st_size else 0,
-                'type': 'Directory' if stat.S_ISDIR(file_attr.st_mode) else 'File',
-                'permissions': stat.filemode(file_attr.st_mode),
-                'modified': datetime.datetime.fromtimestamp(file_attr.st_mtime).strftime('%Y-%m-%d %H:%M:%S') if file_attr.st_mtime else 'Unknown',
-                'accessed': datetime.datetime.fromtimestamp(file_attr.st_atime).strftime('%Y-%m-%d %H:%M:%S') if file_attr.st_atime else 'Unknown'
-            }
+            remote_path = SSHSession.join(self.current_path, item_name)
+            info = self.session.stat(remote_path)
+            info['name'] = item_name
             
             self.message_queue.put(("show_properties", info))
             
@@ -907,7 +2063,7 @@ class SSHFileManagerGUI:
         """显示属性对话框"""
         dialog = tk.Toplevel(self.root)
         dialog.title(f"属性 - {info['name']}")
-        dialog.geometry("500x400")
+        dialog.geometry("500x480")
         dialog.resizable(False, False)
         dialog.transient(self.root)
         dialog.grab_set()
@@ -915,8 +2071,8 @@ class SSHFileManagerGUI:
         # 居中显示
         dialog.update_idletasks()
         x = (dialog.winfo_screenwidth() // 2) - (500 // 2)
-        y = (dialog.winfo_screenheight() // 2) - (400 // 2)
-        dialog.geometry(f"500x400+{x}+{y}")
+        y = (dialog.winfo_screenheight() // 2) - (480 // 2)
+        dialog.geometry(f"500x480+{x}+{y}")
         
         # 主框架
         main_frame = ttk.Frame(dialog, padding="20")
@@ -944,13 +2100,25 @@ class SSHFileManagerGUI:
         props_frame = ttk.Frame(main_frame)
         props_frame.pack(fill=tk.BOTH, expand=True)
         
+        if info['type'] == 'File':
+            size_text = self._format_size(info['size'])
+        elif info.get('dir_size') is not None:
+            size_text = f"{self._format_size(info['dir_size'])} (含子目录)"
+        elif info.get('dir_size_pending'):
+            size_text = "计算中..."
+        else:
+            size_text = '-'
+        
         properties = [
             ("完整路径:", info['path']),
-            ("文件大小:", self._format_size(info['size']) if info['type'] == 'File' else '-'),
+            ("文件大小:", size_text),
             ("访问权限:", info['permissions']),
+            ("属主/属组:", f"{info.get('owner', '-')} / {info.get('group', '-')}"),
             ("修改时间:", info['modified']),
             ("访问时间:", info['accessed'])
         ]
+        if info.get('link_target'):
+            properties.insert(1, ("链接目标:", info['link_target']))
         
         for i, (label, value) in enumerate(properties):
             prop_frame = ttk.Frame(props_frame)
@@ -963,6 +2131,8 @@ class SSHFileManagerGUI:
                                  bg='white', relief='sunken', borderwidth=1, anchor=tk.W, 
                                  padx=8, pady=4)
             value_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(10, 0))
+            if label == "文件大小:" and info.get('dir_size_pending'):
+                self._properties_size = (info['path'], value_label)
         
         # 按钮框架
         btn_frame = ttk.Frame(main_frame)
@@ -971,6 +2141,283 @@ class SSHFileManagerGUI:
         ttk.Button(btn_frame, text="确定", command=dialog.destroy, 
                   style='TButton').pack(side=tk.RIGHT)
     
+    # ---- 本地文件面板 ----
+    
+    def toggle_local_pane(self):
+        """切换本地文件面板(双栏视图)显示/隐藏"""
+        if self.local_visible:
+            self.commander_pane.forget(self.local_frame)
+            self.local_visible = False
+            self.local_btn.config(text="本地面板")
+            self._apply_compare()
+            return
+        if self.local_frame is None:
+            with self.perf.span("ui.build_local_pane"):
+                self.setup_local_pane()
+        self.commander_pane.insert(0, self.local_frame, weight=1)
+        self.local_visible = True
+        self.local_btn.config(text="隐藏本地面板")
+        self.change_local_directory(self.local_path)
+    
+    def setup_local_pane(self):
+        """设置本地文件面板(第一次显示时调用)"""
+        self.local_frame = ttk.LabelFrame(self.commander_pane, text="本地文件浏览器", padding="10")
+        self.local_frame.columnconfigure(0, weight=1)
+        self.local_frame.rowconfigure(1, weight=1)
+        
+        bar = ttk.Frame(self.local_frame)
+        bar.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 8))
+        self.local_path_var = tk.StringVar(value=self.local_path)
+        path_entry = ttk.Entry(bar, textvariable=self.local_path_var, font=('Consolas', 10))
+        path_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        path_entry.bind('<Return>', lambda e: self.change_local_directory(self.local_path_var.get().strip()))
+        ttk.Button(bar, text="上级", width=5, style='Toolbutton.TButton',
+                   command=lambda: self.change_local_directory(os.path.dirname(self.local_path))
+                   ).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(bar, text="刷新", width=5, style='Toolbutton.TButton',
+                   command=lambda: self.change_local_directory(self.local_path)).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(bar, text="上传 →", width=7, style='Toolbutton.TButton',
+                   command=self.upload_local_selected).pack(side=tk.LEFT, padx=(5, 0))
+        # 对比模式:按大小和修改时间标出较新、仅一侧存在的条目
+        self.compare_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bar, text="对比", variable=self.compare_var,
+                        command=self._apply_compare).pack(side=tk.LEFT, padx=(8, 0))
+        
+        self.local_tree = ttk.Treeview(self.local_frame, columns=('size', 'type', 'permissions', 'modified'),
+                                       show='tree headings', style='Treeview')
+        for column, title in self.COLUMN_TITLES.items():
+            self.local_tree.heading(column, text=title,
+                                    command=lambda c=column: self.sort_local_by(self.SORT_COLUMNS[c]))
+        self.local_tree.column('#0', width=260, minwidth=160)
+        for column, width in (('size', 90), ('type', 70), ('permissions', 100), ('modified', 150)):
+            self.local_tree.column(column, width=width, minwidth=60)
+        scroll = ttk.Scrollbar(self.local_frame, orient=tk.VERTICAL, command=self.local_tree.yview)
+        self.local_tree.configure(yscrollcommand=scroll.set)
+        self.local_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scroll.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        
+        self.local_tree.tag_configure('directory', foreground='#0078d4', font=('Arial', 10, 'bold'))
+        self.local_tree.tag_configure('file', foreground='#333333')
+        self.local_tree.tag_configure('parent', foreground='#666666', font=('Arial', 10, 'italic'))
+        self.local_tree.tag_configure('symlink', font=('Arial', 10, 'italic'))
+        for tree in (self.local_tree, self.tree):
+            tree.tag_configure('cmp_newer', background='#e3f4e6')
+            tree.tag_configure('cmp_missing', background='#fff4cc')
+            tree.tag_configure('cmp_differs', background='#fde4e4')
+        
+        self.local_tree.bind('<Double-1>', self.on_local_double_click)
+        self.local_tree.bind('<Return>', self.on_local_double_click)
+        self.local_tree.bind('<Button-3>', self.show_local_context_menu)
+        self._bind_drag(self.local_tree)
+        
+        self.local_menu = tk.Menu(self.root, tearoff=0, font=('Arial', 10))
+        self.local_menu.add_command(label="上传到远程当前目录", command=self.upload_local_selected)
+        self.local_menu.add_command(label="刷新", command=lambda: self.change_local_directory(self.local_path))
+    
+    def change_local_directory(self, path):
+        """在后台列出本地目录(网络驱动器上可能较慢)"""
+        path = os.path.abspath(os.path.expanduser(path or self.local_path))
+        
+        def run():
+            try:
+                files = list_local_dir(path)
+                self.message_queue.put(("local_listing", (path, ListingView(files).prepare((self.local_listing.column,)))))
+            except Exception as e:
+                self.message_queue.put(("error", f"列出本地目录失败: {str(e)}"))
+        threading.Thread(target=run, daemon=True).start()
+    
+    def update_local_tree(self, path, listing):
+        """显示本地目录列表(与远程列表相同的渲染方式)"""
+        if self.local_frame is None:
+            return
+        listing.sort(self.local_listing.column, self.local_listing.reverse)
+        self.local_path = path
+        self.local_listing = listing
+        self.local_path_var.set(path)
+        
+        items = set(self.local_tree.get_children()) | set(self.local_items.values())
+        if items:
+            self.local_tree.delete(*items)
+        self.local_items = {}
+        offset = 0
+        if os.path.dirname(path) != path:
+            self.local_tree.insert("", tk.END, text="[..] 返回上级目录",
+                                   values=("", "directory", "", ""), tags=("parent",))
+            offset = 1
+        with self.perf.span("ui.local_tree_render", detail=f"{len(listing)} 项"):
+            self._render_rows(self.local_tree, self.local_items, listing.rows(), offset)
+        self._apply_compare()
+    
+    def sort_local_by(self, column):
+        """点击本地列表的列标题排序"""
+        self.local_listing.sort(column)
+        arrow = " ▼" if self.local_listing.reverse else " ▲"
+        for heading, title in self.COLUMN_TITLES.items():
+            self.local_tree.heading(heading, text=title + (arrow if self.SORT_COLUMNS[heading] == column else ""))
+        offset = 1 if os.path.dirname(self.local_path) != self.local_path else 0
+        self._render_rows(self.local_tree, self.local_items, self.local_listing.rows(), offset)
+    
+    def _selected_local(self):
+        """本地面板中选中的条目 [(本地路径, 文件信息)](不含返回上级目录)"""
+        names = {item: name for name, item in self.local_items.items()}
+        return [(os.path.join(self.local_path, names[item]), self.local_listing.files[names[item]])
+                for item in self.local_tree.selection() if item in names]
+    
+    def on_local_double_click(self, event=None):
+        """双击本地条目:进入目录或返回上级"""
+        selection = self.local_tree.selection()
+        if not selection:
+            return
+        if selection[0] not in self.local_items.values():
+            self.change_local_directory(os.path.dirname(self.local_path))
+            return
+        for local_path, file_info in self._selected_local():
+            if file_info['type'] == 'directory':
+                self.change_local_directory(local_path)
+            return
+    
+    def show_local_context_menu(self, event):
+        """本地面板右键菜单"""
+        item = self.local_tree.identify('item', event.x, event.y)
+        if item:
+            if item not in self.local_tree.selection():
+                self.local_tree.selection_set(item)
+            self.local_menu.post(event.x_root, event.y_root)
+    
+    def upload_local_selected(self, remote_dir=None):
+        """把本地面板中选中的条目排队上传到远程当前目录(或指定目录)"""
+        if not self.connected:
+            messagebox.showwarning("警告", "请先连接到服务器!")
+            return
+        items = [(path, info['type'] == 'directory') for path, info in self._selected_local()]
+        if items:
+            self.enqueue_transfer('upload', items, remote_dir or self.current_path)
+    
+    def download_to_local_pane(self, local_dir=None):
+        """把远程选中的条目排队下载到本地面板的当前目录(或指定目录)"""
+        if not self.local_visible and local_dir is None:
+            messagebox.showinfo("提示", "请先打开本地面板(查看 → 本地文件面板)")
+            return
+        items = [(SSHSession.join(self.current_path, name), self.current_files[name])
+                 for name in self._selected_names() if name in self.current_files]
+        if items:
+            self.enqueue_transfer('download', items, local_dir or self.local_path)
+    
+    def _apply_compare(self):
+        """对比模式:按大小和修改时间给两侧的条目加上标记(关闭时清除标记)"""
+        active = (self.local_visible and self.connected and self.compare_var.get())
+        if not active and not self._compare_marked:
+            return
+        states = compare_listings(self.local_listing.files, self.current_files) if active else {}
+        for tree, tree_items, side in ((self.local_tree, self.local_items, 'local'),
+                                       (self.tree, self.tree_items, 'remote')):
+            for name, item in tree_items.items():
+                tags = tuple(tag for tag in tree.item(item, 'tags') if not tag.startswith('cmp_'))
+                mark = self.COMPARE_TAGS.get((side, states.get(name)))
+                tree.item(item, tags=tags + (mark,) if mark else tags)
+        self._compare_marked = active
+        if active:
+            counts = collections.Counter(states.values())
+            self.set_status(f"对比: 本地较新 {counts['newer_local']}, 远程较新 {counts['newer_remote']}, "
+                            f"仅本地 {counts['only_local']}, 仅远程 {counts['only_remote']}, "
+                            f"大小不同 {counts['differs']}", "info")
+    
+    # ---- 拖放与传输队列 ----
+    
+    def _bind_drag(self, tree):
+        """在两个面板之间拖放条目:本地 → 远程为上传,远程 → 本地为下载"""
+        tree.bind('<ButtonPress-1>', self._drag_start, add='+')
+        tree.bind('<B1-Motion>', self._drag_motion, add='+')
+        tree.bind('<ButtonRelease-1>', self._drag_drop, add='+')
+    
+    def _drag_start(self, event):
+        self._drag = {'source': event.widget, 'x': event.x_root, 'y': event.y_root, 'active': False}
+    
+    def _drag_motion(self, event):
+        drag = self._drag
+        if drag is None or drag['active'] or not self.local_visible:
+            return
+        if abs(event.x_root - drag['x']) + abs(event.y_root - drag['y']) >= self.DRAG_THRESHOLD:
+            drag['active'] = True
+            drag['source'].configure(cursor='hand2')
+    
+    def _drag_drop(self, event):
+        drag, self._drag = self._drag, None
+        if drag is None or not drag['active']:
+            return
+        source = drag['source']
+        source.configure(cursor='')
+        target = self.root.winfo_containing(event.x_root, event.y_root)
+        if target is None or target is source or target not in (self.tree, self.local_tree):
+            return
+        
+        # 落在目录行上时传输到该目录,否则传输到目标面板的当前目录
+        row = target.identify_row(event.y_root - target.winfo_rooty())
+        text = target.item(row, 'text') if row else ""
+        name = text.split("] ", 1)[1] if text.startswith("[DIR]") else None
+        if target is self.tree:
+            self.upload_local_selected(SSHSession.join(self.current_path, name) if name else None)
+        else:
+            self.download_to_local_pane(os.path.join(self.local_path, name) if name else self.local_path)
+    
+    def enqueue_transfer(self, kind, items, target):
+        """把一次拖放(或按钮操作)的所有条目作为一个任务排入传输队列"""
+        if self.transfer_jobs is None:
+            self.transfer_jobs = queue.Queue()
+            threading.Thread(target=self._transfer_worker, daemon=True).start()
+        self.transfer_jobs.put((kind, items, target, self.bundle_var.get()))
+        action = "上传" if kind == 'upload' else "下载"
+        self.post_status(f"已加入传输队列: {action} {len(items)} 项 (排队 {self.transfer_jobs.qsize()} 个任务)", "info")
+    
+    def _transfer_worker(self):
+        """传输队列线程:按顺序执行任务;一个任务中的文件作为一批上传"""
+        while True:
+            kind, items, target, bundle = self.transfer_jobs.get()
+            session = self.session
+            try:
+                if session is None or not self.connected:
+                    raise IOError("未连接到服务器")
+                if kind == 'upload':
+                    files, total = self._upload_items(session, items, target, bundle)
+                    self.message_queue.put(("refresh", target))
+                else:
+                    files, total = self._download_items(session, items, target, bundle)
+                    self.message_queue.put(("local_refresh", target))
+                action = "上传" if kind == 'upload' else "下载"
+                self.message_queue.put(("success", f"{action}完成: {files} 个文件, {format_size(total)}"))
+            except Exception as e:
+                self.message_queue.put(("error", f"传输失败: {str(e)}"))
+    
+    def _upload_items(self, session, items, remote_dir, bundle):
+        """上传 [(本地路径, 是否目录)]:文件并行暂存后统一发布,目录逐个上传"""
+        pairs = [(path, SSHSession.join(remote_dir, os.path.basename(path))) for path, is_dir in items if not is_dir]
+        files, total = session.upload_many(pairs, self._post_transfer_progress)
+        for path, is_dir in items:
+            if is_dir:
+                count, size = session.upload_dir(path, remote_dir, bundle, self._post_transfer_progress,
+                                                 self._post_status_message)
+                files, total = files + count, total + size
+        return files, total
+    
+    def _download_items(self, session, items, local_dir, bundle):
+        """下载 [(远程路径, 文件信息)] 到本地目录;文件保留远程的修改时间,便于之后对比"""
+        files = total = 0
+        for remote_path, file_info in items:
+            if file_info['type'] == 'directory':
+                count, size = session.download_dir(remote_path, local_dir, bundle, self._post_transfer_progress,
+                                                   self._post_status_message)
+                files, total = files + count, total + size
+                continue
+            local_path = os.path.join(local_dir, posixpath.basename(remote_path))
+            session.download(remote_path, local_path)
+            attr = file_info.get('attr')
+            if attr is not None and attr.st_mtime is not None:
+                os.utime(local_path, (attr.st_atime or attr.st_mtime, attr.st_mtime))
+            files, total = files + 1, total + os.path.getsize(local_path)
+            self._post_transfer_progress({'label': f"下载到 {local_dir}", 'files': files, 'bytes': total,
+                                          'files_per_sec': 0, 'done': False})
+        return files, total
+    
     def toggle_terminal(self):
         """切换终端显示/隐藏"""
         if self.terminal_visible:
@@ -978,12 +2425,15 @@ class SSHFileManagerGUI:
             self.terminal_visible = False
             self.terminal_btn.config(text="显示终端")
         else:
+            if self.terminal_frame is None:
+                with self.perf.span("ui.build_terminal"):
+                    self.setup_terminal_frame()
             self.paned_window.add(self.terminal_frame, weight=1)
             self.terminal_visible = True
             self.terminal_btn.config(text="隐藏终端")
             
             # 如果是第一次打开终端,显示欢迎信息
-            if self.terminal_text.get("1.0", tk.END).strip() == "":
+            if self.terminal_history.end == 0:
                 welcome_msg = """欢迎使用SSH远程终端!
 
 提示:
@@ -994,8 +2444,7 @@ class SSHFileManagerGUI:
 -------------------------------------------
 
 """
-                self.terminal_text.insert(tk.END, welcome_msg, "welcome")
-                self.terminal_text.tag_config("welcome", foreground="#81c784", font=('Consolas', 10))
+                self._terminal_write([(welcome_msg, "welcome")])
     
     def execute_command(self, event=None):
         """执行远程命令"""
@@ -1009,8 +2458,7 @@ class SSHFileManagerGUI:
         self.cmd_var.set("")  # 清空输入框
         
         # 在终端显示命令
-        self.terminal_text.insert(tk.END, f"$ {command}\n", "command")
-        self.terminal_text.see(tk.END)
+        self._terminal_write([(f"$ {command}\n", "command")])
         
         thread = threading.Thread(target=self._execute_command_thread, args=(command,))
         thread.daemon = True
@@ -1019,18 +2467,7 @@ class SSHFileManagerGUI:
     def _execute_command_thread(self, command):
         """执行命令线程"""
         try:
-            stdin, stdout, stderr = self.ssh_client.exec_command(command)
-            stdout_data = stdout.read().decode('utf-8', errors='ignore')
-            stderr_data = stderr.read().decode('utf-8', errors='ignore')
-            exit_code = stdout.channel.recv_exit_status()
-            
-            result = {
-                'command': command,
-                'stdout': stdout_data,
-                'stderr': stderr_data,
-                'exit_code': exit_code
-            }
-            
+            result = self.session.exec_command(command)
             self.message_queue.put(("command_result", result))
             
         except Exception as e:
@@ -1038,108 +2475,537 @@ class SSHFileManagerGUI:
     
     def display_command_result(self, result):
         """在终端显示命令结果"""
+        with self.perf.span("ui.command_result", detail=result['command']):
+            self._render_command_result(result)
+    
+    def _render_command_result(self, result):
+        """把命令结果写入终端文本框"""
         if not self.terminal_visible:
             self.toggle_terminal()
         
         # 显示命令提示符和命令
-        self.terminal_text.insert(tk.END, f"[{datetime.datetime.now().strftime('%H:%M:%S')}] ", "timestamp")
-        self.terminal_text.insert(tk.END, f"$ {result['command']}\n", "command")
+        segments = [(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] ", "timestamp"),
+                    (f"$ {result['command']}\n", "command")]
         
         # 显示输出
         if result['stdout']:
-            self.terminal_text.insert(tk.END, result['stdout'], "output")
+            segments.append((result['stdout'], "output"))
             if not result['stdout'].endswith('\n'):
-                self.terminal_text.insert(tk.END, "\n")
+                segments.append(("\n", None))
         
         # 显示错误
         if result['stderr']:
-            self.terminal_text.insert(tk.END, "错误输出:\n", "error_header")
-            self.terminal_text.insert(tk.END, result['stderr'], "error")
+            segments.append(("错误输出:\n", "error_header"))
+            segments.append((result['stderr'], "error"))
             if not result['stderr'].endswith('\n'):
-                self.terminal_text.insert(tk.END, "\n")
+                segments.append(("\n", None))
         
         # 显示退出码
         if result['exit_code'] == 0:
-            self.terminal_text.insert(tk.END, f"[执行成功, 退出码: {result['exit_code']}]\n\n", "success_info")
+            segments.append((f"[执行成功, 退出码: {result['exit_code']}]\n\n", "success_info"))
         else:
-            self.terminal_text.insert(tk.END, f"[执行失败, 退出码: {result['exit_code']}]\n\n", "error_info")
+            segments.append((f"[执行失败, 退出码: {result['exit_code']}]\n\n", "error_info"))
         
-        # 配置终端文本标签样式
-        self.terminal_text.tag_config("timestamp", foreground="#888888", font=('Consolas', 10))
-        self.terminal_text.tag_config("command", foreground="#ffeb3b", font=('Consolas', 11, 'bold'))
-        self.terminal_text.tag_config("output", foreground="#e8e8e8", font=('Consolas', 10))
-        self.terminal_text.tag_config("error_header", foreground="#f44336", font=('Consolas', 10, 'bold'))
-        self.terminal_text.tag_config("error", foreground="#ffcdd2", font=('Consolas', 10))
-        self.terminal_text.tag_config("success_info", foreground="#4caf50", font=('Consolas', 10, 'bold'))
-        self.terminal_text.tag_config("error_info", foreground="#f44336", font=('Consolas', 10, 'bold'))
+        self._terminal_write(segments)
+    
+    def _terminal_write(self, segments):
+        """把 (文本, 标签) 段追加到终端历史;文本框只保留末尾一部分,超出后从开头裁掉"""
+        history = self.terminal_history
+        for text, tag in segments:
+            history.append(text, tag)
+        if not self._term_following:
+            # 正在查看较早的搜索结果时,有新输出就回到末尾
+            self._render_terminal_tail()
+            return
         
+        self.terminal_text.configure(state=tk.NORMAL)
+        args = []
+        for text, tag in segments:
+            args.extend((text, tag or ()))
+        if args:
+            self.terminal_text.insert(tk.END, *args)
+        self._term_end = history.end
+        if self._term_end - self._term_base > self.TERMINAL_RENDER_CHARS * 5 // 4:
+            cut = history.tail_start(self.TERMINAL_RENDER_CHARS)
+            self.terminal_text.delete("1.0", f"1.0 + {cut - self._term_base} chars")
+            self._term_base = cut
+        self.terminal_text.configure(state=tk.DISABLED)
         self.terminal_text.see(tk.END)
     
-    def process_queue(self):
-        """处理消息队列"""
-        try:
-            while True:
-                message_type, data = self.message_queue.get_nowait()
+    def _render_terminal_range(self, start, end):
+        """用历史中 [start, end) 的内容替换终端文本框"""
+        history = self.terminal_history
+        args = []
+        for text, tag in history.segments(start, end):
+            args.extend((text, tag or ()))
+        self.terminal_text.configure(state=tk.NORMAL)
+        self.terminal_text.delete("1.0", tk.END)
+        if args:
+            self.terminal_text.insert(tk.END, *args)
+        self.terminal_text.configure(state=tk.DISABLED)
+        self._term_base = max(start, history.start)
+        self._term_end = min(end, history.end)
+    
+    def _render_terminal_tail(self):
+        self._term_following = True
+        history = self.terminal_history
+        self._render_terminal_range(history.tail_start(self.TERMINAL_RENDER_CHARS), history.end)
+        self.terminal_text.see(tk.END)
+    
+    def _schedule_terminal_search(self):
+        """输入搜索内容时稍作等待,连续输入只搜索一次"""
+        if self._term_search_after_id is not None:
+            self.root.after_cancel(self._term_search_after_id)
+        self._term_search_after_id = self.root.after(80, lambda: self.search_terminal(incremental=True))
+    
+    def search_terminal(self, backwards=True, incremental=False):
+        """在全部终端历史中查找:回车向更早处查找,Shift+回车向更新处查找,到头后回绕
+        
+        增量查找(边输入边找)从当前匹配处开始,输入更多字符时停留在仍然匹配的同一位置.
+        """
+        self._term_search_after_id = None
+        history = self.terminal_history
+        query = self.term_search_var.get()
+        self.terminal_text.tag_remove("search_hit", "1.0", tk.END)
+        if not query:
+            self._term_hit = None
+            self.term_search_info.set("")
+            if not self._term_following:
+                self._render_terminal_tail()
+            return
+        
+        if self._term_hit is None:
+            hit = history.find(query, history.end, backwards=True)
+        elif incremental:
+            hit = history.find(query, self._term_hit + 1, backwards=True)
+        elif backwards:
+            hit = history.find(query, self._term_hit, backwards=True)
+        else:
+            hit = history.find(query, self._term_hit + 1)
+        if hit is None:
+            hit = history.find(query, backwards=backwards or incremental)
+        self._term_hit = hit
+        if hit is None:
+            self.term_search_info.set("无匹配")
+            return
+        
+        self._show_terminal_hit(hit, len(query))
+        self.term_search_info.set(f"共 {history.count(query)} 处匹配")
+    
+    def _show_terminal_hit(self, hit, length):
+        """高亮一个匹配;不在已渲染范围内时,改为渲染匹配附近的历史片段"""
+        history = self.terminal_history
+        if not (self._term_base <= hit and hit + length <= self._term_end):
+            start = history.line_start(hit - self.TERMINAL_SEARCH_CONTEXT)
+            end = history.next_line(hit + length + self.TERMINAL_SEARCH_CONTEXT)
+            self._term_following = end >= history.end
+            self._render_terminal_range(start, history.end if self._term_following else end)
+        index = f"1.0 + {hit - self._term_base} chars"
+        self.terminal_text.tag_add("search_hit", index, f"{index} + {length} chars")
+        self.terminal_text.see(index)
+    
+    def export_terminal_history(self):
+        """把保留的全部终端历史导出为文本文件"""
+        path = filedialog.asksaveasfilename(
+            title="导出终端历史",
+            defaultextension=".txt",
+            filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")]
+        )
+        if path:
+            try:
+                count = self.terminal_history.export(path)
+                dropped = self.terminal_history.start
+                note = f"(更早的 {dropped} 个字符已超出保留上限)" if dropped else ""
+                self.notify(f"已导出 {count} 个字符的终端历史{note}: {path}", "success")
+            except Exception as e:
+                self.notify(f"导出终端历史失败: {str(e)}", "error")
+    
+    def _wakeup_ui(self):
+        """唤醒主线程处理消息(由工作线程调用)"""
+        self.root.event_generate('<<MessageQueued>>', when='tail')
+    
+    def process_queue(self, event=None):
+        """处理消息队列:一次取出全部消息,合并后逐条处理"""
+        messages = self.message_queue.drain()
+        with self.perf.span("ui.process_queue", detail=f"{len(messages)} 条消息"):
+            for message_type, data in messages:
+                try:
+                    self._handle_message(message_type, data)
+                except Exception:
+                    traceback.print_exc()
+    
+    def _handle_message(self, message_type, data):
+        """处理单条消息"""
+        if message_type == "success":
+            self.notify(data, "success")
+            
+        elif message_type == "error":
+            self.notify(data, "error")
+            self.connect_btn.config(state="normal")
+            
+        elif message_type == "status":
+            self.post_status(data, "info")
+            
+        elif message_type == "refresh":
+            # 指定路径的刷新在用户已离开该目录时丢弃
+            if data is None or data == self.current_path:
+                self.refresh_directory()
                 
-                if message_type == "success":
-                    self.set_status(data, "success")
-                    if "连接" in data:
-                        # 连接成功时不显示弹窗,只在状态栏显示
-                        pass
-                    else:
-                        messagebox.showinfo("操作成功", data)
-                    
-                elif message_type == "error":
-                    self.set_status(data, "error")
-                    messagebox.showerror("操作失败", data)
-                    self.connect_btn.config(state="normal")
-                    
-                elif message_type == "status":
-                    self.set_status(data, "info")
-                    
-                elif message_type == "refresh":
-                    self.refresh_directory()
-                    
-                elif message_type == "update_tree":
-                    self.update_file_tree(data)
-                    # 启用按钮
-                    self.disconnect_btn.config(state="normal")
-                    self.refresh_btn.config(state="normal")
-                    self.upload_btn.config(state="normal")
-                    self.mkdir_btn.config(state="normal")
-                    
-                elif message_type == "show_properties":
-                    self.show_properties_dialog(data)
-                    
-                elif message_type == "command_result":
-                    self.display_command_result(data)
-                    
-                elif message_type == "system_info":
-                    messagebox.showinfo("系统信息", data)
-                    
-        except queue.Empty:
-            pass
+        elif message_type == "refresh_done":
+            self._refresh_running = False
+            if self._refresh_pending:
+                self.refresh_directory()
+            
+        elif message_type == "update_tree":
+            self.update_file_tree(data)
+            # 启用按钮
+            self.disconnect_btn.config(state="normal")
+            self.refresh_btn.config(state="normal")
+            self.upload_btn.config(state="normal")
+            self.upload_dir_btn.config(state="normal")
+            self.mkdir_btn.config(state="normal")
+            
+        elif message_type == "confirm_recursive_delete":
+            self.confirm_recursive_delete(data)
+            
+        elif message_type == "listing_indexed":
+            listing, indexed = data
+            # 列表已被替换或已按监视结果增删条目时,预先算好的排序不再适用
+            if listing is self.listing and listing.version == 0:
+                listing.adopt(indexed)
+            
+        elif message_type == "transfer":
+            self.update_transfer_panel(data)
+            
+        elif message_type == "checksum":
+            # 每个文件一条通知,结果可在通知日志中查看和复制
+            for line in data.splitlines():
+                self.notify(f"SHA-256: {line}", "success")
+            
+        elif message_type == "link_meter":
+            if self._link_after_id is None:
+                self._update_link_meter()
+            
+        elif message_type == "local_listing":
+            self.update_local_tree(*data)
+            
+        elif message_type == "local_refresh":
+            if self.local_visible and os.path.normpath(data) == os.path.normpath(self.local_path):
+                self.change_local_directory(self.local_path)
+            
+        elif message_type == "archive_opened":
+            self.post_status(f"已读取归档目录: {posixpath.basename(data.path)}", "success")
+            self.show_archive_browser(data)
+            
+        elif message_type == "details":
+            self._apply_details(*data)
+            
+        elif message_type == "watch_update":
+            path, upserts, deletes = data
+            self.listing_cache.invalidate(path)
+            if path == self.current_path and self.watcher is not None:
+                self.apply_watch_update(upserts, deletes)
+            
+        elif message_type == "watch_listing":
+            path, files = data
+            if path == self.current_path and self.watcher is not None:
+                self._saved_view = self._save_view()
+                self.update_file_tree(files)
+            
+        elif message_type == "connection_lost":
+            if self._saved_view is None:
+                self._saved_view = self._save_view()
+            self.notify("连接已断开,正在自动重连...", "warning")
+            
+        elif message_type == "connection_restored":
+            self.notify(f"已重新连接到 {self.session.label}" if self.session else "已重新连接", "success")
+            self._stop_watch()  # 旧的监视器随旧连接失效,刷新后重新启动
+            self.refresh_directory()
+            
+        elif message_type == "connection_failed":
+            self.notify(f"自动重连失败:{data}", "error")
+            self.disconnect_ssh()
+            
+        elif message_type == "show_properties":
+            self.show_properties_dialog(data)
+            
+        elif message_type == "command_result":
+            self.display_command_result(data)
+            
+        elif message_type == "system_info":
+            messagebox.showinfo("系统信息", data)
+            
+        elif message_type.startswith("multi_exec_"):
+            self._handle_multi_exec_message(message_type, data)
+    
+    def notify(self, message, level="info"):
+        """记录一条通知:显示在状态栏并写入非模态通知日志,不弹出对话框"""
+        timestamp = datetime.datetime.now().strftime('%H:%M:%S')
+        self.notifications.append((timestamp, level, message))
+        self.set_status(message, level)
+        
+        if level == "error":
+            self.unread_errors += 1
+        self._update_notify_button()
+        
+        if self.notification_window is not None and self.notification_window.winfo_exists():
+            self._append_notification_line(timestamp, level, message)
+    
+    def _update_notify_button(self):
+        """更新状态栏通知按钮上的未读错误计数"""
+        if self.unread_errors:
+            self.notify_btn.config(text=f"通知 ({self.unread_errors}个错误)")
+        else:
+            self.notify_btn.config(text="通知")
+    
+    def show_notification_log(self):
+        """显示通知日志窗口(非模态)"""
+        if self.notification_window is not None and self.notification_window.winfo_exists():
+            self.notification_window.lift()
+        else:
+            window = tk.Toplevel(self.root)
+            window.title("通知日志")
+            window.geometry("700x350")
+            window.transient(self.root)
+            
+            frame = ttk.Frame(window, padding="10")
+            frame.pack(fill=tk.BOTH, expand=True)
+            
+            self.notification_text = tk.Text(frame, font=('Consolas', 10), wrap=tk.WORD,
+                                             relief='flat', borderwidth=0)
+            scroll = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.notification_text.yview)
+            self.notification_text.configure(yscrollcommand=scroll.set)
+            self.notification_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scroll.pack(side=tk.RIGHT, fill=tk.Y)
+            
+            self.notification_text.tag_config("success", foreground="#28a745")
+            self.notification_text.tag_config("error", foreground="#dc3545")
+            self.notification_text.tag_config("info", foreground="#333333")
+            
+            for timestamp, level, message in self.notifications:
+                self._append_notification_line(timestamp, level, message)
+            
+            self.notification_window = window
         
-        # 继续处理队列
-        self.root.after(100, self.process_queue)
+        self.unread_errors = 0
+        self._update_notify_button()
     
-    @staticmethod
-    def _format_size(size_bytes):
-        """格式化文件大小"""
-        if size_bytes == 0:
-            return "0 B"
-        
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        import math
-        i = int(math.floor(math.log(size_bytes, 1024)))
-        p = math.pow(1024, i)
-        s = round(size_bytes / p, 2)
-        return f"{s} {size_names[i]}"
+    def _append_notification_line(self, timestamp, level, message):
+        """向通知日志窗口追加一行"""
+        self.notification_text.insert(tk.END, f"[{timestamp}] {message}\n", level)
+        self.notification_text.see(tk.END)
+    
+    _format_size = staticmethod(format_size)
+    
+    def show_perf_overlay(self):
+        """显示性能监视窗口:各操作的p50/p99与最慢的调用"""
+        if self.perf_window is not None and self.perf_window.winfo_exists():
+            self.perf_window.lift()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("性能监视")
+        window.geometry("820x560")
+        window.transient(self.root)
+        
+        main_frame = ttk.Frame(window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(main_frame, text="按操作统计", style='Title.TLabel').pack(anchor=tk.W, pady=(0, 5))
+        columns = ('category', 'count', 'p50', 'p99', 'max', 'total')
+        self.perf_stats_tree = ttk.Treeview(main_frame, columns=columns, show='tree headings', height=12)
+        self.perf_stats_tree.heading('#0', text='操作')
+        for column, title in zip(columns, ('类别', '次数', 'p50', 'p99', '最大', '总计')):
+            self.perf_stats_tree.heading(column, text=title)
+            self.perf_stats_tree.column(column, width=90, anchor=tk.E)
+        self.perf_stats_tree.column('#0', width=220)
+        self.perf_stats_tree.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(main_frame, text="最慢的调用", style='Title.TLabel').pack(anchor=tk.W, pady=(10, 5))
+        self.perf_slow_tree = ttk.Treeview(main_frame, columns=('duration', 'detail'),
+                                           show='tree headings', height=8)
+        self.perf_slow_tree.heading('#0', text='操作')
+        self.perf_slow_tree.heading('duration', text='耗时')
+        self.perf_slow_tree.heading('detail', text='详情')
+        self.perf_slow_tree.column('#0', width=220)
+        self.perf_slow_tree.column('duration', width=100, anchor=tk.E)
+        self.perf_slow_tree.column('detail', width=440)
+        self.perf_slow_tree.pack(fill=tk.BOTH, expand=True)
+        
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(btn_frame, text="导出Trace...", command=self.export_perf_trace,
+                  style='Toolbutton.TButton').pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="清空", command=self.perf.reset,
+                  style='Toolbutton.TButton').pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(btn_frame, text="关闭", command=window.destroy,
+                  style='Toolbutton.TButton').pack(side=tk.RIGHT)
+        
+        self.perf_window = window
+        self._refresh_perf_overlay()
+    
+    def _refresh_perf_overlay(self):
+        """刷新性能监视窗口(仅在窗口打开时定时运行)"""
+        if self.perf_window is None or not self.perf_window.winfo_exists():
+            self.perf_window = None
+            return
+        
+        def ms(seconds):
+            return f"{seconds * 1000:.2f} ms"
+        
+        self.perf_stats_tree.delete(*self.perf_stats_tree.get_children())
+        for row in self.perf.summary():
+            self.perf_stats_tree.insert("", tk.END, text=row['name'],
+                                        values=(row['category'], row['count'], ms(row['p50']),
+                                                ms(row['p99']), ms(row['max']), ms(row['total'])))
+        
+        self.perf_slow_tree.delete(*self.perf_slow_tree.get_children())
+        for duration, name, detail in self.perf.slowest():
+            self.perf_slow_tree.insert("", tk.END, text=name, values=(ms(duration), detail))
+        
+        self.perf_window.after(1000, self._refresh_perf_overlay)
+    
+    def export_perf_trace(self):
+        """导出Chrome trace格式的性能记录"""
+        path = filedialog.asksaveasfilename(
+            title="导出性能Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome Trace", "*.json"), ("所有文件", "*.*")]
+        )
+        if path:
+            try:
+                count = self.perf.export_chrome_trace(path)
+                self.notify(f"已导出 {count} 条性能记录: {path}", "success")
+            except Exception as e:
+                self.notify(f"导出性能记录失败: {str(e)}", "error")
+    
+    # ---- 端口转发 ----
+    
+    def show_port_forwards(self):
+        """端口转发面板:添加/删除本地(-L)和远程(-R)转发,实时显示连接数和速率"""
+        if self.forward_window is not None and self.forward_window.winfo_exists():
+            self.forward_window.lift()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("端口转发")
+        window.geometry("900x420")
+        window.transient(self.root)
+        
+        main_frame = ttk.Frame(window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        form = ttk.Frame(main_frame)
+        form.pack(fill=tk.X, pady=(0, 10))
+        kind_var = tk.StringVar(value="本地 (-L)")
+        ttk.Combobox(form, textvariable=kind_var, values=("本地 (-L)", "远程 (-R)"), state="readonly",
+                     width=10).pack(side=tk.LEFT)
+        fields = {}
+        for key, title, default, width in (('listen_host', "监听地址:", "127.0.0.1", 12),
+                                           ('listen_port', "端口:", "", 7),
+                                           ('target_host', "目标主机:", "localhost", 16),
+                                           ('target_port', "端口:", "", 7)):
+            ttk.Label(form, text=title).pack(side=tk.LEFT, padx=(10, 3))
+            fields[key] = tk.StringVar(value=default)
+            ttk.Entry(form, textvariable=fields[key], width=width).pack(side=tk.LEFT)
+        
+        def add():
+            try:
+                listen_port = int(fields['listen_port'].get().strip() or 0)
+                target_port = int(fields['target_port'].get().strip())
+            except ValueError:
+                messagebox.showerror("端口错误", "端口号必须是整数!", parent=window)
+                return
+            self.add_port_forward(kind_var.get().startswith("本地"), fields['listen_host'].get().strip(),
+                                  listen_port, fields['target_host'].get().strip(), target_port)
+        
+        ttk.Button(form, text="添加", command=add, width=8).pack(side=tk.RIGHT)
+        
+        columns = ('listen', 'target', 'connections', 'rate_sent', 'rate_received', 'bytes', 'state')
+        self.forward_tree = ttk.Treeview(main_frame, columns=columns, show='tree headings', height=10)
+        self.forward_tree.heading('#0', text='类型')
+        self.forward_tree.column('#0', width=60)
+        for column, title, width in zip(columns, ('监听', '目标', '连接(当前/累计)', '发送', '接收', '累计流量', '状态'),
+                                        (150, 150, 110, 90, 90, 130, 160)):
+            self.forward_tree.heading(column, text=title)
+            self.forward_tree.column(column, width=width)
+        self.forward_tree.pack(fill=tk.BOTH, expand=True)
+        
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(btn_frame, text="删除选中", command=self.remove_selected_forwards,
+                  style='Toolbutton.TButton').pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="关闭", command=window.destroy,
+                  style='Toolbutton.TButton').pack(side=tk.RIGHT)
+        
+        self.forward_window = window
+        self._refresh_port_forwards()
+    
+    def add_port_forward(self, local, listen_host, listen_port, target_host, target_port):
+        """在后台添加一条转发(远程转发需要一次服务器往返)"""
+        if not self.connected:
+            messagebox.showwarning("警告", "请先连接到服务器!")
+            return
+        if self.forwarder is None:
+            self.forwarder = PortForwarder(self.session)
+        forwarder = self.forwarder
+        
+        def run():
+            try:
+                add = forwarder.add_local if local else forwarder.add_remote
+                forward = add(listen_port, target_host, target_port, listen_host or "127.0.0.1")
+                self.message_queue.put(("success", f"已添加端口转发 {forward.spec}"))
+            except Exception as e:
+                self.message_queue.put(("error", f"添加端口转发失败: {str(e)}"))
+        threading.Thread(target=run, daemon=True).start()
+    
+    def remove_selected_forwards(self):
+        """删除选中的转发"""
+        if self.forwarder is None:
+            return
+        selected = set(self.forward_tree.selection())
+        forwards = [forward for forward in self.forwarder.forwards if str(id(forward)) in selected]
+        forwarder = self.forwarder
+        
+        def run():
+            for forward in forwards:
+                forwarder.remove(forward)
+            self.message_queue.put(("success", f"已删除 {len(forwards)} 条端口转发"))
+        if forwards:
+            threading.Thread(target=run, daemon=True).start()
+    
+    def _refresh_port_forwards(self):
+        """刷新端口转发面板(仅在窗口打开时定时运行)"""
+        if self.forward_window is None or not self.forward_window.winfo_exists():
+            self.forward_window = None
+            return
+        
+        forwards = list(self.forwarder.forwards) if self.forwarder is not None else []
+        items = {str(id(forward)): forward for forward in forwards}
+        for item in self.forward_tree.get_children():
+            if item not in items:
+                self.forward_tree.delete(item)
+        for item, forward in items.items():
+            values = (f"{forward.listen_host}:{forward.listen_port}",
+                      f"{forward.target_host}:{forward.target_port}",
+                      f"{forward.active}/{forward.total}",
+                      f"{format_size(int(forward.rate_sent))}/s",
+                      f"{format_size(int(forward.rate_received))}/s",
+                      f"↑{format_size(forward.bytes_sent)} ↓{format_size(forward.bytes_received)}",
+                      f"错误: {forward.error}" if forward.error else "正常")
+            kind = "-L" if forward.kind == 'local' else "-R"
+            if self.forward_tree.exists(item):
+                self.forward_tree.item(item, values=values)
+            else:
+                self.forward_tree.insert("", tk.END, iid=item, text=kind, values=values)
+        
+        self.forward_window.after(1000, self._refresh_port_forwards)
     
     def on_closing(self):
         """程序关闭时的清理工作"""
         if self.connected:
             self.disconnect_ssh()
+        self.prewarmer.close()
         self.root.destroy()
     
     def setup_menu(self):
@@ -1163,12 +3029,19 @@ class SSHFileManagerGUI:
         menubar.add_cascade(label="查看", menu=view_menu)
         view_menu.add_command(label="刷新", command=self.refresh_directory, accelerator="F5")
         view_menu.add_command(label="切换终端", command=self.toggle_terminal, accelerator="Ctrl+T")
+        view_menu.add_command(label="本地文件面板", command=self.toggle_local_pane, accelerator="Ctrl+L")
+        view_menu.add_command(label="通知日志", command=self.show_notification_log)
+        view_menu.add_command(label="性能监视", command=self.show_perf_overlay)
         
         # 工具菜单
         tools_menu = tk.Menu(menubar, tearoff=0, font=('Arial', 10))
         menubar.add_cascade(label="工具", menu=tools_menu)
         tools_menu.add_command(label="清理终端", command=self.clear_terminal)
+        tools_menu.add_command(label="导出终端历史...", command=self.export_terminal_history)
         tools_menu.add_command(label="系统信息", command=self.show_system_info)
+        tools_menu.add_command(label="多主机执行命令", command=self.show_multi_exec_dialog)
+        tools_menu.add_command(label="端口转发", command=self.show_port_forwards)
+        tools_menu.add_command(label="导出性能Trace", command=self.export_perf_trace)
         
         # 帮助菜单
         help_menu = tk.Menu(menubar, tearoff=0, font=('Arial', 10))
@@ -1182,13 +3055,17 @@ class SSHFileManagerGUI:
         self.root.bind('<Control-u>', lambda e: self.upload_file())
         self.root.bind('<Control-m>', lambda e: self.create_directory())
         self.root.bind('<Control-t>', lambda e: self.toggle_terminal())
+        self.root.bind('<Control-l>', lambda e: self.toggle_local_pane())
         self.root.bind('<Control-q>', lambda e: self.on_closing())
         self.root.bind('<F5>', lambda e: self.refresh_directory())
     
     def clear_terminal(self):
         """清理终端"""
-        if hasattr(self, 'terminal_text'):
-            self.terminal_text.delete('1.0', tk.END)
+        self.terminal_history.clear()
+        self._term_hit = None
+        if self.terminal_frame is not None:
+            self._term_following = True
+            self._render_terminal_range(self.terminal_history.end, self.terminal_history.end)
             self.set_status("终端已清理", "info")
     
     def show_system_info(self):
@@ -1205,27 +3082,232 @@ class SSHFileManagerGUI:
     def _get_system_info_thread(self):
         """获取系统信息线程"""
         try:
-            commands = [
-                ("系统信息", "uname -a"),
-                ("磁盘使用", "df -h"),
-                ("内存信息", "free -h"),
-                ("CPU信息", "cat /proc/cpuinfo | grep 'model name' | head -1"),
-                ("系统负载", "uptime")
-            ]
-            
-            info_text = "远程系统信息\n" + "="*50 + "\n\n"
-            
-            for title, cmd in commands:
-                stdin, stdout, stderr = self.ssh_client.exec_command(cmd)
-                output = stdout.read().decode('utf-8', errors='ignore').strip()
-                if output:
-                    info_text += f"{title}:\n{output}\n\n"
-            
+            info_text = self.session.system_info()
             self.message_queue.put(("system_info", info_text))
             
         except Exception as e:
             self.message_queue.put(("error", f"获取系统信息失败: {str(e)}"))
     
+    def show_multi_exec_dialog(self):
+        """多主机执行命令对话框:主机列表每行一个 user@host[:port]"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("多主机执行命令")
+        dialog.geometry("520x420")
+        dialog.transient(self.root)
+        
+        frame = ttk.Frame(dialog, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(frame, text="主机列表 (每行一个 user@host[:port]):",
+                  font=('Arial', 10, 'bold')).pack(anchor=tk.W)
+        hosts_text = tk.Text(frame, height=12, font=('Consolas', 10))
+        hosts_text.pack(fill=tk.BOTH, expand=True, pady=(5, 10))
+        if self.session:
+            hosts_text.insert(tk.END, f"{self.session.label}\n")
+        
+        ttk.Label(frame, text="命令:", font=('Arial', 10, 'bold')).pack(anchor=tk.W)
+        command_var = tk.StringVar(value=self.cmd_var.get() if self.terminal_frame is not None else "")
+        command_entry = ttk.Entry(frame, textvariable=command_var, font=('Consolas', 10))
+        command_entry.pack(fill=tk.X, pady=(5, 10))
+        
+        options = ttk.Frame(frame)
+        options.pack(fill=tk.X)
+        ttk.Label(options, text="并发连接数:").pack(side=tk.LEFT)
+        jobs_var = tk.StringVar(value="8")
+        ttk.Spinbox(options, from_=1, to=64, textvariable=jobs_var, width=5).pack(side=tk.LEFT, padx=(5, 15))
+        group_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options, text="合并相同输出", variable=group_var).pack(side=tk.LEFT)
+        
+        jump_frame = ttk.Frame(frame)
+        jump_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Label(jump_frame, text="跳板机 (可选,所有主机共用一条连接):").pack(side=tk.LEFT)
+        jump_var = tk.StringVar(value=self.jump_host_var.get().strip())
+        ttk.Entry(jump_frame, textvariable=jump_var, font=('Consolas', 10)).pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+        
+        def start():
+            targets = [line.strip() for line in hosts_text.get('1.0', tk.END).splitlines()
+                       if line.strip() and not line.strip().startswith('#')]
+            command = command_var.get().strip()
+            if not targets or not command:
+                messagebox.showwarning("警告", "请填写主机列表和命令", parent=dialog)
+                return
+            try:
+                jobs = max(1, int(jobs_var.get()))
+            except ValueError:
+                jobs = 8
+            dialog.destroy()
+            self.start_multi_exec(targets, command, jobs, group_var.get(), jump_var.get().strip() or None)
+        
+        ttk.Button(options, text="执行", command=start, width=10).pack(side=tk.RIGHT)
+        command_entry.bind('<Return>', lambda e: start())
+        command_entry.focus()
+    
+    def start_multi_exec(self, targets, command, jobs=8, group=True, jump_host=None):
+        """在多台主机上并行执行命令,输出窗口流式显示各主机输出和退出码汇总"""
+        key_file = None
+        password = None
+        if self.auth_var.get() == "key" and getattr(self, 'selected_key_file', None):
+            key_file = self.selected_key_file
+        else:
+            # 所有主机共用一次输入的密码
+            password = simpledialog.askstring("密码认证", f"请输入 {len(targets)} 台主机的密码:", show='*')
+            if not password:
+                return
+        
+        run = self._create_multi_exec_window(targets, command, group)
+        thread = threading.Thread(target=self._multi_exec_thread,
+                                  args=(run, targets, command, jobs, key_file, password, jump_host))
+        thread.daemon = True
+        thread.start()
+    
+    def _create_multi_exec_window(self, targets, command, group):
+        """创建多主机执行的输出窗口:上方为输出,下方为各主机退出码汇总表"""
+        window = tk.Toplevel(self.root)
+        window.title(f"多主机执行 - {command}")
+        window.geometry("900x600")
+        
+        paned = ttk.PanedWindow(window, orient=tk.VERTICAL)
+        paned.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        output_frame = ttk.Frame(paned)
+        output_text = tk.Text(output_frame, font=('Consolas', 10), bg='#1e1e1e', fg='#e8e8e8', wrap=tk.NONE)
+        output_scroll = ttk.Scrollbar(output_frame, orient=tk.VERTICAL, command=output_text.yview)
+        output_text.configure(yscrollcommand=output_scroll.set)
+        output_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        output_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        output_text.tag_config("host", foreground="#4fc3f7")
+        output_text.tag_config("output", foreground="#e8e8e8")
+        output_text.tag_config("error", foreground="#ffcdd2")
+        output_text.tag_config("group", foreground="#ffeb3b", font=('Consolas', 10, 'bold'))
+        paned.add(output_frame, weight=3)
+        
+        table_frame = ttk.Frame(paned)
+        table = ttk.Treeview(table_frame, columns=("exit_code", "seconds", "state"), height=8)
+        table.heading("#0", text="主机")
+        table.heading("exit_code", text="退出码")
+        table.heading("seconds", text="耗时")
+        table.heading("state", text="状态")
+        table.column("#0", width=250)
+        table.column("exit_code", width=70, anchor=tk.CENTER)
+        table.column("seconds", width=80, anchor=tk.E)
+        table.column("state", width=400)
+        table_scroll = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
+        table.configure(yscrollcommand=table_scroll.set)
+        table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        table_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        table.tag_configure('failed', foreground='#dc3545')
+        paned.add(table_frame, weight=1)
+        
+        run = {'window': window, 'text': output_text, 'table': table, 'rows': {},
+               'group': tk.BooleanVar(value=group), 'results': None, 'summary': tk.StringVar()}
+        for target in targets:
+            run['rows'][target] = table.insert("", tk.END, text=target, values=("", "", "等待中"))
+        
+        bottom = ttk.Frame(window)
+        bottom.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Label(bottom, textvariable=run['summary']).pack(side=tk.LEFT)
+        ttk.Checkbutton(bottom, text="合并相同输出", variable=run['group'],
+                        command=lambda: self._render_multi_exec_output(run)).pack(side=tk.RIGHT)
+        run['summary'].set(f"正在 {len(targets)} 台主机上执行...")
+        return run
+    
+    def _multi_exec_thread(self, run, targets, command, jobs, key_file, password, jump_host=None):
+        """多主机执行线程:有界连接池,每台主机独立连接、执行并关闭;经跳板机时共用一条跳板机连接"""
+        bastions = BastionPool(perf=self.perf)
+        
+        def connect(target):
+            hostname, username, port = parse_target(target)
+            self.message_queue.put(("multi_exec_state", (run, target, "连接中")))
+            jump = None
+            if jump_host:
+                jump = bastions.get(jump_host, key_file=key_file, connect=self._connect_bastion)
+            session = SSHSession(hostname, username, port, key_file=key_file, perf=self.perf, jump=jump)
+            session.auto_reconnect = False
+            session.connect(password=password)
+            self.message_queue.put(("multi_exec_state", (run, target, "执行中")))
+            return session
+        
+        def on_output(target, line, is_stderr):
+            self.message_queue.put(("multi_exec_output", (run, target, line, is_stderr)))
+        
+        def on_result(result):
+            self.message_queue.put(("multi_exec_result", (run, result)))
+        
+        try:
+            results = run_on_hosts(targets, command, connect, max_workers=jobs,
+                                   on_output=on_output, on_result=on_result)
+        finally:
+            bastions.close()
+        self.message_queue.put(("multi_exec_done", (run, results)))
+    
+    def _handle_multi_exec_message(self, message_type, data):
+        """处理多主机执行的进度消息(窗口已关闭时丢弃)"""
+        run = data[0]
+        if not run['window'].winfo_exists():
+            return
+        
+        if message_type == "multi_exec_state":
+            _, target, state = data
+            run['table'].set(run['rows'][target], "state", state)
+            
+        elif message_type == "multi_exec_output":
+            # 执行过程中按到达顺序流式显示,合并视图在全部结束后生成
+            _, target, line, is_stderr = data
+            text = run['text']
+            text.insert(tk.END, f"[{target}] ", "host")
+            text.insert(tk.END, line + "\n", "error" if is_stderr else "output")
+            text.see(tk.END)
+            
+        elif message_type == "multi_exec_result":
+            result = data[1]
+            code = "-" if result['exit_code'] is None else result['exit_code']
+            if result['error']:
+                state = f"错误: {result['error']}"
+            else:
+                state = "成功" if result['exit_code'] == 0 else "失败"
+            tags = () if result['exit_code'] == 0 else ('failed',)
+            run['table'].item(run['rows'][result['target']], tags=tags,
+                              values=(code, f"{result['seconds']:.2f}s", state))
+            
+        elif message_type == "multi_exec_done":
+            results = data[1]
+            run['results'] = results
+            ok = sum(1 for result in results if result['exit_code'] == 0)
+            groups = len(group_identical_results(results))
+            run['summary'].set(f"共 {len(results)} 台主机: {ok} 台成功, {len(results) - ok} 台失败, "
+                               f"{groups} 种不同输出")
+            self._render_multi_exec_output(run)
+    
+    def _render_multi_exec_output(self, run):
+        """全部结束后重绘输出:按主机分段,或把完全相同的输出合并为一段"""
+        results = run['results']
+        if results is None:
+            return
+        text = run['text']
+        text.delete('1.0', tk.END)
+        
+        if run['group'].get():
+            sections = [(group['targets'], group) for group in group_identical_results(results)]
+        else:
+            sections = [([result['target']], result) for result in results]
+        
+        for targets, result in sections:
+            if len(targets) > 1:
+                header = f"==> {len(targets)} 台主机: {', '.join(targets)}"
+            else:
+                header = f"==> {targets[0]}"
+            text.insert(tk.END, header + "\n", "group")
+            if result['error']:
+                text.insert(tk.END, f"错误: {result['error']}\n", "error")
+            if result['stdout']:
+                text.insert(tk.END, result['stdout'].rstrip('\n') + "\n", "output")
+            if result['stderr']:
+                text.insert(tk.END, result['stderr'].rstrip('\n') + "\n", "error")
+            if result['exit_code'] is not None:
+                text.insert(tk.END, f"[退出码: {result['exit_code']}]\n", "host")
+            text.insert(tk.END, "\n")
+    
     def show_shortcuts(self):
         """显示快捷键帮助"""
         shortcuts_text = """快捷键列表
@@ -1241,12 +3323,14 @@ class SSHFileManagerGUI:
 
 界面操作:
   Ctrl + T    切换终端显示
+  Ctrl + L    切换本地文件面板
   Ctrl + Q    退出程序
 
 鼠标操作:
   双击目录    进入目录
   双击文件    下载文件
   右键点击    显示上下文菜单
+  拖放        在本地面板与远程列表之间上传/下载
 
 使用技巧:
   - 在路径栏直接输入路径并按回车
@@ -1265,9 +3349,12 @@ class SSHFileManagerGUI:
 - 安全的SSH连接(密码/密钥认证)
 - 直观的高清文件浏览界面
 - 便捷的文件上传/下载
+- 目录打包传输(tar流,适合海量小文件)
 - 集成的远程终端
+- 多主机并行执行命令,相同输出自动合并
 - 现代化的用户界面
 - 多线程操作,响应迅速
+- 核心引擎可脱离界面使用(命令行/脚本,多主机并行)
 - 丰富的快捷键支持
 
 技术栈:
@@ -1300,6 +3387,12 @@ Copyright 2024 - 专为提升远程开发体验而设计"""
         # 显示欢迎信息
         self.set_status("欢迎使用SSH远程资源管理器!请连接到服务器开始使用", "info")
         
+        # 处理主循环启动前投递的消息
+        self.root.after_idle(self.process_queue)
+        
+        # 窗口显示后在后台预先导入paramiko并预热收藏的主机,首次连接时不必等待加密库加载和握手
+        self.root.after(self.WARM_IMPORT_DELAY, self._warm_up)
+        
         # 启动主循环
         self.root.mainloop()
 
@@ -1318,11 +3411,8 @@ def main():
         
         print("启动SSH远程资源管理器...")
         
-        # 检查 Paramiko 是否安装
-        try:
-            import paramiko
-            print(f"Paramiko 版本: {getattr(paramiko, '__version__', '未知')}")
-        except ImportError:
+        # 检查 Paramiko 是否安装(只查找不导入,导入推迟到窗口显示之后)
+        if importlib.util.find_spec("paramiko") is None:
             print("错误: 未安装 Paramiko 库")
             print("请运行: pip install paramiko")
             return
@@ -1337,7 +3427,14 @@ def main():
         messagebox.showerror("启动错误", f"程序启动失败:\n\n{str(e)}\n\n请检查Python环境和依赖库安装情况.")
 
 
+def cli_main(argv=None):
+    """命令行入口:不启动界面,直接调用核心引擎(参数见 --help)"""
+    return run_cli(argv)
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(cli_main(sys.argv[1:]))
     main()#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH远程资源管理器 - 远程辅助程序
+
+由 ssh_file_core.RemoteAgent 上传到远程主机并用python3运行,只使用标准库.
+通过标准输入/输出交换帧:4字节大端长度(最高位表示负载经过zlib压缩) + UTF-8 JSON.
+启动后先发送一帧问候信息;之后每个请求 {"op": 操作, 参数...} 对应一帧回复
+{"result": 结果} 或 {"error": [errno, 说明]}.批量操作中单个路径的失败记为 {"error": ...}.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import struct
+import sys
+import zlib
+
+VERSION = 1
+COMPRESSED = 0x80000000
+COMPRESS_OVER = 4096
+MAX_LINK_DEPTH = 40
+
+
+def read_exact(stream, size):
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def receive(stream):
+    header = read_exact(stream, 4)
+    if header is None:
+        return None
+    length = struct.unpack(">I", header)[0]
+    payload = read_exact(stream, length & ~COMPRESSED)
+    if length & COMPRESSED:
+        payload = zlib.decompress(payload)
+    return json.loads(payload.decode("utf-8"))
+
+
+def send(stream, message):
+    payload = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    length = len(payload)
+    if length > COMPRESS_OVER:
+        payload = zlib.compress(payload, 1)
+        length = len(payload) | COMPRESSED
+    stream.write(struct.pack(">I", length) + payload)
+    stream.flush()
+
+
+def error_of(e):
+    return [getattr(e, "errno", None), str(getattr(e, "strerror", None) or e)]
+
+
+def attrs(st):
+    return [st.st_mode, st.st_size, st.st_uid, st.st_gid, int(st.st_atime), int(st.st_mtime)]
+
+
+def op_stat(paths):
+    # lstat;符号链接另带链接目标和目标的属性(失效链接为null)
+    result = []
+    for path in paths:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            result.append(None)
+            continue
+        entry = [attrs(st), None, None]
+        if stat.S_ISLNK(st.st_mode):
+            try:
+                entry[1] = os.readlink(path)
+                entry[2] = attrs(os.stat(path))
+            except OSError:
+                pass
+        result.append(entry)
+    return result
+
+
+def op_walk(path):
+    # 与客户端SFTP遍历相同:跟随符号链接,链接指回祖先或层数超限时跳过;只返回目录和普通文件
+    root = os.stat(path)
+    name = os.path.basename(path.rstrip("/")) or path
+    if not stat.S_ISDIR(root.st_mode):
+        return [[name] + attrs(root)] if stat.S_ISREG(root.st_mode) else []
+    real = os.path.normpath(path)
+    result = []
+    pending = [(path, name, root, real, frozenset([real]), 0)]
+    while pending:
+        directory, relative, dir_st, real_dir, ancestors, depth = pending.pop()
+        result.append([relative] + attrs(dir_st))
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue  # 不可读的子目录:只跳过它的内容
+        for item in names:
+            item_path = os.path.join(directory, item)
+            real_item = os.path.join(real_dir, item)
+            item_depth = depth
+            try:
+                st = os.lstat(item_path)
+                if stat.S_ISLNK(st.st_mode):
+                    target = os.readlink(item_path)
+                    st = os.stat(item_path)
+                    if stat.S_ISDIR(st.st_mode):
+                        real_item = os.path.normpath(os.path.join(real_dir, target))
+                        item_depth += 1
+                        if real_item in ancestors or item_depth > MAX_LINK_DEPTH:
+                            continue
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                pending.append((item_path, relative + "/" + item, st, real_item,
+                                ancestors | frozenset([real_item]), item_depth))
+            elif stat.S_ISREG(st.st_mode):
+                result.append([relative + "/" + item] + attrs(st))
+    return result
+
+
+def op_remove(paths, recursive=False):
+    # 目录(不是指向目录的链接)在recursive时连同内容删除
+    result = []
+    for path in paths:
+        try:
+            if stat.S_ISDIR(os.lstat(path).st_mode):
+                if recursive:
+                    shutil.rmtree(path)
+                else:
+                    os.rmdir(path)
+            else:
+                os.unlink(path)
+            result.append(None)
+        except OSError as e:
+            result.append({"error": error_of(e)})
+    return result
+
+
+def op_mkdirs(paths, mode=0o777):
+    result = []
+    for path in paths:
+        try:
+            if not os.path.isdir(path):
+                os.makedirs(path, mode)
+            result.append(None)
+        except OSError as e:
+            result.append({"error": error_of(e)})
+    return result
+
+
+def op_hash(paths, algorithm="sha256"):
+    result = []
+    for path in paths:
+        try:
+            digest = hashlib.new(algorithm)
+            size = 0
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+            result.append([digest.hexdigest(), size])
+        except (OSError, ValueError) as e:
+            result.append({"error": error_of(e)})
+    return result
+
+
+def disk_usage(path):
+    # 同du -s:按占用的块计算,不跟随符号链接,硬链接只计一次
+    os.lstat(path)
+    seen = set()
+    total = 0
+    pending = [path]
+    while pending:
+        current = pending.pop()
+        try:
+            st = os.lstat(current)
+        except OSError:
+            continue
+        if st.st_nlink > 1 and not stat.S_ISDIR(st.st_mode):
+            if (st.st_dev, st.st_ino) in seen:
+                continue
+            seen.add((st.st_dev, st.st_ino))
+        total += getattr(st, "st_blocks", (st.st_size + 511) // 512) * 512
+        if stat.S_ISDIR(st.st_mode):
+            try:
+                pending.extend(os.path.join(current, name) for name in os.listdir(current))
+            except OSError:
+                pass
+    return total
+
+
+def op_du(paths):
+    result = []
+    for path in paths:
+        try:
+            result.append(disk_usage(path))
+        except OSError as e:
+            result.append({"error": error_of(e)})
+    return result
+
+
+OPERATIONS = {"stat": op_stat, "walk": op_walk, "remove": op_remove, "mkdirs": op_mkdirs,
+              "hash": op_hash, "du": op_du}
+
+
+def main():
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    send(stdout, {"agent": VERSION, "ops": sorted(OPERATIONS), "python": sys.version.split()[0]})
+    while True:
+        request = receive(stdin)
+        if request is None:
+            return
+        op = request.pop("op", None)
+        try:
+            if op not in OPERATIONS:
+                raise ValueError("unknown operation: %s" % op)
+            reply = {"result": OPERATIONS[op](**request)}
+        except (OSError, ValueError, TypeError) as e:
+            reply = {"error": error_of(e)}
+        send(stdout, reply)
+
+
+if __name__ == "__main__":
+    main()